@@ -3,6 +3,16 @@ import json
 import csv
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bitacora
+import cache_respuestas
+import cliente_http
+import limitador_tasa
+
+# --- CONFIGURACIÓN ---
+# Las filas de error (consulta fallida) llevan este prefijo en 'name'
+PREFIJO_ERROR = 'ERROR'
 
 # --- FUNCIÓN DE EXTRACCIÓN DE DATOS (Sin cambios) ---
 # Columnas que se incluirán en el archivo CSV, en el orden especificado
@@ -76,11 +86,69 @@ def load_organization_ids_from_csv(filepath, log_callback):
         log_callback(f"❌ ERROR FATAL: No se pudo leer el archivo CSV de IDs. Causa: {e}")
         return None
 
+# --- CONSULTAS A LA API ---
+
+def _consultar_organizacion(sesion, control, cache, org_id, log_callback, stop_event):
+    """
+    Consulta un ID con GET /organizations/{id}.
+    Retorna las filas para el CSV: la del ID, una fila de error, o ninguna si
+    la respuesta no trae la organización. None si se canceló.
+    """
+    url = f"{cliente_http.APOLLO_BASE_URL}/organizations/{org_id}"
+    log_callback(f"Consultando ID: {org_id}...")
+    
+    try:
+        # La API key viaja solo en el header x-api-key de la sesión
+        response = cliente_http.enviar(sesion, "GET", url, control=control, stop_event=stop_event,
+                                       cache=cache, timeout=30)
+        if response is None:
+            return None
+        # Lanzará un error si la respuesta es 4xx o 5xx
+        response.raise_for_status() 
+        
+        # Extraer y aplanar los datos del JSON
+        extracted_info = extract_organization_data(response.json(), org_id)
+        
+        if extracted_info:
+            log_callback(f"✔ Datos de '{extracted_info.get('name', 'N/A')}' guardados.")
+            return [extracted_info]
+        log_callback(f"⚠  Advertencia: No se encontraron datos de organización en la respuesta para el ID {org_id}.")
+        return []
+
+    except requests.exceptions.HTTPError as e:
+        log_callback(f"❌ Error HTTP para el ID {org_id}: {e.response.status_code} {e.response.reason}")
+        # Fila de error para saber cuál falló
+        return [{'ID_BUSCADO': org_id, 'name': f'{PREFIJO_ERROR}: {e.response.status_code}'}]
+    except requests.exceptions.RequestException as e:
+        log_callback(f"❌ Ocurrió un error de conexión para el ID {org_id}: {e}")
+        return [{'ID_BUSCADO': org_id, 'name': f'{PREFIJO_ERROR} DE CONEXIÓN'}]
+
+def _es_fila_error(fila):
+    return str(fila.get('name') or '').startswith(PREFIJO_ERROR)
+
+def _es_error_transitorio(fila):
+    """
+    Errores que se reintentan al reanudar: conexión, 429 y 5xx. Un 400/404/422
+    (ID inválido o inexistente) es definitivo y su fila de error se guarda.
+    """
+    if not _es_fila_error(fila):
+        return False
+    estado = str(fila['name'])[len(PREFIJO_ERROR):].lstrip(': ')
+    return not estado.isdigit() or int(estado) == 429 or int(estado) >= 500
+
 # --- PROCESO PRINCIPAL (AHORA `run`) ---
 
-def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_event):
+def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_event, requests_por_minuto=None,
+        max_workers=None, usar_cache=True, reanudar=True):
     """
     Recorre la lista de IDs de un CSV, consulta la API y guarda los resultados.
+    Las consultas se hacen en paralelo (max_workers) respetando el limitador de tasa
+    compartido de Apollo (requests_por_minuto). Cada ID se consulta con
+    GET /organizations/{id} (enriquecimiento completo).
+    El CSV conserva el orden de los IDs de entrada.
+    Con usar_cache=True se reutilizan respuestas guardadas en disco.
+    Con reanudar=True, si una ejecución anterior con los mismos IDs quedó incompleta,
+    se omiten los IDs ya escritos y se agrega al CSV existente.
     """
     
     # 1. Cargar los IDs desde el CSV
@@ -94,63 +162,63 @@ def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_ev
     # 2. Definir archivo de salida
     output_csv_file = os.path.join(output_folder, 'apollo_organizations_output.csv')
     
+    control = limitador_tasa.obtener_control('apollo', requests_por_minuto)
+    max_workers = max_workers or control.concurrencia_maxima
+    
     log_callback(f"🚀 Iniciando la extracción de {len(organization_ids)} organizaciones...")
+    log_callback(f"⚙️  Hasta {max_workers} consultas en paralelo.")
     log_callback(f"Los resultados se guardarán en: {output_csv_file}")
 
+    # Sesión compartida por los workers (pool del tamaño de max_workers)
+    sesion = cliente_http.sesion_apollo(api_key, pool_size=max_workers)
+    cache = cache_respuestas.obtener_cache(usar_cache)
+    
+    huella = bitacora.huella_trabajo(extractor='apollo_organizaciones', ids=organization_ids)
+    registro = bitacora.Bitacora(output_csv_file, huella, reanudar=reanudar)
+    
+    def consultar(org_id):
+        return _consultar_organizacion(sesion, control, cache, org_id, log_callback, stop_event)
+    
+    # IDs pendientes, por posición (al reanudar se omiten los ya escritos)
+    pendientes = [(num_id, org_id) for num_id, org_id in enumerate(organization_ids) if not registro.completada(num_id)]
+    if registro.reanudando:
+        log_callback(f"♻️  Reanudando trabajo interrumpido: {len(organization_ids) - len(pendientes)} de {len(organization_ids)} IDs ya estaban guardados.")
+    completo = False
+    guardadas = 0
+    ids_fallidos = 0
+    ids_con_error = 0
+
     # 3. Abrir el archivo CSV para escribir los datos
     try:
-        with open(output_csv_file, mode='w', newline='', encoding='utf-8') as csv_file:
+        with open(output_csv_file, mode='a' if registro.reanudando else 'w', newline='', encoding='utf-8') as csv_file:
             writer = csv.DictWriter(csv_file, fieldnames=CSV_HEADERS)
-            writer.writeheader() # Escribir la fila de encabezado
-
-            for org_id in organization_ids:
-                
-                # --- CAMBIO: Verificar señal de detención ---
-                if stop_event.is_set():
-                    log_callback("🛑 Proceso cancelado por el usuario.")
-                    break
-                
-                # Construir la URL para el ID actual
-                url = f"https://api.apollo.io/api/v1/organizations/{org_id}"
-                
-                # --- CAMBIO: Usar la api_key del argumento ---
-                params = {'api_key': api_key}
-                headers = {
-                    'Cache-Control': 'no-cache',
-                    'Content-Type': 'application/json',
-                    'x-api-key': api_key, # --- CAMBIO
-                    'accept': 'application/json'
-                }
-                
-                log_callback(f"\nConsultando ID: {org_id}...")
-                
-                try:
-                    response = requests.get(url, headers=headers, params=params)
-                    # Lanzará un error si la respuesta es 4xx o 5xx
-                    response.raise_for_status() 
-                    
-                    data = response.json()
-                    
-                    # Extraer y aplanar los datos del JSON
-                    extracted_info = extract_organization_data(data, org_id)
+            if not registro.reanudando:
+                writer.writeheader() # Escribir la fila de encabezado
+
+            # El vigilante aborta los requests en vuelo apenas se cancela
+            with cliente_http.VigilanteCancelacion(stop_event, sesion), \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # executor.map entrega los resultados en el orden de los IDs de entrada
+                resultados = executor.map(consultar, [org_id for _, org_id in pendientes])
+                for (num_id, org_id), filas in zip(pendientes, resultados):
+                    # Un ID cancelado no se escribe: se repite al reanudar.
+                    # Tampoco uno con un error transitorio: queda pendiente y se reintenta al reanudar.
+                    if filas is not None and any(_es_error_transitorio(fila) for fila in filas):
+                        ids_fallidos += 1
+                    elif filas is not None:
+                        writer.writerows(filas)
+                        csv_file.flush()
+                        registro.marcar(num_id)
+                        errores = sum(1 for fila in filas if _es_fila_error(fila))
+                        ids_con_error += errores
+                        guardadas += len(filas) - errores
                     
-                    if extracted_info:
-                        # Escribir la fila de datos en el CSV
-                        writer.writerow(extracted_info)
-                        log_callback(f"✔ Datos de '{extracted_info.get('name', 'N/A')}' guardados.")
-                    else:
-                        log_callback(f"⚠  Advertencia: No se encontraron datos de organización en la respuesta para el ID {org_id}.")
-
-                except requests.exceptions.HTTPError as e:
-                    log_callback(f"❌ Error HTTP para el ID {org_id}: {e.response.status_code} {e.response.reason}")
-                    # Escribir una fila de error para saber cuál falló
-                    writer.writerow({'ID_BUSCADO': org_id, 'name': f'ERROR: {e.response.status_code}'})
-                except requests.exceptions.RequestException as e:
-                    log_callback(f"❌ Ocurrió un error de conexión para el ID {org_id}: {e}")
-                    writer.writerow({'ID_BUSCADO': org_id, 'name': 'ERROR DE CONEXIÓN'})
-                
-                # Pausa de 1 segundo entre solicitudes para no sobrecargar la API
-                time.sleep(1)
+                    # --- CAMBIO: Verificar señal de detención ---
+                    if stop_event.is_set():
+                        log_callback("🛑 Proceso cancelado por el usuario.")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+        completo = not stop_event.is_set() and ids_fallidos == 0
 
     except IOError as e:
         log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {e}")
@@ -158,10 +226,19 @@ def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_ev
     except Exception as e:
         log_callback(f"❌ ERROR INESPERADO: {e}")
         return
+    finally:
+        sesion.close()
+        registro.cerrar(completo)
 
     if stop_event.is_set():
-        log_callback(f"\n🚫 Proceso cancelado. Los resultados parciales se guardaron en '{output_csv_file}'.")
+        log_callback(f"\n🚫 Proceso cancelado. Se guardaron {guardadas} organizaciones parciales en '{output_csv_file}'.")
     else:
         log_callback(f"\n🎉 ¡Proceso completado! Los datos han sido guardados en el archivo '{output_csv_file}'.")
+    if ids_con_error:
+        log_callback(f"⚠  {ids_con_error} IDs con error definitivo (p. ej. 404) quedaron marcados con '{PREFIJO_ERROR}' en el CSV.")
+    if ids_fallidos:
+        log_callback(f"⚠  {ids_fallidos} IDs con error transitorio (conexión, 429 o 5xx) no se guardaron.")
+    if not completo:
+        log_callback("♻️  Vuelve a ejecutar con el mismo archivo de IDs para continuar donde quedó.")
 
 # --- Fin del script (No se necesita __main__) ---
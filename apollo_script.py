@@ -2,52 +2,217 @@ import requests
 import json
 import csv
 import os
-import re
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 import threading
 
+import bitacora
+import cache_respuestas
+import cliente_http
+import conjunto_ids
+import escritor_csv
+import limitador_tasa
+import normalizador_cargos
+import planificador
+import resolucion_entidades
+
+# Apollo entrega como máximo 100 registros por página
+POR_PAGINA = 100
+# Tope de páginas que se siguen por tarea (empresa + país + chunk de cargos)
+MAX_PAGINAS = 50
+
+# Columnas de contacto que pasan por limpiar_texto (en el orden de ApolloScraper._valores_texto)
+CAMPOS_TEXTO = (
+    "first_name", "last_name", "name", "title", "headline", "state", "city", "country",
+    "organization_name", "raw_number", "sanitized_number",
+)
+
+# Caracteres que limpiar_texto conserva: ASCII imprimible y vocales con tilde, ñ y ü
+_PERMITIDOS_EXTRA = set('áéíóúÁÉÍÓÚñÑüÜ')
+
+class _TablaLimpieza(dict):
+    """Tabla para str.translate: \\n, \\r y \\t pasan a espacio, lo no permitido se borra (se completa al vuelo)."""
+    def __missing__(self, codigo):
+        valor = codigo if (0x20 <= codigo <= 0x7E or chr(codigo) in _PERMITIDOS_EXTRA) else None
+        self[codigo] = valor
+        return valor
+
+_TABLA_LIMPIEZA = _TablaLimpieza({ord('\n'): ' ', ord('\r'): ' ', ord('\t'): ' '})
+
 def limpiar_texto(texto):
+    """Quita saltos de línea, caracteres de control y no permitidos, y colapsa espacios."""
     if texto is None or not isinstance(texto, str):
         return texto if texto is not None else ""
-    texto = texto.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    texto = re.sub(r'[^\x20-\x7EáéíóúÁÉÍÓÚñÑüÜ]', '', texto)
-    texto = ' '.join(texto.split())
-    return texto.strip()
+    if texto.isascii() and texto.isprintable():
+        # Camino rápido (la gran mayoría): solo puede sobrar espacio
+        if '  ' not in texto and texto[:1] != ' ' and texto[-1:] != ' ':
+            return texto
+        return ' '.join(texto.split())
+    return ' '.join(texto.translate(_TABLA_LIMPIEZA).split())
+
+def limpiar_textos(textos):
+    """limpiar_texto sobre una columna completa (iterable); retorna una lista."""
+    return [limpiar_texto(texto) for texto in textos]
+
+# Búsquedas adaptativas: cada empresa empieza con TODOS los cargos en un
+# solo request, por país o (con agrupar_paises) con todos los países juntos.
+# Si la primera página informa más resultados de los que se pueden paginar
+# (max_paginas), la búsqueda se divide en dos mitades y se busca cada una por
+# separado, recursivamente: primero por países y, con un solo país, por
+# cargos. Las que no desbordan nunca se dividen. Cada búsqueda se identifica
+# por su ruta en el árbol de divisiones ("" = inicial, "a"/"b" = mitades de
+# los países, "0"/"1" = mitades de los cargos), así la bitácora puede
+# reconstruirlas al reanudar. En las tareas, 'paises' es siempre una tupla.
+
+def dividir_lista(valores):
+    """Mitades de una lista o tupla (la primera se lleva el sobrante)"""
+    mitad = (len(valores) + 1) // 2
+    return valores[:mitad], valores[mitad:]
+
+def dividir_busqueda(paises, cargos, ruta):
+    """Las dos búsquedas (paises, cargos, ruta) en que se divide una que desborda"""
+    if len(paises) > 1:
+        return [(mitad, cargos, ruta + paso) for paso, mitad in zip("ab", dividir_lista(paises))]
+    return [(paises, mitad, ruta + paso) for paso, mitad in zip("01", dividir_lista(cargos))]
+
+def etiqueta_paises(paises):
+    """'Peru' / 'Peru, Chile' / '12 países' para los logs"""
+    return ", ".join(paises) if len(paises) <= 3 else f"{len(paises)} países"
+
+class TareasIniciales:
+    """
+    Primera página de cada empresa × país (o empresa × todos los países, con
+    agrupar_paises), con todos los cargos; generada bajo demanda (no se
+    materializa la lista) y con len() conocido.
+    """
+    def __init__(self, empresas, paises, cargos, agrupar_paises=False):
+        self.empresas = empresas
+        self.grupos = [tuple(paises)] if agrupar_paises and paises else [(pais,) for pais in paises]
+        self.cargos = cargos
+    
+    def __len__(self):
+        return len(self.empresas) * len(self.grupos) if self.cargos else 0
+    
+    def __iter__(self):
+        if not self.cargos:
+            return
+        for empresa in self.empresas:
+            for paises in self.grupos:
+                yield (empresa, paises, self.cargos, "", 1)
+
+def prioridad_por_defecto(tarea):
+    """Páginas siguientes antes que tareas nuevas: termina lo empezado antes de abrir más empresas"""
+    return 0 if tarea[4] > 1 else 1
 
 class ApolloScraper:
-    def __init__(self, api_key, output_folder, log_callback, stop_event):
+    def __init__(self, api_key, output_folder, log_callback, stop_event, max_paginas=MAX_PAGINAS,
+                 max_workers=None, requests_por_minuto=None, usar_cache=True, reanudar=True, ids_compactos=False,
+                 agrupar_paises=False, normalizador=None):
         self.api_key = api_key
         self.output_folder = output_folder
         self.log_callback = log_callback
         self.stop_event = stop_event
+        self.max_paginas = max(1, int(max_paginas))
+        # Reanudar un trabajo interrumpido con los mismos parámetros (ver bitacora.py)
+        self.reanudar = reanudar
+        # Varios países por request (se dividen solo si se supera el tope de paginación)
+        self.agrupar_paises = agrupar_paises
+        # Estandarización de cargos en línea (normalizador_cargos.NormalizadorCargos, opcional)
+        self.normalizador = normalizador
+        self.bitacora = None
+        self.escritor = None
         
-        self.url = "https://api.apollo.io/api/v1/contacts/search"
-        self.headers = {
-            'Cache-Control': 'no-cache',
-            'Content-Type': 'application/json',
-            'accept': 'application/json',
-            'x-api-key': api_key
-        }
+        # Control de tráfico compartido por todos los workers de Apollo: el pool de
+        # threads se dimensiona al máximo y la concurrencia real se adapta a los 429
+        self.control = limitador_tasa.obtener_control('apollo', requests_por_minuto)
+        self.max_workers = max_workers or self.control.concurrencia_maxima
+        
+        self.url = f"{cliente_http.APOLLO_BASE_URL}/contacts/search"
+        # Sesión compartida por todos los workers (pool del tamaño de max_workers)
+        self.sesion = cliente_http.sesion_apollo(api_key, pool_size=self.max_workers)
+        # Caché en disco de respuestas (usar_cache=False para forzar requests reales)
+        self.cache = cache_respuestas.obtener_cache(usar_cache)
+        # Requests idénticos de la corrida comparten un solo envío
+        self.vuelo_unico = cliente_http.VueloUnico()
         
         self.resultados = []
-        self.ids_encontrados = set()
-        self.write_lock = Lock()
-        self.stats_lock = Lock()
+        # Deduplicación por página en un conjunto por fragmentos (ids_compactos: hashes de 64 bits)
+        self.ids_encontrados = conjunto_ids.ConjuntoIds(compacto=ids_compactos)
         
-        self.total_encontrados = 0
-        self.total_requests = 0
+        # Cada contador con su propio lock: no compiten entre sí ni con la deduplicación
+        self._encontrados = conjunto_ids.Contador()
+        self._requests = conjunto_ids.Contador()
+        self._fallidas = conjunto_ids.Contador()
         self.empresas_procesadas = 0
         
         self.campos = [
-            "empresa_buscada", "origen", "id", "first_name", "last_name", "name", "linkedin_url", 
+            "empresa_buscada", "pais_buscado", "origen", "id", "first_name", "last_name", "name", "linkedin_url", 
             "title", "headline", "email_status", "email", "state", "city", "country", 
             "organization_name", "organization_id", "raw_number", "sanitized_number", "contact_email"
         ]
+        if normalizador is not None:
+            self.campos = normalizador_cargos.agregar_campos_salida(self.campos)
         
         self.output_file = os.path.join(output_folder, "resultados_apollo.csv")
-        self._inicializar_csv()
+    
+    @property
+    def total_encontrados(self):
+        return self._encontrados.valor
+    
+    @property
+    def total_requests(self):
+        return self._requests.valor
+    
+    @property
+    def tareas_fallidas(self):
+        return self._fallidas.valor
+    
+    def _preparar_trabajo(self, empresas, cargos, paises):
+        """
+        Abre la bitácora del trabajo y prepara el CSV de salida. Si hay un trabajo
+        interrumpido con los mismos parámetros, conserva el CSV, recupera los IDs
+        ya escritos y retorna solo las tareas pendientes.
+        """
+        empresas = resolucion_entidades.deduplicar_empresas(empresas, self.log_callback)
+        tareas = self._generar_tareas(empresas, cargos, paises)
+        huella = bitacora.huella_trabajo(
+            extractor="apollo_contactos", empresas=[e.strip() for e in empresas],
+            cargos=cargos, paises=paises, max_paginas=self.max_paginas, chunks="adaptativos",
+            agrupar_paises=self.agrupar_paises, campos=self.campos
+        )
+        self.bitacora = bitacora.Bitacora(self.output_file, huella, reanudar=self.reanudar)
+        if not self.bitacora.reanudando:
+            self._inicializar_csv()
+            self._abrir_escritor()
+            return tareas
+        
+        self._rehidratar_ids()
+        self._abrir_escritor()
+        pendientes = self.bitacora.pendientes(
+            tareas,
+            clave_de=lambda t: (t[0], t[1], t[3], t[4]),
+            con_pagina=self._tarea_siguiente
+        )
+        self.log_callback(
+            f"♻️  Reanudando trabajo interrumpido: {len(self.bitacora.completadas)} requests ya completados, "
+            f"{len(self.ids_encontrados)} contactos recuperados de {os.path.basename(self.output_file)}."
+        )
+        return pendientes
+    
+    def _tarea_siguiente(self, tarea, siguiente):
+        """Tarea registrada en la bitácora: número de página, o ruta (str) de una mitad de la búsqueda"""
+        empresa, paises, cargos, ruta = tarea[:4]
+        if isinstance(siguiente, str):
+            for paises_hija, cargos_hija, ruta_hija in dividir_busqueda(paises, cargos, ruta):
+                if ruta_hija == siguiente:
+                    return (empresa, paises_hija, cargos_hija, ruta_hija, 1)
+        return tarea[:4] + (siguiente,)
+    
+    def _rehidratar_ids(self):
+        """Carga en ids_encontrados los contactos ya escritos en el CSV parcial"""
+        with open(self.output_file, mode="r", newline="", encoding="utf-8-sig") as f:
+            ids = [fila.get("id") for fila in csv.DictReader(f)]
+        self._encontrados.sumar(len(self.ids_encontrados.filtrar_nuevos(ids)))
     
     def _inicializar_csv(self):
         """Crea el archivo CSV con encabezados"""
@@ -61,15 +226,18 @@ class ApolloScraper:
             writer = csv.DictWriter(f, fieldnames=self.campos)
             writer.writeheader()
     
-    def _escribir_resultados(self, nuevos_resultados):
-        """Escribe resultados de forma incremental y thread-safe"""
-        if not nuevos_resultados:
-            return
-        
-        with self.write_lock:
-            with open(self.output_file, mode="a", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=self.campos)
-                writer.writerows(nuevos_resultados)
+    def _abrir_escritor(self):
+        """Thread escritor único del CSV (un solo file handle abierto, flush por lotes)"""
+        self.escritor = escritor_csv.EscritorCSV(self.output_file, self.campos, modo="a", encoding="utf-8-sig")
+    
+    def _escribir_resultados(self, nuevos_resultados, al_escribir=None):
+        """
+        Encola los resultados para el thread escritor. 'al_escribir' se ejecuta
+        cuando las filas ya están en disco (p. ej. marcar la tarea en la bitácora).
+        """
+        if self.normalizador is not None and nuevos_resultados:
+            self.normalizador.enriquecer_filas(nuevos_resultados, "title")
+        self.escritor.escribir(nuevos_resultados, al_escribir)
     
     def safe_get(self, dct, *keys):
         for key in keys:
@@ -86,184 +254,305 @@ class ApolloScraper:
                 return None
         return dct
     
-    def _hacer_request(self, payload, retry_count=0, max_retries=3):
-        """Realiza un request con manejo de errores y retry logic"""
+    def _hacer_request(self, payload):
+        """
+        Realiza un request respetando el limitador de tasa de Apollo.
+        Los 429 se reintentan según Retry-After dentro de cliente_http.enviar.
+        """
         try:
-            response = requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-            
-            if response.status_code == 200:
+            response = cliente_http.enviar(
+                self.sesion, "POST", self.url,
+                control=self.control, stop_event=self.stop_event, cache=self.cache,
+                vuelo_unico=self.vuelo_unico, json=payload, timeout=30
+            )
+            if response is not None and response.status_code == 200:
                 return response.json()
-            
-            elif response.status_code == 429:
-                if retry_count < max_retries:
-                    wait_time = min(2 ** retry_count, 10)  # Backoff exponencial, máx 10s
-                    time.sleep(wait_time)
-                    return self._hacer_request(payload, retry_count + 1, max_retries)
-                return None
-            
-            else:
-                return None
+            return None
                 
-        except Exception as e:
-            if retry_count < max_retries:
-                time.sleep(1)
-                return self._hacer_request(payload, retry_count + 1, max_retries)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log_callback(
+                f"❌ Error en request de {payload.get('q_organization_name')} "
+                f"(página {payload.get('page')}): {e}"
+            )
             return None
     
-    def _procesar_contactos(self, contacts, empresa_buscada):
+    @staticmethod
+    def _pais_buscado(person, paises):
+        """
+        País de la búsqueda al que corresponde el contacto: el único país si la
+        búsqueda era de uno solo o, con varios, el que coincide con su 'country'.
+        """
+        if len(paises) == 1:
+            return paises[0]
+        pais = (person.get("country") or "").strip().lower()
+        for buscado in paises:
+            if buscado.strip().lower() == pais:
+                return buscado
+        return ""
+    
+    def _procesar_contactos(self, contacts, empresa_buscada, paises):
         """Procesa lista de contactos y retorna solo los nuevos"""
-        nuevos_resultados = []
-        
+        # Deduplicación de la página completa en una sola operación
+        ids_nuevos = set(self.ids_encontrados.filtrar_nuevos([person.get("id") for person in contacts]))
+        nuevos = []
         for person in contacts:
             p_id = person.get("id")
-            
-            # Verificación thread-safe de IDs duplicados
-            with self.stats_lock:
-                if p_id and p_id not in self.ids_encontrados:
-                    self.ids_encontrados.add(p_id)
-                else:
-                    continue  # Skip duplicados
-            
-            nuevos_resultados.append({
-                "empresa_buscada": limpiar_texto(empresa_buscada),
+            if p_id in ids_nuevos:
+                ids_nuevos.discard(p_id)  # Un ID repetido en la misma página se toma una vez
+                nuevos.append(person)
+        
+        # Limpieza de texto por columnas para toda la página de una vez
+        textos = limpiar_textos(valor for person in nuevos for valor in self._valores_texto(person))
+        por_contacto = zip(*[iter(textos)] * len(CAMPOS_TEXTO))
+        empresa_limpia = limpiar_texto(empresa_buscada)
+        
+        nuevos_resultados = []
+        for person, limpios in zip(nuevos, por_contacto):
+            fila = dict(zip(CAMPOS_TEXTO, limpios))
+            fila.update({
+                "empresa_buscada": empresa_limpia,
+                "pais_buscado": self._pais_buscado(person, paises),
                 "origen": "contacts_api",
-                "id": p_id,
-                "first_name": limpiar_texto(person.get("first_name")),
-                "last_name": limpiar_texto(person.get("last_name")),
-                "name": limpiar_texto(person.get("name")),
+                "id": person.get("id"),
                 "linkedin_url": person.get("linkedin_url"),
-                "title": limpiar_texto(person.get("title")),
-                "headline": limpiar_texto(person.get("headline")),
                 "email_status": person.get("email_status"),
                 "email": person.get("email"),
-                "state": limpiar_texto(person.get("state")),
-                "city": limpiar_texto(person.get("city")),
-                "country": limpiar_texto(person.get("country")),
-                "organization_name": limpiar_texto(self.safe_get(person, "organization", "name")),
                 "organization_id": self.safe_get(person, "organization", "id"),
-                "raw_number": limpiar_texto(self.safe_get(person, "phone_numbers", 0, "raw_number")),
-                "sanitized_number": limpiar_texto(self.safe_get(person, "phone_numbers", 0, "sanitized_number")),
                 "contact_email": person.get("contact_email")
             })
+            nuevos_resultados.append(fila)
         
         return nuevos_resultados
+
+    def _valores_texto(self, person):
+        """Valores crudos de las columnas de CAMPOS_TEXTO, en el mismo orden"""
+        return (
+            person.get("first_name"), person.get("last_name"), person.get("name"),
+            person.get("title"), person.get("headline"),
+            person.get("state"), person.get("city"), person.get("country"),
+            self.safe_get(person, "organization", "name"),
+            self.safe_get(person, "phone_numbers", 0, "raw_number"),
+            self.safe_get(person, "phone_numbers", 0, "sanitized_number"),
+        )
     
-    def _procesar_tarea(self, empresa, pais, chunk_cargos, chunk_idx):
-        """Procesa una tarea individual (empresa + país + chunk de cargos)"""
+    def _procesar_tarea(self, empresa, paises, chunk_cargos, chunk_idx, page=1):
+        """
+        Procesa una tarea individual (empresa + países + chunk de cargos + página).
+        Retorna (contactos_nuevos, tareas_siguientes): si es la primera página,
+        tareas_siguientes contiene las páginas restantes según la paginación de Apollo
+        (o las dos mitades de la búsqueda, si tiene más resultados de los que se pueden paginar).
+        """
         if self.stop_event.is_set():
-            return 0
+            return 0, []
         
-        payload = {
+        payload = self._construir_payload(empresa, paises, chunk_cargos, page)
+        data = self._hacer_request(payload)
+        return self._procesar_respuesta(data, empresa, paises, chunk_cargos, chunk_idx, page)
+    
+    def _construir_payload(self, empresa, paises, chunk_cargos, page):
+        return {
             "q_organization_name": empresa,
-            "organization_locations": [pais],
+            "organization_locations": list(paises),
             "person_titles": chunk_cargos,
-            "page": 1,
-            "per_page": 100
+            "page": page,
+            "per_page": POR_PAGINA
         }
-        
-        data = self._hacer_request(payload)
-        
-        with self.stats_lock:
-            self.total_requests += 1
+    
+    def _procesar_respuesta(self, data, empresa, paises, chunk_cargos, chunk_idx, page):
+        """
+        Procesa la respuesta de una tarea (compartido por el motor de threads y el asíncrono).
+        Retorna (contactos_nuevos, tareas_siguientes).
+        """
+        self._requests.sumar()
+        if not data and not self.stop_event.is_set():
+            self._fallidas.sumar()
         
         if not data:
-            return 0
+            return 0, []
         
         contacts = data.get('contacts', [])
-        nuevos_resultados = self._procesar_contactos(contacts, empresa)
+        nuevos_resultados = self._procesar_contactos(contacts, empresa, paises)
         
-        # Escritura incremental
         if nuevos_resultados:
-            self._escribir_resultados(nuevos_resultados)
-            with self.stats_lock:
-                self.total_encontrados += len(nuevos_resultados)
+            self._encontrados.sumar(len(nuevos_resultados))
         
-        return len(nuevos_resultados)
+        # Solo la primera página reparte las páginas siguientes (o divide la búsqueda)
+        tareas_siguientes = []
+        siguientes = []
+        if page == 1:
+            total_paginas = self._total_paginas(data)
+            if total_paginas > self.max_paginas and (len(paises) > 1 or len(chunk_cargos) > 1):
+                # No se puede paginar todo: se busca cada mitad (de países o de cargos) por separado
+                # (los contactos de esta primera página ya se guardaron; los repetidos se descartan)
+                mitades = dividir_busqueda(paises, chunk_cargos, chunk_idx)
+                self.log_callback(
+                    f"🔀 {empresa} - {etiqueta_paises(paises)}: {total_paginas} páginas con "
+                    f"{len(paises)} países × {len(chunk_cargos)} cargos, se divide en 2 búsquedas."
+                )
+                for paises_hija, cargos_hija, ruta_hija in mitades:
+                    tareas_siguientes.append((empresa, paises_hija, cargos_hija, ruta_hija, 1))
+                    siguientes.append(ruta_hija)
+            else:
+                ultima_pagina = min(total_paginas, self.max_paginas)
+                if total_paginas > self.max_paginas:
+                    self.log_callback(
+                        f"⚠️  {empresa} - {etiqueta_paises(paises)} ({', '.join(chunk_cargos)}): {total_paginas} "
+                        f"páginas disponibles, se limitará a {self.max_paginas} (máx. páginas configurado)."
+                    )
+                tareas_siguientes = [
+                    (empresa, paises, chunk_cargos, chunk_idx, pagina)
+                    for pagina in range(2, ultima_pagina + 1)
+                ]
+                siguientes = list(range(2, ultima_pagina + 1))
+        
+        # Escritura incremental: la tarea (y sus páginas o mitades) se registra en la
+        # bitácora recién cuando el thread escritor dejó sus filas en disco
+        self._escribir_resultados(
+            nuevos_resultados,
+            al_escribir=lambda: self.bitacora.marcar(empresa, paises, chunk_idx, page, siguientes=siguientes)
+        )
+        
+        return len(nuevos_resultados), tareas_siguientes
+    
+    def _total_paginas(self, data):
+        """Calcula el total de páginas a partir del bloque 'pagination' de la respuesta"""
+        total_paginas = self.safe_get(data, "pagination", "total_pages")
+        if total_paginas is None:
+            total_entradas = self.safe_get(data, "pagination", "total_entries")
+            if total_entradas is None:
+                return 1
+            total_paginas = -(-int(total_entradas) // POR_PAGINA)
+        try:
+            return max(int(total_paginas), 1)
+        except (TypeError, ValueError):
+            return 1
+    
+    def _generar_tareas(self, empresas, cargos, paises):
+        """Tareas iniciales (primera página de cada combinación), generadas bajo demanda"""
+        return TareasIniciales([empresa.strip() for empresa in empresas], paises, list(cargos), self.agrupar_paises)
     
-    def ejecutar_busqueda(self, empresas, cargos, paises, max_workers=10):
+    def ejecutar_busqueda(self, empresas, cargos, paises, max_workers=None, prioridad=prioridad_por_defecto):
         """
         Ejecuta la búsqueda con procesamiento paralelo
-        max_workers: número de threads paralelos (ajusta según tu plan de Apollo)
+        max_workers: número de threads paralelos (por defecto, el del constructor)
+        prioridad: prioridad(tarea) -> valor ordenable, menor sale primero
+          (p. ej. empresas más chicas primero: lambda t: (t[4] == 1, tamano[t[0]]))
+        Las tareas se envían con ventana acotada (2 × max_workers en vuelo) y las
+        páginas siguientes de cada tarea se agregan a medida que la primera
+        página informa el total de resultados.
         """
+        max_workers = max_workers or self.max_workers
         self.log_callback(f"🚀 Iniciando búsqueda optimizada...")
         self.log_callback(f"📊 {len(empresas)} empresas × {len(paises)} países × {len(cargos)} cargos")
         
-        # Preparar chunks de cargos
-        chunk_size = 10
-        chunks_cargos = [cargos[i:i + chunk_size] for i in range(0, len(cargos), chunk_size)]
-        
-        # Crear lista de todas las tareas
-        tareas = []
-        for empresa in empresas:
-            empresa_clean = empresa.strip()
-            for pais in paises:
-                for idx, chunk in enumerate(chunks_cargos):
-                    tareas.append((empresa_clean, pais, chunk, idx))
+        tareas = self._preparar_trabajo(empresas, cargos, paises)
         
         total_tareas = len(tareas)
-        self.log_callback(f"⚙️  Total de requests a realizar: {total_tareas}")
-        self.log_callback(f"🔄 Procesando con {max_workers} workers paralelos...\n")
+        self.log_callback(f"⚙️  Total de requests iniciales: {total_tareas} (máx. {self.max_paginas} páginas por tarea)")
+        self.log_callback(
+            f"🔄 Procesando con hasta {max_workers} workers paralelos "
+            f"(concurrencia adaptativa, {self.control.bucket.requests_por_minuto:.0f} req/min)...\n"
+        )
         
         tareas_completadas = 0
         ultimo_reporte = 0
         
-        # Procesamiento paralelo
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Enviar todas las tareas
-            futures = {
-                executor.submit(self._procesar_tarea, empresa, pais, chunk, idx): (empresa, pais)
-                for empresa, pais, chunk, idx in tareas
-            }
-            
-            # Procesar resultados a medida que completan
-            for future in as_completed(futures):
-                if self.stop_event.is_set():
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    break
-                
-                empresa, pais = futures[future]
+        # Procesamiento paralelo con ventana acotada: las tareas se generan a
+        # medida que hay lugar y las páginas siguientes entran por prioridad
+        # El vigilante aborta los requests en vuelo apenas se cancela
+        with cliente_http.VigilanteCancelacion(self.stop_event, self.sesion), \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            plan = planificador.Planificador(
+                executor, self._procesar_tarea, tareas, ventana=2 * max_workers,
+                stop_event=self.stop_event, prioridad=prioridad
+            )
+            for tarea, future in plan.completados():
+                empresa, paises = tarea[:2]
                 try:
-                    encontrados = future.result()
+                    encontrados, tareas_siguientes = future.result()
                     tareas_completadas += 1
                     
-                    # Reportar progreso cada 5%
-                    progreso = (tareas_completadas / total_tareas) * 100
-                    if progreso - ultimo_reporte >= 5:
-                        with self.stats_lock:
-                            self.log_callback(
-                                f"📈 Progreso: {progreso:.0f}% | "
-                                f"Requests: {self.total_requests}/{total_tareas} | "
-                                f"Contactos únicos: {self.total_encontrados}"
-                            )
-                        ultimo_reporte = progreso
+                    if tareas_siguientes and not self.stop_event.is_set():
+                        total_tareas += len(tareas_siguientes)
+                        for siguiente in tareas_siguientes:
+                            plan.agregar(siguiente)
+                    
+                    ultimo_reporte = self._reportar_progreso(tareas_completadas, total_tareas, ultimo_reporte)
                     
                 except Exception as e:
-                    self.log_callback(f"❌ Error en {empresa} - {pais}: {str(e)}")
+                    self.log_callback(f"❌ Error en {empresa} - {etiqueta_paises(paises)}: {str(e)}")
+        
+        self.sesion.close()
+        return self._reporte_final()
+    
+    def _reportar_progreso(self, tareas_completadas, total_tareas, ultimo_reporte):
+        """Reporta progreso cada 5%; retorna el porcentaje del último reporte"""
+        progreso = (tareas_completadas / max(total_tareas, 1)) * 100
+        if abs(progreso - ultimo_reporte) >= 5:
+            self.log_callback(
+                f"📈 Progreso: {progreso:.0f}% | "
+                f"Requests: {self.total_requests}/{total_tareas} | "
+                f"Contactos únicos: {self.total_encontrados}"
+            )
+            return progreso
+        return ultimo_reporte
+    
+    def _reporte_final(self):
+        if self.escritor is not None:
+            self.escritor.cerrar()
+            if self.escritor.error is not None:
+                self.log_callback(f"❌ ERROR: No se pudo escribir en {self.output_file}: {self.escritor.error}")
+        completo = not self.stop_event.is_set() and self.tareas_fallidas == 0 and (
+            self.escritor is None or self.escritor.error is None
+        )
+        if self.bitacora is not None:
+            self.bitacora.cerrar(completo)
         
-        # Reporte final
         self.log_callback(f"\n{'='*60}")
-        self.log_callback(f"✅ PROCESO COMPLETADO")
+        self.log_callback(f"✅ PROCESO COMPLETADO" if completo else f"⚠️  PROCESO INCOMPLETO")
         self.log_callback(f"{'='*60}")
         self.log_callback(f"📊 Total requests realizados: {self.total_requests}")
         self.log_callback(f"👥 Total contactos únicos encontrados: {self.total_encontrados}")
+        if self.cache is not None:
+            self.log_callback(f"💾 Respuestas en caché (acumulado del proceso): {self.cache.aciertos} aciertos / {self.cache.fallos} fallos")
+        if self.vuelo_unico.compartidos:
+            self.log_callback(f"🔗 Requests idénticos compartidos (sin reenviar): {self.vuelo_unico.compartidos}")
         self.log_callback(f"📁 Archivo generado: {self.output_file}")
+        if not completo:
+            if self.tareas_fallidas:
+                self.log_callback(f"⚠️  {self.tareas_fallidas} requests fallaron.")
+            self.log_callback(f"♻️  Vuelve a ejecutar con los mismos parámetros para continuar donde quedó.")
         self.log_callback(f"{'='*60}\n")
         
         return self.output_file if self.total_encontrados > 0 else None
 
 
-def run(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event):
+def run(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event, max_paginas=MAX_PAGINAS,
+        requests_por_minuto=None, usar_cache=True, reanudar=True, ids_compactos=False,
+        prioridad=prioridad_por_defecto, agrupar_paises=False, normalizador=None):
     """
     Función principal compatible con la interfaz existente
     
     Parámetros:
-    - max_workers: ajusta según tu plan de Apollo
-        * Plan básico: 3-5 workers
-        * Plan profesional: 10-15 workers  
-        * Plan enterprise: 20+ workers
+    - max_paginas: tope de páginas (de 100 contactos) que se siguen por tarea; si un
+      chunk de cargos tiene más resultados, se divide en dos y se busca cada mitad
+    - requests_por_minuto: techo de tu plan de Apollo (por defecto el de limitador_tasa).
+      La concurrencia ya no se ajusta a mano: sube sola mientras no haya 429 y
+      se reduce a la mitad cuando Apollo limita.
+    - usar_cache: reutiliza respuestas guardadas en disco (False fuerza requests reales)
+    - reanudar: si una ejecución anterior con los mismos parámetros quedó incompleta,
+      omite lo ya extraído y agrega al CSV existente (False empieza de cero)
+    - ids_compactos: deduplica con hashes de 64 bits (~16 bytes por contacto) para
+      corridas de varios millones de contactos
+    - prioridad: orden de envío de las tareas (ver ApolloScraper.ejecutar_busqueda)
+    - agrupar_paises: busca todos los países en el mismo request y solo los separa
+      si se supera max_paginas; cada contacto se atribuye a su país por 'country'
+      (columna pais_buscado)
+    - normalizador: NormalizadorCargos opcional; agrega al CSV las columnas
+      cargo_estandar y area calculadas en línea a partir de 'title'
     """
-    scraper = ApolloScraper(api_key, output_folder, log_callback, stop_event)
-    
-    # AJUSTA max_workers según tu plan de Apollo para evitar rate limits
-    # Valores recomendados: 5 (conservador), 10 (balanceado), 15 (agresivo)
-    return scraper.ejecutar_busqueda(empresas, cargos, paises, max_workers=10)
+    scraper = ApolloScraper(api_key, output_folder, log_callback, stop_event, max_paginas=max_paginas,
+                            requests_por_minuto=requests_por_minuto, usar_cache=usar_cache, reanudar=reanudar,
+                            ids_compactos=ids_compactos, agrupar_paises=agrupar_paises,
+                            normalizador=normalizador)
+    return scraper.ejecutar_busqueda(empresas, cargos, paises, prioridad=prioridad)
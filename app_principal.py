@@ -13,6 +13,8 @@ import apollo_script
 import apollo_org
 import lusha_org
 import signal_script
+import motor_async
+import normalizador_cargos
 
 class App(ctk.CTk):
     def __init__(self):
@@ -134,6 +136,21 @@ class App(ctk.CTk):
         self.lusha_org_button.pack(side="left", fill="x", expand=True, padx=(2, 2), pady=2)
         self.signal_contact_button = ctk.CTkButton(self.action_frame, text="SignalHere Contactos", command=lambda: self.start_process("SIGNAL_CONTACT"), height=30, font=("Arial", 12, "bold"), fg_color="#083588", hover_color="#0A46B6")
         self.signal_contact_button.pack(side="left", fill="x", expand=True, padx=(2, 2), pady=2)
+        # Motor asíncrono (asyncio + httpx) para Apollo/Lusha Contactos
+        self.async_checkbox = ctk.CTkCheckBox(self.action_frame, text="Motor asíncrono", checkbox_width=14, checkbox_height=14, font=("Arial", 11))
+        self.async_checkbox.pack(side="left", padx=(5, 2), pady=2)
+        if not motor_async.disponible():
+            self.async_checkbox.configure(state="disabled")
+        # Caché de respuestas en disco (desmarcar para forzar requests reales)
+        self.cache_checkbox = ctk.CTkCheckBox(self.action_frame, text="Usar caché", checkbox_width=14, checkbox_height=14, font=("Arial", 11))
+        self.cache_checkbox.select()
+        self.cache_checkbox.pack(side="left", padx=(5, 2), pady=2)
+        # Apollo Contactos: todos los países en el mismo request (se separan solo si hace falta)
+        self.agrupar_paises_checkbox = ctk.CTkCheckBox(self.action_frame, text="Agrupar países", checkbox_width=14, checkbox_height=14, font=("Arial", 11))
+        self.agrupar_paises_checkbox.pack(side="left", padx=(5, 2), pady=2)
+        # Apollo/Lusha Contactos: cargo estándar y área en línea (mapeos de la pestaña 2)
+        self.estandarizar_checkbox = ctk.CTkCheckBox(self.action_frame, text="Estandarizar cargos", checkbox_width=14, checkbox_height=14, font=("Arial", 11))
+        self.estandarizar_checkbox.pack(side="left", padx=(5, 2), pady=2)
         
         self.cancel_button = ctk.CTkButton(self.cancel_frame, text="Cancelar", command=self.cancel_process, height=30, font=("Arial", 14, "bold"), fg_color="#781A07", hover_color="#B32003", state="disabled")
         self.cancel_button.pack(fill="x", padx=5, pady=5)
@@ -182,6 +199,14 @@ class App(ctk.CTk):
 
         self.db_load_button = ctk.CTkButton(self.load_frame, text="Cargar a Base de Datos", height=30, font=("Arial", 14, "bold"), fg_color="#063F80", hover_color="#0854AA", command=self.load_to_db)
         self.db_load_button.pack(fill="x", expand=True, padx=15, pady=10)
+
+        # Carga incremental: fusiona por id/contactId en vez de reemplazar las tablas
+        self.incremental_checkbox = ctk.CTkCheckBox(self.load_frame, text="Carga incremental (solo nuevos/cambios)", font=("Arial", 12))
+        self.incremental_checkbox.pack(anchor="w", padx=15, pady=(0, 10))
+
+        # Resolución de entidades: une a la misma persona entre proveedores (la usa 'Consolidar')
+        self.resolver_checkbox = ctk.CTkCheckBox(self.load_frame, text="Resolver entidades entre proveedores", font=("Arial", 12))
+        self.resolver_checkbox.pack(anchor="w", padx=15, pady=(0, 10))
         
         self.db_consolidate_button = ctk.CTkButton(self.load_frame, text="Consolidar", height=30, font=("Arial", 14, "bold"), fg_color="#063F80", hover_color="#0854AA", command=self.consolidate_data)
         self.db_consolidate_button.pack(fill="x", expand=True, padx=15, pady=(0, 15))
@@ -320,6 +345,21 @@ class App(ctk.CTk):
             self.log(f"❌ ERROR al leer archivo CSV: {e}")
             raise
 
+    def _crear_normalizador(self):
+        """
+        Índice de cargos con los mapeos elegidos en la pestaña 2 (el mismo que usa
+        'Limpiar y Estandarizar'). Retorna None si no hay archivos de cargos.
+        """
+        cargos_v1_file = self.cargos_v1_csv_entry.get() or None
+        cargos_v2_file = self.cargos_v2_csv_entry.get() or None
+        areas_file = self.areas_csv_entry.get() or None
+        if not cargos_v1_file and not cargos_v2_file:
+            self.log("❌ ERROR: Para 'Estandarizar cargos' seleccione los archivos de Cargos (v1/v2) en la pestaña 2.")
+            return None
+        normalizador = normalizador_cargos.NormalizadorCargos.desde_archivos(cargos_v1_file, cargos_v2_file, areas_file)
+        self.log(f"✅ Estandarización de cargos: {len(normalizador.indice)} cargos de origen, {len(normalizador.areas)} con área.")
+        return normalizador
+
     # --- FUNCIONES DE CONTROL DE HILOS (Threads) ---
 
     def toggle_buttons(self, is_running: bool):
@@ -333,6 +373,11 @@ class App(ctk.CTk):
         self.lusha_contact_button.configure(state=state)
         self.lusha_org_button.configure(state=state)
         self.signal_contact_button.configure(state=state)
+        if motor_async.disponible():
+            self.async_checkbox.configure(state=state)
+        self.cache_checkbox.configure(state=state)
+        self.agrupar_paises_checkbox.configure(state=state)
+        self.estandarizar_checkbox.configure(state=state)
         
         cancel_state = "normal" if is_running else "disabled"
         self.cancel_button.configure(text="Cancelar", state=cancel_state)
@@ -367,6 +412,8 @@ class App(ctk.CTk):
         self.db_consolidate_button.configure(state="disabled")
         self.db_test_button.configure(state="disabled")
         self.db_load_gestion_button.configure(state="disabled") # <-- AÑADIDO
+        self.incremental_checkbox.configure(state="disabled")
+        self.resolver_checkbox.configure(state="disabled")
 
     def _enable_tab2_buttons(self):
         """Habilita los botones de acción de la Pestaña 2."""
@@ -375,6 +422,8 @@ class App(ctk.CTk):
         self.db_consolidate_button.configure(state="normal")
         self.db_test_button.configure(state="normal")
         self.db_load_gestion_button.configure(state="normal") # <-- AÑADIDO
+        self.incremental_checkbox.configure(state="normal")
+        self.resolver_checkbox.configure(state="normal")
 
     def monitor_tab2_thread(self, thread):
         """Monitorea un hilo de la Pestaña 2 y reactiva los botones al finalizar."""
@@ -420,11 +469,16 @@ class App(ctk.CTk):
             "empresas_file": self.empresas_entry.get(),
             "id_org_file": self.id_org_entry.get(),
             "output_folder": self.output_entry.get(),
-            "paises": [pais for pais, cb in self.country_checkboxes.items() if cb.get()]
+            "paises": [pais for pais, cb in self.country_checkboxes.items() if cb.get()],
+            "motor_async": bool(self.async_checkbox.get()),
+            "usar_cache": bool(self.cache_checkbox.get()),
+            "agrupar_paises": bool(self.agrupar_paises_checkbox.get()),
+            "estandarizar_cargos": bool(self.estandarizar_checkbox.get())
         }
 
         target_func = None
         args = ()
+        kwargs = {}
         validation_ok = False
 
         try:
@@ -446,8 +500,13 @@ class App(ctk.CTk):
                 self.log(f"\n--- Iniciando Proceso: {process_type} ---")
                 self.log(f"✅ Validado. {len(empresas)} empresas y {len(cargos)} cargos.")
                 
-                target_func = apollo_script.run
+                target_func = motor_async.run_apollo if ui_values["motor_async"] else apollo_script.run
                 args = (ui_values["apollo_api"], empresas, cargos, ui_values["paises"], ui_values["output_folder"], self.log, self.stop_event)
+                kwargs = {"usar_cache": ui_values["usar_cache"], "agrupar_paises": ui_values["agrupar_paises"]}
+                if ui_values["estandarizar_cargos"]:
+                    kwargs["normalizador"] = self._crear_normalizador()
+                    if kwargs["normalizador"] is None:
+                        return
                 validation_ok = True
 
             elif process_type == "APOLLO_ORG":
@@ -462,6 +521,7 @@ class App(ctk.CTk):
 
                 target_func = apollo_org.run # Usa el script refactorizado
                 args = (ui_values["apollo_api"], ui_values["id_org_file"], ui_values["output_folder"], self.log, self.stop_event)
+                kwargs = {"usar_cache": ui_values["usar_cache"]}
                 validation_ok = True
 
             elif process_type == "LUSHA_CONTACT":
@@ -480,8 +540,13 @@ class App(ctk.CTk):
                 self.log(f"\n--- Iniciando Proceso: {process_type} ---")
                 self.log(f"✅ Validado. {len(empresas)} empresas y {len(cargos)} cargos.")
 
-                target_func = lusha_script.run
+                target_func = motor_async.run_lusha if ui_values["motor_async"] else lusha_script.run
                 args = (ui_values["lusha_api"], empresas, cargos, ui_values["paises"], ui_values["output_folder"], self.log, self.stop_event)
+                kwargs = {"usar_cache": ui_values["usar_cache"]}
+                if ui_values["estandarizar_cargos"]:
+                    kwargs["normalizador"] = self._crear_normalizador()
+                    if kwargs["normalizador"] is None:
+                        return
                 validation_ok = True
 
             elif process_type == "LUSHA_ORG":
@@ -500,6 +565,7 @@ class App(ctk.CTk):
 
                 target_func = lusha_org.run # Asumiendo que existe
                 args = (ui_values["lusha_api"], ui_values["id_org_file"], ui_values["output_folder"], self.log, self.stop_event)
+                kwargs = {"usar_cache": ui_values["usar_cache"]}
                 validation_ok = True
 
             elif process_type == "SIGNAL_CONTACT":
@@ -544,7 +610,7 @@ class App(ctk.CTk):
         # 3. Si la validación fue exitosa, lanzar el hilo
         if validation_ok and target_func:
             self.toggle_buttons(is_running=True)
-            thread = threading.Thread(target=target_func, args=args)
+            thread = threading.Thread(target=target_func, args=args, kwargs=kwargs)
             thread.start()
             self.monitor_thread(thread)
         else:
@@ -573,6 +639,7 @@ class App(ctk.CTk):
     def load_to_db(self):
         apollo_file = self.apollo_csv_entry.get()
         lusha_file = self.lusha_csv_entry.get()
+        signal_file = self.signal_csv_entry.get() or None # Opcional
         
         if not apollo_file or not lusha_file:
             self.log_tab2("❌ ERROR: Debe seleccionar los archivos CSV de Apollo y Lusha.")
@@ -583,18 +650,20 @@ class App(ctk.CTk):
         if db_params is None:
             return
 
-        self.log_tab2("\n--- Iniciando Carga a Base de Datos ---")
+        incremental = bool(self.incremental_checkbox.get())
+        resolver_entidades = bool(self.resolver_checkbox.get())
+        self.log_tab2(f"\n--- Iniciando Carga a Base de Datos{' (incremental)' if incremental else ''} ---")
         self._disable_tab2_buttons()
         
         thread = threading.Thread(
             target=db_operations.execute_load_to_db,
-            args=(db_params, apollo_file, lusha_file, self.log_tab2, self.after)
+            args=(db_params, apollo_file, lusha_file, self.log_tab2, self.after),
+            kwargs={"incremental": incremental, "signal_file": signal_file, "resolver_entidades": resolver_entidades}
         )
         thread.start()
         self.monitor_tab2_thread(thread)
         
     def clean_data(self):
-        # --- (FUTURA MEJORA) Pasar los archivos de areas/cargos ---
         areas_file = self.areas_csv_entry.get()
         cargos_v1_file = self.cargos_v1_csv_entry.get()
         cargos_v2_file = self.cargos_v2_csv_entry.get()
@@ -603,6 +672,10 @@ class App(ctk.CTk):
             self.log_tab2("❌ ERROR: Debe seleccionar los 3 archivos (Áreas, Cargos v1, Cargos v2) para limpiar.")
             messagebox.showwarning("Archivos Faltantes", "Debe seleccionar los archivos de Áreas y Cargos para estandarizar.")
             return
+
+        db_params = self._get_db_params()
+        if db_params is None:
+            return
         
         self.log_tab2("\n--- Iniciando Limpieza y Estandarización ---")
         self.log_tab2(f"Usando Áreas: {os.path.basename(areas_file)}")
@@ -611,23 +684,24 @@ class App(ctk.CTk):
         
         self._disable_tab2_buttons()
         
-        # (NOTA: db_operations.execute_clean_data necesita ser actualizado para aceptar estos archivos)
         thread = threading.Thread(
             target=db_operations.execute_clean_data,
-            # args=(self.log_tab2, areas_file, cargos_v1_file, cargos_v2_file) # <-- Así debería ser
-            args=(self.log_tab2,) # <-- Temporalmente como estaba
+            args=(db_params, areas_file, cargos_v1_file, cargos_v2_file, self.log_tab2, self.after)
         )
-        self.log_tab2("ADVERTENCIA: La lógica de 'clean_data' aún no usa los archivos seleccionados.")
         thread.start()
         self.monitor_tab2_thread(thread)
 
     def consolidate_data(self):
+        db_params = self._get_db_params()
+        if db_params is None:
+            return
+
         self.log_tab2("\n--- Iniciando Consolidación de Datos ---")
         self._disable_tab2_buttons()
         
         thread = threading.Thread(
             target=db_operations.execute_consolidate_data,
-            args=(self.log_tab2,)
+            args=(db_params, self.log_tab2, self.after)
         )
         thread.start()
         self.monitor_tab2_thread(thread)
@@ -640,4 +714,5 @@ class App(ctk.CTk):
 if __name__ == "__main__":
     app = App()
     app.mainloop()
+    db_operations.cerrar_conexiones()
 
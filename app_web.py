@@ -19,11 +19,14 @@ st.set_page_config(
 
 # Importar los scripts de extracción
 try:
+    import bitacora
     import apollo_script
     import apollo_org
     import lusha_script
     import lusha_org
+    import motor_async
 except ImportError as e:
+    motor_async = None  # Sin motor asíncrono: la opción queda deshabilitada
     st.warning(f"Advertencia: Algunos módulos no se cargaron correctamente: {e}")
 
 # ===== ESTILOS PERSONALIZADOS =====
@@ -68,10 +71,25 @@ def read_csv_list(uploaded_file):
     return []
 
 def clear_temp_folder(folder="temp_output"):
-    """Limpia archivos residuales en el servidor"""
-    if os.path.exists(folder):
-        shutil.rmtree(folder)
+    """
+    Limpia archivos residuales en el servidor, salvo los trabajos reanudables:
+    un CSV con su bitácora (.bitacora.jsonl) se conserva para que la siguiente
+    ejecución con los mismos parámetros continúe donde quedó.
+    """
     os.makedirs(folder, exist_ok=True)
+    conservar = set()
+    for nombre in os.listdir(folder):
+        ruta = os.path.join(folder, nombre)
+        if nombre.endswith(".csv") and os.path.exists(bitacora.ruta_bitacora(ruta)):
+            conservar.update({ruta, bitacora.ruta_bitacora(ruta)})
+    for nombre in os.listdir(folder):
+        ruta = os.path.join(folder, nombre)
+        if ruta in conservar:
+            continue
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta)
+        else:
+            os.remove(ruta)
 
 # ===== BARRA LATERAL (SIDEBAR) =====
 st.sidebar.title("🔑 Credenciales API")
@@ -94,6 +112,19 @@ for region, countries in paises_dict.items():
             if st.checkbox(country, key=f"c_{country}"):
                 selected_countries.append(country)
 
+st.sidebar.markdown("---")
+st.sidebar.title("⚙️ Motor de Ejecución")
+usar_async = st.sidebar.checkbox(
+    "⚡ Motor asíncrono (Contactos)",
+    help="Ejecuta Apollo/Lusha Contactos con asyncio: cientos de requests en vuelo en un solo hilo.",
+    disabled=motor_async is None or not motor_async.disponible()
+)
+usar_cache = st.sidebar.checkbox(
+    "💾 Usar caché de respuestas",
+    value=True,
+    help="Reutiliza respuestas de Apollo/Lusha guardadas en disco. Desmarca para forzar requests reales."
+)
+
 # ===== PANEL PRINCIPAL =====
 st.markdown('<div class="main-header">🔍 Extractor de Datos v4.3 (En Vivo)</div>', unsafe_allow_html=True)
 
@@ -138,8 +169,8 @@ with tab1:
     st.markdown('<div class="section-header">🚀 3. Ejecutar Extracción</div>', unsafe_allow_html=True)
     c1, c2, c3, c4 = st.columns(4)
 
-    def run_generic_process(module, name, *args):
-        """Función base para ejecutar cualquier script y capturar el log en vivo"""
+    def run_generic_process(run_func, name, *args, **kwargs):
+        """Función base para ejecutar cualquier script (su función run) y capturar el log en vivo"""
         st.session_state.console_log = [] 
         st.session_state.output_files = [] 
         clear_temp_folder()
@@ -150,8 +181,8 @@ with tab1:
         
         with st.spinner(f"Procesando {name}..."):
             try:
-                # Se asume que cada script tiene una función .run()
-                res_path = module.run(*args, "temp_output", live_callback, threading.Event())
+                # Todas las funciones run comparten la firma (..., output_folder, log_callback, stop_event)
+                res_path = run_func(*args, "temp_output", live_callback, threading.Event(), **kwargs)
                 
                 if res_path and os.path.exists(res_path) and os.path.getsize(res_path) > 60:
                     with open(res_path, 'r', encoding='utf-8-sig') as f:
@@ -168,7 +199,8 @@ with tab1:
     with c1:
         if st.button("🟡 Apollo Contactos"):
             if apollo_api and cargos_list and empresas_list and selected_countries:
-                run_generic_process(apollo_script, "Apollo Contactos", apollo_api, empresas_list, cargos_list, selected_countries)
+                run_func = motor_async.run_apollo if usar_async else apollo_script.run
+                run_generic_process(run_func, "Apollo Contactos", apollo_api, empresas_list, cargos_list, selected_countries, usar_cache=usar_cache)
             else: st.error("Faltan datos en Apollo o Selección")
 
     with c2:
@@ -176,13 +208,14 @@ with tab1:
             if apollo_api and ids_list:
                 tmp = "temp_ids.csv"
                 pd.DataFrame(ids_list).to_csv(tmp, index=False)
-                run_generic_process(apollo_org, "Apollo Organizaciones", apollo_api, tmp)
+                run_generic_process(apollo_org.run, "Apollo Organizaciones", apollo_api, tmp, usar_cache=usar_cache)
             else: st.error("Falta API o archivo de IDs")
 
     with c3:
         if st.button("🟣 Lusha Contactos"):
             if lusha_api and cargos_list and empresas_list and selected_countries:
-                run_generic_process(lusha_script, "Lusha Contactos", lusha_api, empresas_list, cargos_list, selected_countries)
+                run_func = motor_async.run_lusha if usar_async else lusha_script.run
+                run_generic_process(run_func, "Lusha Contactos", lusha_api, empresas_list, cargos_list, selected_countries, usar_cache=usar_cache)
             else: st.error("Faltan datos de Lusha")
 
     with c4:
@@ -190,7 +223,7 @@ with tab1:
             if lusha_api and ids_list:
                 tmp = "temp_ids_l.csv"
                 pd.DataFrame(ids_list).to_csv(tmp, index=False)
-                run_generic_process(lusha_org, "Lusha Organizaciones", lusha_api, tmp)
+                run_generic_process(lusha_org.run, "Lusha Organizaciones", lusha_api, tmp, usar_cache=usar_cache)
             else: st.error("Faltan datos")
 
     # 4. DESCARGA DE RESULTADOS
@@ -0,0 +1,90 @@
+import random
+import re
+import time
+
+from apollo_script import CAMPOS_TEXTO, limpiar_texto, limpiar_textos
+
+# ==========================================================
+# --- BENCHMARK: limpiar_texto / limpiar_textos ---
+# ==========================================================
+# Verifica que la limpieza actual da exactamente el mismo resultado que la
+# implementación original (replace + regex + split/join) y mide la mejora
+# sobre páginas de 100 contactos de Apollo.
+# Uso: python bench_limpiar_texto.py
+
+CONTACTOS_POR_PAGINA = 100
+PAGINAS = 200
+CASOS_EQUIVALENCIA = 200_000
+
+
+def limpiar_texto_original(texto):
+    """Implementación original de apollo_script.limpiar_texto (referencia)."""
+    if texto is None or not isinstance(texto, str):
+        return texto if texto is not None else ""
+    texto = texto.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    texto = re.sub(r'[^\x20-\x7EáéíóúÁÉÍÓÚñÑüÜ]', '', texto)
+    texto = ' '.join(texto.split())
+    return texto.strip()
+
+
+_ALFABETO = (
+    "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,-_/()+@&'\""
+    "áéíóúÁÉÍÓÚñÑüÜàçãõ€™—–• ​ \n\r\t\x0b\x0c\x00\x7f😀中文"
+)
+_VALORES_TIPICOS = [
+    "Gerente de Ventas", "Chief Executive Officer", "Lima", "Perú", "Ciudad de México", "+51 1 234 5678",
+    "+5112345678", "Acme S.A.C.", "Head of  Sales ", "  VP Marketing\n", "María José Núñez", None, "", 12345,
+]
+
+
+def _texto_aleatorio(rng):
+    if rng.random() < 0.3:
+        return rng.choice(_VALORES_TIPICOS)
+    return "".join(rng.choice(_ALFABETO) for _ in range(rng.randint(0, 40)))
+
+
+def verificar_equivalencia(rng):
+    valores = [_texto_aleatorio(rng) for _ in range(CASOS_EQUIVALENCIA)]
+    esperados = [limpiar_texto_original(v) for v in valores]
+    for valor, esperado, obtenido in zip(valores, esperados, limpiar_textos(valores)):
+        assert obtenido == esperado, f"Diferencia para {valor!r}: {obtenido!r} != {esperado!r}"
+    print(f"✅ Equivalencia: {len(valores)} valores idénticos a la implementación original.")
+
+
+def _pagina_realista(rng):
+    """Columnas de texto de una página: en su mayoría ASCII limpio, algunos con tildes o saltos de línea."""
+    columnas = []
+    for _ in range(CONTACTOS_POR_PAGINA * len(CAMPOS_TEXTO)):
+        r = rng.random()
+        if r < 0.85:
+            columnas.append(rng.choice(_VALORES_TIPICOS[:3] + _VALORES_TIPICOS[5:7]))
+        elif r < 0.95:
+            columnas.append(rng.choice(_VALORES_TIPICOS[3:5] + _VALORES_TIPICOS[8:11]))
+        else:
+            columnas.append(rng.choice(_VALORES_TIPICOS[11:]))
+    return columnas
+
+
+def medir(nombre, funcion, paginas):
+    inicio = time.perf_counter()
+    for pagina in paginas:
+        funcion(pagina)
+    segundos = time.perf_counter() - inicio
+    valores = sum(len(p) for p in paginas)
+    print(f"{nombre:<38} {segundos * 1000:8.1f} ms  ({valores / segundos / 1e6:5.2f} M valores/s)")
+    return segundos
+
+
+def main():
+    rng = random.Random(42)
+    verificar_equivalencia(rng)
+
+    paginas = [_pagina_realista(rng) for _ in range(PAGINAS)]
+    print(f"\n{PAGINAS} páginas x {CONTACTOS_POR_PAGINA} contactos x {len(CAMPOS_TEXTO)} columnas:")
+    original = medir("Original (campo por campo)", lambda p: [limpiar_texto_original(v) for v in p], paginas)
+    actual = medir("limpiar_textos (columnas por página)", limpiar_textos, paginas)
+    print(f"\nMejora: {original / actual:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+
+# ==========================================================
+# --- BITÁCORA DE TRABAJOS (checkpoint / reanudación) ---
+# ==========================================================
+# Cada extractor registra, en un archivo JSON Lines junto a su CSV de salida,
+# las tareas cuyas filas ya quedaron escritas (empresa/país/chunk/página o
+# lote de IDs). Si el proceso se cancela o se cae, la siguiente ejecución con
+# los mismos parámetros (misma huella) omite esas tareas y agrega al CSV
+# existente en vez de reescribirlo.
+# Una tarea se marca solo después de escribir sus filas: una caída entre
+# ambos pasos a lo sumo repite esa tarea, nunca la pierde.
+
+
+def huella_trabajo(**parametros):
+    """Hash estable de los parámetros que definen un trabajo (entradas y configuración)."""
+    material = json.dumps(parametros, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def ruta_bitacora(output_file):
+    """resultados.csv -> resultados.bitacora.jsonl"""
+    return os.path.splitext(output_file)[0] + '.bitacora.jsonl'
+
+
+def _clave(clave):
+    return json.dumps(clave, ensure_ascii=False)
+
+
+class Bitacora:
+    """
+    Registro durable de tareas completadas de un trabajo.
+    Si la bitácora existente tiene la misma huella (y el CSV de salida sigue
+    existiendo) se reanuda; si no, se empieza de cero.
+    """
+
+    def __init__(self, output_file, huella, reanudar=True):
+        self.ruta = ruta_bitacora(output_file)
+        self.huella = huella
+        self.lock = threading.Lock()
+        self.completadas = {}
+        if reanudar and os.path.exists(output_file) and os.path.exists(self.ruta):
+            self._cargar()
+        self.reanudando = bool(self.completadas)
+        self.archivo = open(self.ruta, 'a' if self.reanudando else 'w', encoding='utf-8')
+        if not self.reanudando:
+            self._escribir({'huella': huella})
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, encoding='utf-8') as f:
+                cabecera = json.loads(f.readline() or '{}')
+                if cabecera.get('huella') != self.huella:
+                    return
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue  # Última línea truncada por una caída
+                    self.completadas[_clave(registro['t'])] = registro.get('d') or {}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.completadas = {}
+
+    def _escribir(self, registro):
+        self.archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self.archivo.flush()
+
+    def completada(self, *clave):
+        return _clave(clave) in self.completadas
+
+    def marcar(self, *clave, siguientes=None):
+        """
+        Registra la tarea 'clave' como completada. 'siguientes' son las páginas
+        que la tarea generó, para poder reconstruirlas al reanudar.
+        """
+        registro = {'t': clave}
+        if siguientes:
+            registro['d'] = {'siguientes': list(siguientes)}
+        with self.lock:
+            if self.archivo.closed:
+                return
+            self.completadas[_clave(clave)] = registro.get('d', {})
+            self._escribir(registro)
+
+    def pendientes(self, tareas, clave_de, con_pagina):
+        """
+        Filtra las tareas iniciales: las no completadas se mantienen y las
+        completadas se reemplazan por sus páginas siguientes registradas
+        (que a su vez se filtran de la misma forma).
+        - clave_de(tarea): clave con la que se marcó la tarea.
+        - con_pagina(tarea, pagina): tarea equivalente para otra página.
+        """
+        if not self.completadas:
+            return list(tareas)
+        resultado = []
+        cola = collections.deque(tareas)
+        while cola:
+            tarea = cola.popleft()
+            datos = self.completadas.get(_clave(tuple(clave_de(tarea))))
+            if datos is None:
+                resultado.append(tarea)
+            else:
+                cola.extend(con_pagina(tarea, pagina) for pagina in datos.get('siguientes', []))
+        return resultado
+
+    def cerrar(self, completo):
+        """Cierra la bitácora. Si el trabajo terminó completo se borra (la próxima vez empieza de cero)."""
+        with self.lock:
+            if not self.archivo.closed:
+                self.archivo.close()
+        if completo:
+            try:
+                os.remove(self.ruta)
+            except OSError:
+                pass
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ==========================================================
+# --- CACHÉ PERSISTENTE DE RESPUESTAS (SQLite) ---
+# ==========================================================
+# Guarda en disco las respuestas exitosas de Apollo/Lusha, con clave
+# proveedor + cuenta + método + URL + payload normalizado (hash SHA-256).
+# La cuenta es un hash de la API key: el archivo es compartido por todo el
+# proceso (y por los usuarios de app_web), y las respuestas de Apollo
+# dependen del equipo, así que nunca se sirven a otra cuenta.
+# Re-ejecutar listas que se solapan con corridas anteriores no vuelve a
+# gastar créditos ni tiempo mientras la respuesta no haya expirado (TTL).
+# El tamaño total se limita con expulsión LRU (por último acceso). Los
+# aciertos no escriben en disco: el último acceso se acumula en memoria y
+# se graba junto con el próximo guardado (o cada MAX_ACCESOS_PENDIENTES).
+
+RUTA_POR_DEFECTO = os.path.join(os.path.expanduser('~'), '.extraccion_datos', 'cache_respuestas.sqlite3')
+TTL_POR_DEFECTO = 3 * 24 * 3600          # 3 días
+MAX_BYTES_POR_DEFECTO = 500 * 1024 * 1024  # 500 MB
+
+MAX_ACCESOS_PENDIENTES = 1000
+
+# Campos que cambian en cada request sin afectar la respuesta (p. ej. requestId de Lusha)
+_CAMPOS_VOLATILES = {'requestId'}
+# Headers que identifican la cuenta (Apollo: x-api-key; Lusha: api_key)
+_HEADERS_CREDENCIAL = ('x-api-key', 'api_key', 'authorization')
+
+
+def _normalizar(valor):
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items() if k not in _CAMPOS_VOLATILES}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    return valor
+
+
+def _cuerpo_request(kwargs):
+    """Extrae el cuerpo del request (json=, data= o content=) como objeto normalizado."""
+    if kwargs.get('json') is not None:
+        return _normalizar(kwargs['json'])
+    cuerpo = kwargs.get('data', kwargs.get('content'))
+    if isinstance(cuerpo, bytes):
+        cuerpo = cuerpo.decode('utf-8', 'replace')
+    if isinstance(cuerpo, str):
+        try:
+            return _normalizar(json.loads(cuerpo))
+        except ValueError:
+            return cuerpo
+    return cuerpo
+
+
+def huella_cuenta(*headers):
+    """
+    Hash corto de la credencial presente en los headers (sesión y/o request);
+    '' si no hay ninguna. La API key no se guarda tal cual en el caché.
+    """
+    for grupo in headers:
+        if not grupo:
+            continue
+        for nombre in _HEADERS_CREDENCIAL:
+            valor = grupo.get(nombre)
+            if valor:
+                return hashlib.sha256(str(valor).encode('utf-8')).hexdigest()[:32]
+    return ''
+
+
+def calcular_clave(proveedor, metodo, url, cuenta='', **kwargs):
+    """Hash estable del request: proveedor, cuenta (huella_cuenta), método, URL, params y payload normalizado."""
+    material = json.dumps({
+        'proveedor': proveedor,
+        'cuenta': cuenta,
+        'metodo': metodo.upper(),
+        'url': url,
+        'params': _normalizar(kwargs.get('params')),
+        'cuerpo': _cuerpo_request(kwargs),
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class RespuestaCacheada:
+    """Respuesta leída del caché con la interfaz mínima que usan los extractores."""
+
+    def __init__(self, status_code, contenido):
+        self.status_code = status_code
+        self.content = contenido
+        self.headers = {}
+        self.reason = 'OK (caché)'
+        self.desde_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class CacheRespuestas:
+    """Caché SQLite thread-safe con TTL y límite de tamaño (LRU)."""
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO, ttl_segundos=TTL_POR_DEFECTO, max_bytes=MAX_BYTES_POR_DEFECTO):
+        self.ruta = ruta
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        # clave -> último acceso aún no grabado en disco
+        self._accesos = {}
+
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY, proveedor TEXT, status INTEGER, contenido BLOB,"
+            " tamano INTEGER, creado REAL, ultimo_acceso REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_acceso ON respuestas (ultimo_acceso);")
+        self.conn.commit()
+        self._total_bytes = self.conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+
+    def obtener(self, clave):
+        """Retorna una RespuestaCacheada o None si no existe o expiró."""
+        ahora = time.time()
+        with self.lock:
+            fila = self.conn.execute(
+                "SELECT status, contenido, creado, tamano FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            status, contenido, creado, tamano = fila
+            if ahora - creado > self.ttl_segundos:
+                self._accesos.pop(clave, None)
+                self.conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self.conn.commit()
+                self._total_bytes -= tamano
+                self.fallos += 1
+                return None
+            self._accesos[clave] = ahora
+            if len(self._accesos) >= MAX_ACCESOS_PENDIENTES:
+                self._grabar_accesos()
+                self.conn.commit()
+            self.aciertos += 1
+        return RespuestaCacheada(status, bytes(contenido))
+
+    def guardar(self, clave, proveedor, status, contenido):
+        tamano = len(contenido)
+        if tamano > self.max_bytes:
+            return
+        ahora = time.time()
+        with self.lock:
+            anterior = self.conn.execute("SELECT tamano FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, proveedor, status, contenido, tamano, creado, ultimo_acceso)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave, proveedor, status, sqlite3.Binary(contenido), tamano, ahora, ahora)
+            )
+            self._total_bytes += tamano - (anterior[0] if anterior else 0)
+            self._accesos.pop(clave, None)
+            self._grabar_accesos()
+            if self._total_bytes > self.max_bytes:
+                self._expulsar()
+            self.conn.commit()
+
+    def _grabar_accesos(self):
+        """Graba (sin commit) los últimos accesos acumulados en memoria. Requiere self.lock."""
+        if self._accesos:
+            self.conn.executemany(
+                "UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?",
+                [(ahora, clave) for clave, ahora in self._accesos.items()]
+            )
+            self._accesos.clear()
+
+    def _expulsar(self):
+        """Borra expirados y luego los menos usados hasta quedar en el 90% del límite."""
+        self.conn.execute("DELETE FROM respuestas WHERE creado < ?", (time.time() - self.ttl_segundos,))
+        objetivo = self.max_bytes * 0.9
+        total = self.conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+        if total > objetivo:
+            claves = []
+            for clave, tamano in self.conn.execute("SELECT clave, tamano FROM respuestas ORDER BY ultimo_acceso"):
+                if total <= objetivo:
+                    break
+                claves.append((clave,))
+                total -= tamano
+            self.conn.executemany("DELETE FROM respuestas WHERE clave = ?", claves)
+        self._total_bytes = total
+
+    def limpiar(self):
+        """Vacía el caché por completo."""
+        with self.lock:
+            self._accesos.clear()
+            self.conn.execute("DELETE FROM respuestas")
+            self.conn.commit()
+            self._total_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache(usar_cache=True):
+    """
+    Caché compartido del proceso (en RUTA_POR_DEFECTO), o None si usar_cache es False.
+    Si el disco no permite crearlo, se continúa sin caché.
+    """
+    global _cache
+    if not usar_cache:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = CacheRespuestas()
+            except (OSError, sqlite3.Error):
+                return None
+        return _cache
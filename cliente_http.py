@@ -0,0 +1,349 @@
+import socket
+import threading
+import weakref
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import cache_respuestas
+import limitador_tasa
+
+# ==========================================================
+# --- CLIENTE HTTP COMPARTIDO (Sesiones con pool de conexiones) ---
+# ==========================================================
+# Cada extractor crea una sola sesión por ejecución y la reutiliza en todos
+# sus requests: las conexiones TCP/TLS quedan abiertas (keep-alive) y se
+# comparten entre los workers en lugar de negociarse en cada llamada.
+
+APOLLO_BASE_URL = "https://api.apollo.io/api/v1"
+LUSHA_BASE_URL = "https://api.lusha.com"
+# Timeout por defecto de cada request (conexión, lectura) si el extractor no indica otro
+TIMEOUT_POR_DEFECTO = (5, 30)
+# Cada cuánto el vigilante revisa stop_event (y vuelve a abortar tras la cancelación)
+INTERVALO_VIGILANCIA = 0.2
+
+
+# ==========================================================
+# --- CANCELACIÓN DE REQUESTS EN VUELO ---
+# ==========================================================
+# requests no permite interrumpir una llamada bloqueada en el socket. El
+# adaptador de las sesiones registra cada conexión que abre y, al cancelar,
+# hace shutdown() de sus sockets: la lectura bloqueada en el worker falla de
+# inmediato, enviar() ve stop_event activo y retorna None sin reintentar.
+# Se registra el socket (no la conexión) porque http.client suelta
+# conexion.sock al recibir los headers si el servidor cierra tras responder,
+# mientras el cuerpo se sigue leyendo del mismo socket.
+
+class _RegistroSockets:
+    """Sockets abiertos por un adaptador (referencias débiles)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sockets = weakref.WeakSet()
+
+    def agregar(self, sock):
+        with self.lock:
+            self.sockets.add(sock)
+
+    def abortar(self):
+        """Corta todos los sockets registrados; retorna cuántos se cortaron."""
+        with self.lock:
+            sockets = list(self.sockets)
+            self.sockets.clear()
+        cortadas = 0
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                cortadas += 1
+            except OSError:
+                pass  # Ya estaba cerrado
+        return cortadas
+
+
+def _clases_pool(registro):
+    """Clases de pool de urllib3 cuyas conexiones se registran al conectarse."""
+    clases = {}
+    for esquema, pool_base, conexion_base in (('http', HTTPConnectionPool, HTTPConnection),
+                                              ('https', HTTPSConnectionPool, HTTPSConnection)):
+        def connect(self, _base=conexion_base):
+            _base.connect(self)
+            registro.agregar(self.sock)
+        conexion = type(f'{conexion_base.__name__}Cancelable', (conexion_base,), {'connect': connect})
+        clases[esquema] = type(f'{pool_base.__name__}Cancelable', (pool_base,), {'ConnectionCls': conexion})
+    return clases
+
+
+class AdaptadorCancelable(HTTPAdapter):
+    """HTTPAdapter que puede abortar los requests en vuelo de todos los threads."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        if getattr(self, 'registro', None) is None:
+            self.registro = _RegistroSockets()
+            self.clases_pool = _clases_pool(self.registro)
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.clases_pool
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = self.clases_pool
+        return manager
+
+    def abortar(self):
+        return self.registro.abortar()
+
+
+def abortar_sesion(sesion):
+    """Corta los requests en vuelo de una sesión creada con crear_sesion()."""
+    return sum(adapter.abortar() for adapter in set(sesion.adapters.values())
+               if isinstance(adapter, AdaptadorCancelable))
+
+
+class VigilanteCancelacion:
+    """
+    Context manager: mientras está activo, si se activa stop_event aborta
+    los requests en vuelo de las sesiones (y repite cada INTERVALO_VIGILANCIA
+    por si algún worker alcanzó a abrir otro antes de ver la cancelación).
+        with cliente_http.VigilanteCancelacion(stop_event, sesion):
+            ...
+    """
+
+    def __init__(self, stop_event, *sesiones, intervalo=INTERVALO_VIGILANCIA):
+        self.stop_event = stop_event
+        self.sesiones = sesiones
+        self.intervalo = intervalo
+        self.fin = threading.Event()
+        self.thread = None
+
+    def _bucle(self):
+        while not self.fin.is_set():
+            if self.stop_event.wait(self.intervalo):
+                for sesion in self.sesiones:
+                    abortar_sesion(sesion)
+                self.fin.wait(self.intervalo)
+
+    def __enter__(self):
+        if self.stop_event is not None:
+            self.thread = threading.Thread(target=self._bucle, name='vigilante-cancelacion', daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.fin.set()
+        if self.thread is not None:
+            self.thread.join()
+        return False
+
+
+# ==========================================================
+# --- REQUESTS IDÉNTICOS: UN SOLO VUELO POR CLAVE ---
+# ==========================================================
+# Dos workers que piden el mismo request a la vez (misma clave de caché:
+# proveedor + método + URL + payload) comparten un único envío: el primero
+# lo hace y los demás esperan su respuesta. Además se recuerdan las últimas
+# respuestas exitosas de la corrida (pocas, para acotar la memoria), así una
+# tarea repetida poco después tampoco gasta otro request aunque no haya
+# caché en disco.
+
+MAX_RECIENTES = 32
+
+
+class _Vuelo:
+    """Resultado compartido de un request en curso."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.respuesta = None
+        self.error = None
+
+
+class VueloUnico:
+    """Coalescencia de requests idénticos concurrentes + memo acotado de la corrida (thread-safe)."""
+
+    def __init__(self, max_recientes=MAX_RECIENTES):
+        self.lock = threading.Lock()
+        self.max_recientes = max_recientes
+        self.en_vuelo = {}
+        self.recientes = OrderedDict()
+        self.compartidos = 0
+
+    def reciente(self, clave):
+        """Respuesta exitosa ya recibida en la corrida para la clave, o None."""
+        with self.lock:
+            respuesta = self.recientes.get(clave)
+            if respuesta is not None:
+                self.recientes.move_to_end(clave)
+                self.compartidos += 1
+            return respuesta
+
+    def recordar(self, clave, respuesta):
+        """Guarda la respuesta si fue exitosa (descarta la más antigua al superar max_recientes)."""
+        if respuesta is None or respuesta.status_code not in (200, 201) or self.max_recientes <= 0:
+            return
+        with self.lock:
+            self.recientes[clave] = respuesta
+            self.recientes.move_to_end(clave)
+            while len(self.recientes) > self.max_recientes:
+                self.recientes.popitem(last=False)
+
+    def contar_compartido(self):
+        with self.lock:
+            self.compartidos += 1
+
+    def ejecutar(self, clave, funcion, stop_event=None):
+        """
+        Retorna funcion() para la clave, ejecutándola una sola vez aunque varios
+        threads la pidan a la vez. Los que esperan reciben la misma respuesta
+        (o la misma excepción), o None si se cancela mientras esperan.
+        """
+        respuesta = self.reciente(clave)
+        if respuesta is not None:
+            return respuesta
+        with self.lock:
+            vuelo = self.en_vuelo.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self.en_vuelo[clave] = _Vuelo()
+            else:
+                self.compartidos += 1
+
+        if not lider:
+            while not vuelo.listo.wait(INTERVALO_VIGILANCIA):
+                if stop_event is not None and stop_event.is_set():
+                    return None
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.respuesta
+
+        try:
+            vuelo.respuesta = funcion()
+            return vuelo.respuesta
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.en_vuelo[clave]
+            if vuelo.error is None:
+                self.recordar(clave, vuelo.respuesta)
+            vuelo.listo.set()
+
+
+def headers_apollo(api_key):
+    """Headers base de la API de Apollo."""
+    return {
+        'Cache-Control': 'no-cache',
+        'Content-Type': 'application/json',
+        'accept': 'application/json',
+        'x-api-key': api_key
+    }
+
+
+def headers_lusha(api_key):
+    """Headers base de la API de Lusha."""
+    return {
+        'Content-Type': 'application/json',
+        'api_key': api_key
+    }
+
+
+def crear_sesion(headers, pool_size=10, verify=True):
+    """
+    Crea una requests.Session con un pool de conexiones dimensionado según
+    el número de workers que la van a compartir.
+    """
+    pool_size = max(1, int(pool_size))
+    sesion = requests.Session()
+    # Los reintentos los maneja cada extractor; el adapter no reintenta por su cuenta
+    adapter = AdaptadorCancelable(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    sesion.mount("https://", adapter)
+    sesion.mount("http://", adapter)
+    sesion.headers.update(headers)
+    sesion.headers['Connection'] = 'keep-alive'
+    sesion.verify = verify
+    return sesion
+
+
+def sesion_apollo(api_key, pool_size=10):
+    """Sesión con los headers de Apollo construidos una sola vez."""
+    return crear_sesion(headers_apollo(api_key), pool_size=pool_size)
+
+
+def sesion_lusha(api_key, pool_size=10):
+    """
+    Sesión con los headers de Lusha.
+    verify=False es necesario al trabajar detrás de proxies corporativos.
+    """
+    return crear_sesion(headers_lusha(api_key), pool_size=pool_size, verify=False)
+
+
+def enviar(sesion, metodo, url, control=None, stop_event=None, max_reintentos=3, cache=None, vuelo_unico=None,
+           **kwargs):
+    """
+    Envía un request por la sesión respetando el ControlTrafico del proveedor.
+    - cache: CacheRespuestas opcional; si el request ya tiene respuesta vigente no se envía.
+    - vuelo_unico: VueloUnico opcional de la corrida; un request idéntico a otro en
+      vuelo (o recién respondido) reutiliza esa respuesta en vez de enviarse.
+    - 429: espera lo indicado por Retry-After (o backoff exponencial) y reintenta.
+    - Errores de conexión: reintenta con backoff; al agotar reintentos relanza la excepción.
+    - Sin 'timeout' explícito se usa TIMEOUT_POR_DEFECTO.
+    Retorna la respuesta final, o None si el proceso se canceló mientras esperaba
+    o si el request se abortó por cancelación (ver VigilanteCancelacion).
+    """
+    kwargs.setdefault('timeout', TIMEOUT_POR_DEFECTO)
+    proveedor = control.proveedor if control is not None else ''
+    clave = None
+    if cache is not None or vuelo_unico is not None:
+        cuenta = cache_respuestas.huella_cuenta(kwargs.get('headers'), sesion.headers)
+        clave = cache_respuestas.calcular_clave(proveedor, metodo, url, cuenta=cuenta, **kwargs)
+    if cache is not None:
+        cacheada = cache.obtener(clave)
+        if cacheada is not None:
+            return cacheada
+
+    if vuelo_unico is None:
+        return _enviar_con_reintentos(sesion, metodo, url, control, stop_event, max_reintentos, cache, clave, kwargs)
+    return vuelo_unico.ejecutar(
+        clave,
+        lambda: _enviar_con_reintentos(sesion, metodo, url, control, stop_event, max_reintentos, cache, clave, kwargs),
+        stop_event
+    )
+
+
+def _enviar_con_reintentos(sesion, metodo, url, control, stop_event, max_reintentos, cache, clave, kwargs):
+    """Envío real de enviar(): limitador, reintentos y guardado en caché."""
+    intento = 0
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            return None
+        if control is not None and not control.adquirir(stop_event):
+            return None
+        try:
+            response = sesion.request(metodo, url, **kwargs)
+        except requests.exceptions.RequestException:
+            if stop_event is not None and stop_event.is_set():
+                return None  # Abortado por la cancelación: no es un error de red
+            if intento >= max_reintentos:
+                raise
+            intento += 1
+            if not limitador_tasa.esperar(min(2 ** intento, 30), stop_event):
+                return None
+            continue
+        finally:
+            if control is not None:
+                control.liberar()
+
+        espera = control.registrar_respuesta(response) if control is not None else None
+        if cache is not None and response.status_code in (200, 201):
+            cache.guardar(clave, control.proveedor if control is not None else '', response.status_code, response.content)
+        if response.status_code != 429 or intento >= max_reintentos:
+            return response
+
+        intento += 1
+        if espera is None:
+            espera = limitador_tasa.leer_retry_after(response.headers)
+        if not limitador_tasa.esperar(espera if espera is not None else min(2 ** intento, 30), stop_event):
+            return None
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+from array import array
+
+# ==========================================================
+# --- CONJUNTO DE IDS PARA DEDUPLICACIÓN (por fragmentos) ---
+# ==========================================================
+# Los workers deduplican una página completa de contactos en una sola
+# operación: los IDs se reparten por fragmento (hash % N) y cada fragmento
+# se consulta y actualiza con diferencia de conjuntos bajo su propio lock,
+# así dos workers solo compiten si tocan el mismo fragmento.
+#
+# Modo compacto (corridas de varios millones de contactos): en vez de los
+# IDs (str de ~24 caracteres, >100 bytes cada uno en un set) se guarda un
+# hash de 64 bits en una tabla de direccionamiento abierto sobre array('Q'),
+# ~16 bytes por ID. La probabilidad de colisión con 10 millones de IDs es
+# del orden de 1e-6, así que a efectos prácticos es exacto.
+
+FRAGMENTOS_POR_DEFECTO = 16
+_CAPACIDAD_INICIAL = 1024
+_CARGA_MAXIMA = 0.6
+
+
+def hash64(valor):
+    """Hash estable de 64 bits (distinto de 0, que marca las celdas vacías)."""
+    digest = hashlib.blake2b(str(valor).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class TablaHash64:
+    """Conjunto de enteros de 64 bits sobre array('Q') con sondeo lineal (no thread-safe)."""
+
+    def __init__(self, capacidad=_CAPACIDAD_INICIAL):
+        self.celdas = array("Q", bytes(8 * capacidad))
+        self.mascara = capacidad - 1
+        self.cantidad = 0
+
+    def __len__(self):
+        return self.cantidad
+
+    def agregar(self, h):
+        """Inserta h; retorna True si no estaba."""
+        celdas, mascara = self.celdas, self.mascara
+        i = h & mascara
+        while True:
+            actual = celdas[i]
+            if actual == 0:
+                break
+            if actual == h:
+                return False
+            i = (i + 1) & mascara
+        celdas[i] = h
+        self.cantidad += 1
+        if self.cantidad > _CARGA_MAXIMA * len(celdas):
+            self._crecer()
+        return True
+
+    def _crecer(self):
+        anteriores = self.celdas
+        self.celdas = array("Q", bytes(16 * len(anteriores)))
+        self.mascara = len(self.celdas) - 1
+        self.cantidad = 0
+        for h in anteriores:
+            if h:
+                self.agregar(h)
+
+
+class ConjuntoIds:
+    """
+    Conjunto thread-safe de IDs vistos, repartido en fragmentos con lock propio.
+    - compacto=False: guarda los IDs tal cual (set por fragmento).
+    - compacto=True: guarda hashes de 64 bits (TablaHash64 por fragmento).
+    """
+
+    def __init__(self, fragmentos=FRAGMENTOS_POR_DEFECTO, compacto=False):
+        self.compacto = compacto
+        self.n = max(1, int(fragmentos))
+        self.locks = [threading.Lock() for _ in range(self.n)]
+        self.fragmentos = [TablaHash64() if compacto else set() for _ in range(self.n)]
+
+    def __len__(self):
+        return sum(len(f) for f in self.fragmentos)
+
+    def _clave(self, id_):
+        return hash64(id_) if self.compacto else id_
+
+    def _fragmento(self, clave):
+        # En modo compacto los bits bajos ya indexan la tabla: el fragmento sale de los altos
+        return (clave >> 40) % self.n if self.compacto else hash(clave) % self.n
+
+    def filtrar_nuevos(self, ids):
+        """
+        Registra los IDs de una página (secuencia) y retorna los que no se
+        habían visto, en el orden recibido y sin repetidos. IDs vacíos se descartan.
+        """
+        por_fragmento = {}
+        claves = []
+        for id_ in ids:
+            if not id_:
+                claves.append(None)
+                continue
+            clave = self._clave(id_)
+            claves.append(clave)
+            por_fragmento.setdefault(self._fragmento(clave), set()).add(clave)
+
+        nuevos = set()
+        for indice, candidatos in por_fragmento.items():
+            fragmento = self.fragmentos[indice]
+            with self.locks[indice]:
+                if self.compacto:
+                    nuevos.update(c for c in candidatos if fragmento.agregar(c))
+                else:
+                    candidatos -= fragmento
+                    fragmento |= candidatos
+                    nuevos |= candidatos
+
+        resultado = []
+        for id_, clave in zip(ids, claves):
+            if clave is not None and clave in nuevos:
+                nuevos.discard(clave)  # Solo la primera aparición dentro de la página
+                resultado.append(id_)
+        return resultado
+
+    def agregar(self, id_):
+        """Registra un ID suelto; retorna True si era nuevo."""
+        return bool(self.filtrar_nuevos((id_,)))
+
+
+class Contador:
+    """Contador thread-safe con lock propio (no comparte el lock de otras estadísticas)."""
+
+    def __init__(self, valor=0):
+        self.lock = threading.Lock()
+        self.valor = valor
+
+    def sumar(self, cantidad=1):
+        with self.lock:
+            self.valor += cantidad
+            return self.valor
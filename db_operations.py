@@ -1,101 +1,449 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import contextlib
 import csv
+import hashlib
+import io
+import itertools
+import os
 import re
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox # Todavía se necesita para los pop-ups
 
+import normalizador_cargos
+import resolucion_entidades
+
 # ==========================================================
 # --- LÓGICA DE BASE DE DATOS (Aislada de la UI) ---
 # ==========================================================
 
+# Cada cuántos MB leídos del CSV se informa el progreso de la carga
+PROGRESO_CADA_MB = 50
+# Tamaño de los bloques que se envían a COPY
+TAMANO_BLOQUE_COPY = 1024 * 1024
+
+# Carga incremental: clave natural de cada tabla (nombre de columna ya limpio)
+CLAVES_NATURALES = {
+    "resultados_apollo": "id",
+    "resultados_lusha": "contactid",
+}
+# Valores de la clave que no identifican a un contacto (filas que no se pueden fusionar)
+CLAVES_VACIAS = ("", "N/A")
+TABLA_HISTORIAL = "historial_cargas"
+
+# Conexiones máximas del pool (una por tabla en las cargas paralelas + margen)
+MAX_CONEXIONES = 5
+
+# --- Esquema de las tablas cargadas ---
+# Tipos explícitos de los encabezados conocidos de cada extractor (nombres ya limpios).
+# Los IDs y teléfonos son TEXT aunque parezcan números.
+TIPOS_POR_TABLA = {
+    "resultados_apollo": {
+        "empresa_buscada": "TEXT", "pais_buscado": "TEXT", "origen": "TEXT", "id": "TEXT", "first_name": "TEXT",
+        "last_name": "TEXT",
+        "name": "TEXT", "linkedin_url": "TEXT", "title": "TEXT", "headline": "TEXT", "email_status": "TEXT",
+        "email": "TEXT", "state": "TEXT", "city": "TEXT", "country": "TEXT", "organization_name": "TEXT",
+        "organization_id": "TEXT", "raw_number": "TEXT", "sanitized_number": "TEXT", "contact_email": "TEXT",
+    },
+    "resultados_lusha": {
+        "empresa_buscada": "TEXT", "pais_buscado": "TEXT", "name": "TEXT", "contactid": "TEXT",
+        "jobtitle": "TEXT", "companyid": "TEXT", "companyname": "TEXT", "fqdn": "TEXT", "personid": "TEXT",
+        "logourl": "TEXT", "hasemails": "BOOLEAN", "hasphones": "BOOLEAN", "hasdirectphone": "BOOLEAN",
+        "hasworkemail": "BOOLEAN", "hasprivateemail": "BOOLEAN", "hasmobilephone": "BOOLEAN",
+        "hassociallink": "BOOLEAN",
+    },
+    "entidades_resueltas": {campo: "TEXT" for campo in resolucion_entidades.CAMPOS_SALIDA},
+}
+# Columnas conocidas de cualquier origen (p. ej. salidas de organizaciones de Apollo/Lusha)
+TIPOS_COLUMNAS_CONOCIDAS = {
+    "id_buscado": "TEXT", "number": "TEXT", "sanitized_number": "TEXT", "postal_code": "TEXT",
+    "founded_year": "INTEGER", "estimated_num_employees": "INTEGER",
+    "employees_min": "INTEGER", "employees_max": "INTEGER",
+    "annual_revenue": "NUMERIC", "organization_revenue": "NUMERIC",
+    "revenue_min": "NUMERIC", "revenue_max": "NUMERIC",
+}
+# Filas del CSV usadas para inferir el tipo de las columnas no mapeadas
+MUESTRA_INFERENCIA = 1000
+# Sin '+' inicial: "+5691234..." es un teléfono, no un número (queda TEXT)
+_RE_ENTERO = re.compile(r'^-?\d+$')
+_RE_NUMERICO = re.compile(r'^-?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+_VALORES_BOOLEANOS = {'true', 'false', 't', 'f'}
+# Columnas de cruce/deduplicación que se indexan al cargar (si existen en la tabla)
+COLUMNAS_INDEXADAS = (
+    'id', 'contactid', 'organization_id', 'companyid', 'email', 'linkedin_url',
+    'country', 'pais_buscado', 'empresa_buscada',
+)
+
+# ==========================================================
+# --- POOL DE CONEXIONES (compartido por las acciones de la Pestaña 2) ---
+# ==========================================================
+
+class GestorConexiones:
+    """
+    ThreadedConnectionPool de psycopg2 con préstamo de conexiones vía 'with'.
+    getconn() lanza PoolError si el pool está agotado, así que un semáforo del
+    mismo tamaño hace esperar a los hilos que piden de más.
+    """
+
+    def __init__(self, db_params, max_conexiones=MAX_CONEXIONES):
+        self.db_params = dict(db_params)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max_conexiones, connect_timeout=5, **db_params)
+        self._cupos = threading.BoundedSemaphore(max_conexiones)
+        self._lock = threading.Lock()
+        self._prestadas = 0
+        self._retirado = False
+
+    @contextlib.contextmanager
+    def conexion(self):
+        """
+        Presta una conexión del pool. Al devolverla se descarta cualquier
+        transacción sin commit; las conexiones rotas se cierran en vez de reutilizarse.
+        """
+        self._cupos.acquire()
+        try:
+            with self._lock:
+                self._prestadas += 1
+            conn = self.pool.getconn()
+            if conn.closed:
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+        except BaseException:
+            self._devolver_cupo()
+            raise
+        try:
+            yield conn
+        finally:
+            if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            try:
+                self.pool.putconn(conn, close=bool(conn.closed))
+            finally:
+                self._devolver_cupo()
+
+    def _devolver_cupo(self):
+        """Libera el cupo del semáforo; si el gestor fue retirado, la última devolución cierra el pool."""
+        with self._lock:
+            self._prestadas -= 1
+            cerrar = self._retirado and self._prestadas == 0
+        self._cupos.release()
+        if cerrar:
+            self.pool.closeall()
+
+    def cerrar(self):
+        """
+        Retira el pool. Si hay conexiones prestadas (otro hilo todavía trabaja
+        con ellas) el cierre se difiere hasta que se devuelva la última.
+        """
+        with self._lock:
+            self._retirado = True
+            cerrar = self._prestadas == 0
+        if cerrar:
+            self.pool.closeall()
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+def obtener_gestor(db_params):
+    """
+    Devuelve el pool compartido para db_params. Si los parámetros cambiaron
+    (otro host, base o usuario) se retira el pool anterior (se cierra cuando
+    le devuelven sus conexiones) y se crea uno nuevo.
+    """
+    global _gestor
+    with _gestor_lock:
+        if _gestor is not None and _gestor.db_params != dict(db_params):
+            _gestor.cerrar()
+            _gestor = None
+        if _gestor is None:
+            _gestor = GestorConexiones(db_params)
+        return _gestor
+
+def cerrar_conexiones():
+    """Cierra el pool compartido (al salir de la aplicación)."""
+    global _gestor
+    with _gestor_lock:
+        if _gestor is not None:
+            _gestor.cerrar()
+            _gestor = None
+
 def execute_test_connection(db_params, log_callback, after_callback):
 
     try:
-        conn = psycopg2.connect(**db_params, connect_timeout=5)
-        conn.close()
+        gestor = obtener_gestor(db_params)
+        with gestor.conexion() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
         log_callback("✅ ¡Conexión exitosa!")
         after_callback(0, lambda: messagebox.showinfo("Conexión Exitosa","La conexión a la base de datos PostgreSQL fue exitosa."))
     except Exception as e:
         log_callback(f"❌ ERROR de conexión: {e}")
         after_callback(0, lambda: messagebox.showerror("Error de Conexión", f"No se pudo conectar a la base de datos.\n\nError: {e}"))
 
-def execute_load_to_db(db_params, apollo_file, lusha_file, log_callback, after_callback):
+def execute_load_to_db(db_params, apollo_file, lusha_file, log_callback, after_callback, incremental=False,
+                       signal_file=None, resolver_entidades=False):
+    """
+    Carga los CSV de Apollo, Lusha y (opcional) SignalHire en paralelo, cada uno
+    en su propia conexión del pool. El commit es coordinado: solo se confirma si
+    todas las cargas terminaron bien; si alguna falla se revierten todas.
+    Por defecto reemplaza las tablas completas; con incremental=True fusiona solo
+    lo nuevo o modificado (ver _cargar_incremental).
+    Con resolver_entidades=True antes se resuelven las personas entre proveedores
+    (resolucion_entidades) y el resultado se carga en entidades_resueltas, que
+    usa la consolidación.
+    """
+    cargas = [(apollo_file, "resultados_apollo"), (lusha_file, "resultados_lusha")]
+    if signal_file:
+        cargas.append((signal_file, "resultados_signalhire"))
     
-    conn = None
     try:
+        if resolver_entidades:
+            entidades_file = os.path.join(os.path.dirname(apollo_file), "entidades_resueltas.csv")
+            log_callback("Resolviendo entidades entre proveedores...")
+            resolucion_entidades.resolver_archivos(entidades_file, apollo_file, lusha_file, signal_file,
+                                                   log_callback)
+            cargas.append((entidades_file, "entidades_resueltas"))
+
+
         log_callback("Conectando a la base de datos...")
-        conn = psycopg2.connect(**db_params)
-        cur = conn.cursor()
+        gestor = obtener_gestor(db_params)
         log_callback("✅ Conexión exitosa.")
 
-        # --- Eliminar tablas antiguas ---
-        log_callback("Eliminando tablas antiguas (si existen)...")
-        cur.execute("DROP TABLE IF EXISTS resultados_apollo;")
-        cur.execute("DROP TABLE IF EXISTS resultados_lusha;")
-        log_callback("Tablas 'resultados_apollo' y 'resultados_lusha' eliminadas.")
-        
-        # --- Procesar Archivo Apollo ---
-        log_callback(f"Iniciando carga de {apollo_file}...")
-        _process_csv_to_db(cur, apollo_file, "resultados_apollo", log_callback)
-        
-        # --- Procesar Archivo Lusha ---
-        log_callback(f"Iniciando carga de {lusha_file}...")
-        _process_csv_to_db(cur, lusha_file, "resultados_lusha", log_callback)
-
-        conn.commit()
-        cur.close()
-        log_callback("✅ Carga de datos completada exitosamente.")
+        if incremental:
+            # Se crea antes de las cargas paralelas para que no compitan por crearla
+            with gestor.conexion() as conn:
+                with conn.cursor() as cur:
+                    _crear_historial(cur)
+                conn.commit()
+
+        with contextlib.ExitStack() as pila:
+            conexiones = [pila.enter_context(gestor.conexion()) for _ in cargas]
+            log_callback(f"Cargando {len(cargas)} archivos en paralelo...")
+            with ThreadPoolExecutor(max_workers=len(cargas)) as executor:
+                futuros = [
+                    executor.submit(_cargar_tabla, conn, filepath, table_name, incremental, log_callback)
+                    for conn, (filepath, table_name) in zip(conexiones, cargas)
+                ]
+                errores = [futuro.exception() for futuro in futuros]
+            errores = [e for e in errores if e is not None]
+
+            # --- Commit coordinado ---
+            if errores:
+                for conn in conexiones:
+                    conn.rollback()
+                raise errores[0]
+            if not resolver_entidades:
+                # Una resolución anterior ya no corresponde a las tablas recién cargadas
+                with conexiones[0].cursor() as cur:
+                    cur.execute("DROP TABLE IF EXISTS entidades_resueltas;")
+            for conn in conexiones:
+                conn.commit()
+
+        tablas = ', '.join(table_name for _, table_name in cargas)
+        log_callback(f"✅ Carga de datos completada exitosamente ({tablas}).")
         after_callback(0, lambda: messagebox.showinfo("Proceso Completado", 
-                       "Los datos de Apollo y Lusha se han cargado exitosamente."))
+                       f"Los datos se han {'fusionado' if incremental else 'cargado'} exitosamente en: {tablas}."))
 
     except (Exception, psycopg2.DatabaseError) as error:
-        if conn:
-            conn.rollback()
         error_msg = str(error).replace('\n', ' ')
         log_callback(f"❌ ERROR durante la carga a la BD: {error_msg}")
         after_callback(0, lambda: messagebox.showerror("Error en Base de Datos", 
                        f"Ocurrió un error: {error_msg}"))
-    finally:
-        if conn:
-            conn.close()
-            log_callback("Conexión cerrada.")
 
-def _process_csv_to_db(cur, filepath, table_name, log_callback):
- 
+def _cargar_tabla(conn, filepath, table_name, incremental, log_callback):
+    """
+    Carga un archivo en su tabla usando la conexión indicada (sin commit).
+    Las tablas sin clave natural definida se reemplazan aunque se pida modo incremental.
+    """
+    with conn.cursor() as cur:
+        if incremental and table_name in CLAVES_NATURALES:
+            log_callback(f"Iniciando carga incremental de {filepath}...")
+            _cargar_incremental(cur, filepath, table_name, log_callback)
+            return
+        if incremental:
+            log_callback(f"ℹ️ {table_name} no tiene clave natural definida: se reemplaza completa.")
+
+        # --- Eliminar tabla antigua ---
+        cur.execute(f"DROP TABLE IF EXISTS {table_name};")
+        log_callback(f"Tabla '{table_name}' eliminada (si existía).")
+        # Las cargas incrementales previas ya no están en la tabla: se olvidan
+        cur.execute("SELECT to_regclass(%s);", (TABLA_HISTORIAL,))
+        if cur.fetchone()[0] is not None:
+            cur.execute(f"DELETE FROM {TABLA_HISTORIAL} WHERE tabla = %s;", (table_name,))
+
+        log_callback(f"Iniciando carga de {filepath}...")
+        _process_csv_to_db(cur, filepath, table_name, log_callback)
+
+class _LectorConProgreso:
+    """
+    Envuelve el archivo CSV (binario) que consume COPY y reporta por
+    log_callback cada PROGRESO_CADA_MB leídos.
+    """
+
+    def __init__(self, archivo, total_bytes, table_name, log_callback, cada_mb=PROGRESO_CADA_MB):
+        self.archivo = archivo
+        self.total_mb = total_bytes / (1024 * 1024)
+        self.table_name = table_name
+        self.log_callback = log_callback
+        self.cada_bytes = max(1, cada_mb) * 1024 * 1024
+        self.leidos = 0
+        self.proximo_reporte = self.cada_bytes
+
+    def _contar(self, datos):
+        self.leidos += len(datos)
+        if self.leidos >= self.proximo_reporte:
+            self.log_callback(f"📦 {self.table_name}: {self.leidos / (1024 * 1024):.0f} MB de {self.total_mb:.0f} MB cargados...")
+            while self.proximo_reporte <= self.leidos:
+                self.proximo_reporte += self.cada_bytes
+        return datos
+
+    def read(self, size=-1):
+        return self._contar(self.archivo.read(size))
+
+    def readline(self, size=-1):
+        return self._contar(self.archivo.readline(size))
+
+def _limpiar_encabezados(header):
+    """Normaliza los nombres de columna del CSV a identificadores SQL entre comillas."""
+    clean_headers = []
+    for h in header:
+        clean_h = h.lower().strip()
+        clean_h = re.sub(r'[\s\.\-\/]+', '_', clean_h)
+        clean_h = re.sub(r'[^\w_]', '', clean_h)
+        if clean_h and clean_h[0].isdigit():
+            clean_h = f"_{clean_h}"
+        clean_headers.append(f'"{clean_h}"')
+    return clean_headers
+
+def _inferir_tipo(valores):
+    """
+    Tipo SQL para una columna según una muestra de sus valores (vacíos ignorados).
+    Solo se tipa si todos los valores de la muestra son compatibles; si no, TEXT.
+    """
+    valores = [v.strip() for v in valores if v is not None and v.strip() != '']
+    if not valores:
+        return 'TEXT'
+    if all(v.lower() in _VALORES_BOOLEANOS for v in valores):
+        return 'BOOLEAN'
+    # Ceros a la izquierda (códigos postales, teléfonos): se conservan como texto
+    if any(len(v.lstrip('-')) > 1 and v.lstrip('-')[0] == '0' and v.lstrip('-')[1].isdigit() for v in valores):
+        return 'TEXT'
+    if all(_RE_ENTERO.match(v) for v in valores):
+        return 'BIGINT' if all(abs(int(v)) < 2 ** 63 for v in valores) else 'NUMERIC'
+    if all(_RE_NUMERICO.match(v) for v in valores):
+        return 'NUMERIC'
+    return 'TEXT'
+
+def _inferir_esquema(filepath, table_name, clean_headers):
+    """
+    Tipo de cada columna: primero el mapa explícito de la tabla, luego el de
+    columnas conocidas y, para el resto, inferencia sobre las primeras
+    MUESTRA_INFERENCIA filas del archivo.
+    """
+    explicitos = TIPOS_POR_TABLA.get(table_name, {})
+    with open(filepath, mode='r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        muestra = list(itertools.islice(reader, MUESTRA_INFERENCIA))
+
+    tipos = {}
+    for i, columna in enumerate(clean_headers):
+        nombre = columna.strip('"')
+        tipo = explicitos.get(nombre) or TIPOS_COLUMNAS_CONOCIDAS.get(nombre)
+        if tipo is None:
+            tipo = _inferir_tipo([fila[i] for fila in muestra if i < len(fila)])
+        tipos[columna] = tipo
+    return tipos
+
+def _crear_y_copiar(cur, f, filepath, table_name, clean_headers, tipos, temporal, log_callback):
+    """Crea la tabla con los tipos indicados y transmite el resto del archivo con COPY."""
+    cols_sql = ', '.join([f'{h} {tipos[h]}' for h in clean_headers])
+    if temporal:
+        create_sql = f'CREATE TEMP TABLE {table_name} ({cols_sql}) ON COMMIT DROP;'
+    else:
+        create_sql = f'CREATE TABLE {table_name} ({cols_sql});'
+    log_callback(f"Ejecutando: CREATE TABLE {table_name}...")
+    cur.execute(create_sql)
+
+    # FORCE_NOT_NULL conserva los vacíos de las columnas de texto como '' (igual que antes);
+    # en las columnas tipadas un vacío se carga como NULL
+    columnas = ', '.join(clean_headers)
+    columnas_texto = ', '.join([h for h in clean_headers if tipos[h] == 'TEXT'])
+    opciones = "FORMAT csv, ENCODING 'UTF8'" + (f", FORCE_NOT_NULL ({columnas_texto})" if columnas_texto else "")
+    copy_sql = f"COPY {table_name} ({columnas}) FROM STDIN WITH ({opciones})"
+    lector = _LectorConProgreso(f, os.path.getsize(filepath), table_name, log_callback)
+    cur.copy_expert(copy_sql, lector, size=TAMANO_BLOQUE_COPY)
+    return cur.rowcount
+
+def _crear_indices(cur, table_name, clean_headers, log_callback):
+    """Índices sobre las columnas de cruce/deduplicación presentes en la tabla, y ANALYZE."""
+    presentes = {h.strip('"') for h in clean_headers}
+    indexadas = [c for c in COLUMNAS_INDEXADAS if c in presentes]
+    for columna in indexadas:
+        cur.execute(f'CREATE INDEX IF NOT EXISTS ix_{table_name}_{columna} ON {table_name} ("{columna}");')
+    cur.execute(f'ANALYZE {table_name};')
+    if indexadas:
+        log_callback(f"Índices en {table_name}: {', '.join(indexadas)}.")
+
+def _process_csv_to_db(cur, filepath, table_name, log_callback, temporal=False):
+    """
+    Crea la tabla a partir del encabezado del CSV y carga los datos con
+    COPY ... FROM STDIN: el archivo se transmite por bloques directo a
+    PostgreSQL (sin cargarlo en memoria ni insertar fila por fila).
+    Las columnas se tipan con _inferir_esquema y se indexan las claves de cruce;
+    si algún valor no calza con el tipo inferido, se recarga todo como TEXT.
+    Con temporal=True la tabla es de staging (TEMP, todo TEXT, se borra al hacer commit).
+    Retorna (columnas_limpias, filas_cargadas).
+    """
     try:
-        with open(filepath, mode='r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            
-            # 1. Leer y limpiar encabezado
-            header = next(reader)
-            clean_headers = []
-            for h in header:
-                clean_h = h.lower().strip()
-                clean_h = re.sub(r'[\s\.\-\/]+', '_', clean_h)
-                clean_h = re.sub(r'[^\w_]', '', clean_h)
-                if clean_h and clean_h[0].isdigit():
-                    clean_h = f"_{clean_h}"
-                clean_headers.append(f'"{clean_h}"')
+        with open(filepath, mode='rb') as f:
+            # 1. Leer y limpiar encabezado (solo la primera línea; el resto va directo a COPY)
+            primera_linea = f.readline().decode('utf-8-sig')
+            if not primera_linea.strip():
+                raise StopIteration
+            inicio_datos = f.tell()
+            header = next(csv.reader([primera_linea]))
+            clean_headers = _limpiar_encabezados(header)
             
             log_callback(f"Columnas detectadas para {table_name}: {', '.join(clean_headers)}")
 
-            # 2. Crear la tabla
-            cols_sql = ', '.join([f'{h} TEXT' for h in clean_headers])
-            create_sql = f'CREATE TABLE {table_name} ({cols_sql});'
-            log_callback(f"Ejecutando: CREATE TABLE {table_name}...")
-            cur.execute(create_sql)
+            # 2. Crear la tabla y transmitir los datos
+            if temporal:
+                tipos = {h: 'TEXT' for h in clean_headers}
+            else:
+                tipos = _inferir_esquema(filepath, table_name, clean_headers)
+                tipadas = [f"{h} {t}" for h, t in tipos.items() if t != 'TEXT']
+                if tipadas:
+                    log_callback(f"Tipos inferidos para {table_name}: {', '.join(tipadas)}")
 
-            # 3. Preparar e insertar datos
-            data = list(reader)
-            if not data:
-                log_callback(f"Advertencia: El archivo {filepath} no tiene datos después del encabezado.")
-                return
+            if all(t == 'TEXT' for t in tipos.values()):
+                filas = _crear_y_copiar(cur, f, filepath, table_name, clean_headers, tipos, temporal, log_callback)
+            else:
+                cur.execute("SAVEPOINT carga_tipada;")
+                try:
+                    filas = _crear_y_copiar(cur, f, filepath, table_name, clean_headers, tipos, temporal, log_callback)
+                    cur.execute("RELEASE SAVEPOINT carga_tipada;")
+                except psycopg2.DataError as e:
+                    # Un valor fuera de la muestra no calza con el tipo: se recarga todo como TEXT
+                    cur.execute("ROLLBACK TO SAVEPOINT carga_tipada;")
+                    log_callback(f"⚠️ Los tipos inferidos no calzan con todo el archivo ({str(e).strip()}). Se carga como TEXT.")
+                    tipos = {h: 'TEXT' for h in clean_headers}
+                    f.seek(inicio_datos)
+                    filas = _crear_y_copiar(cur, f, filepath, table_name, clean_headers, tipos, temporal, log_callback)
 
-            placeholders = ', '.join(['%s'] * len(clean_headers))
-            insert_sql = f"INSERT INTO {table_name} VALUES ({placeholders});"
-            
-            cur.executemany(insert_sql, data)
-            log_callback(f"✅ {len(data)} registros insertados en {table_name}.")
+            if not temporal:
+                _crear_indices(cur, table_name, clean_headers, log_callback)
+
+            if filas <= 0:
+                log_callback(f"Advertencia: El archivo {filepath} no tiene datos después del encabezado.")
+                return clean_headers, 0
+            log_callback(f"✅ {filas} registros insertados en {table_name}.")
+            return clean_headers, filas
 
     except StopIteration:
         log_callback(f"❌ ERROR: El archivo {filepath} está vacío o no tiene encabezado.")
@@ -104,16 +452,438 @@ def _process_csv_to_db(cur, filepath, table_name, log_callback):
         log_callback(f"❌ ERROR al procesar {filepath}: {e}")
         raise e # Relanzar la excepción para que sea capturada
 
-def execute_clean_data(log_callback):
-    """(Hilo) Simulación de limpieza."""
-    log_callback("... (Simulación) Ejecutando scripts de limpieza en la BD...")
-    # Simular un trabajo que toma tiempo
-    threading.Event().wait(2) 
-    log_callback("... (Simulación) Proceso de limpieza finalizado.")
-
-def execute_consolidate_data(log_callback):
-    """(Hilo) Simulación de consolidación."""
-    log_callback("... (Simulación) Ejecutando lógica de consolidación en la BD...")
-    # Simular un trabajo que toma tiempo
-    threading.Event().wait(3) 
-    log_callback("... (Simulación) Proceso de consolidación finalizado.")
\ No newline at end of file
+def _hash_archivo(filepath):
+    """SHA-256 del contenido del archivo (leído por bloques)."""
+    sha = hashlib.sha256()
+    with open(filepath, mode='rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_COPY), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def _crear_historial(cur):
+    """Tabla con un registro por archivo cargado en modo incremental."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_HISTORIAL} (
+            id SERIAL PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            archivo TEXT,
+            hash_archivo TEXT NOT NULL,
+            filas_archivo BIGINT,
+            filas_nuevas BIGINT,
+            filas_actualizadas BIGINT,
+            filas_sin_clave BIGINT,
+            duracion_segundos NUMERIC(10, 2),
+            cargado_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+            UNIQUE (tabla, hash_archivo)
+        );
+    """)
+
+def _preparar_tabla_destino(cur, table_name, columnas, tipos, clave, log_callback):
+    """
+    Crea la tabla destino si no existe (con los tipos inferidos), agrega columnas
+    nuevas del CSV y garantiza el índice único sobre la clave natural (requerido
+    por ON CONFLICT). El índice es parcial: excluye CLAVES_VACIAS ('' y 'N/A',
+    el valor por defecto de Lusha), que no identifican a un contacto y pueden
+    repetirse. Si la tabla venía de una carga completa con duplicados, se deja
+    una sola fila por clave (no vacía) antes de crear el índice.
+    Retorna el tipo real de cada columna en la tabla destino.
+    """
+    cols_sql = ', '.join([f'{c} {tipos[c]}' for c in columnas])
+    cur.execute(f'CREATE TABLE IF NOT EXISTS {table_name} ({cols_sql});')
+    for columna in columnas:
+        cur.execute(f'ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {columna} {tipos[columna]};')
+
+    indice = f"ux_{table_name}_{clave}"
+    cur.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND indexname = %s;", (indice,))
+    existente = cur.fetchone()
+    if existente is not None and " WHERE " not in existente[0].upper():
+        # Índice de una versión anterior sobre todas las filas: se reemplaza por el parcial
+        cur.execute(f'DROP INDEX {indice};')
+    if existente is None or " WHERE " not in existente[0].upper():
+        log_callback(f"Creando índice único {indice} sobre '{clave}'...")
+        if existente is None:
+            cur.execute(
+                f'DELETE FROM {table_name} a USING {table_name} b '
+                f'WHERE a."{clave}" = b."{clave}" AND a.ctid < b.ctid AND a."{clave}" NOT IN %s;',
+                (CLAVES_VACIAS,)
+            )
+            if cur.rowcount > 0:
+                log_callback(f"Se eliminaron {cur.rowcount} duplicados previos de {table_name}.")
+        cur.execute(
+            f'CREATE UNIQUE INDEX {indice} ON {table_name} ("{clave}") WHERE "{clave}" NOT IN %s;',
+            (CLAVES_VACIAS,)
+        )
+
+    # Las tablas creadas antes de la inferencia de tipos pueden seguir siendo TEXT
+    cur.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s;", (table_name,)
+    )
+    return {f'"{nombre}"': tipo.upper() for nombre, tipo in cur.fetchall()}
+
+def _fusionar(cur, table_name, staging, columnas, clave, tipos_destino, log_callback):
+    """
+    INSERT ... ON CONFLICT del staging en la tabla destino. Retorna (nuevas, actualizadas).
+    Si algún valor no calza con el tipo de su columna en el destino, esas
+    columnas pasan a TEXT y se repite la fusión (como la carga completa).
+    """
+    cols_sql = ', '.join(columnas)
+    actualizar_sql = ', '.join([f'{c} = EXCLUDED.{c}' for c in columnas if c != f'"{clave}"'])
+    valores_destino = ', '.join([f'{table_name}.{c}' for c in columnas])
+    valores_nuevos = ', '.join([f'EXCLUDED.{c}' for c in columnas])
+
+    def ejecutar():
+        # El staging es todo TEXT: las columnas tipadas se convierten (vacío -> NULL)
+        valores_staging = ', '.join([
+            c if tipos_destino.get(c, 'TEXT') == 'TEXT' else f"NULLIF({c}, '')::{tipos_destino[c]}"
+            for c in columnas
+        ])
+        # DISTINCT ON: si el archivo trae la misma clave varias veces, gana la última fila.
+        # El WHERE del DO UPDATE evita reescribir filas que no cambiaron.
+        cur.execute(f"""
+            WITH fusion AS (
+                INSERT INTO {table_name} ({cols_sql})
+                SELECT DISTINCT ON ("{clave}") {valores_staging}
+                FROM (SELECT *, ctid AS orden FROM {staging}) s
+                WHERE "{clave}" IS NOT NULL AND "{clave}" NOT IN %s
+                ORDER BY "{clave}", orden DESC
+                ON CONFLICT ("{clave}") WHERE "{clave}" NOT IN %s DO UPDATE SET {actualizar_sql}
+                WHERE ({valores_destino}) IS DISTINCT FROM ({valores_nuevos})
+                RETURNING (xmax = 0) AS nueva
+            )
+            SELECT COUNT(*) FILTER (WHERE nueva), COUNT(*) FILTER (WHERE NOT nueva) FROM fusion;
+        """, (CLAVES_VACIAS, CLAVES_VACIAS))
+        return cur.fetchone()
+
+    cur.execute("SAVEPOINT fusion_tipada;")
+    try:
+        resultado = ejecutar()
+        cur.execute("RELEASE SAVEPOINT fusion_tipada;")
+        return resultado
+    except psycopg2.DataError as e:
+        cur.execute("ROLLBACK TO SAVEPOINT fusion_tipada;")
+        log_callback(f"⚠️ Hay valores que no calzan con los tipos de {table_name} ({str(e).strip()}).")
+
+    # Se prueba la conversión de cada columna tipada y las que fallan pasan a TEXT
+    for columna in columnas:
+        tipo = tipos_destino.get(columna, 'TEXT')
+        if tipo == 'TEXT':
+            continue
+        cur.execute("SAVEPOINT prueba_tipo;")
+        try:
+            cur.execute(f"SELECT COUNT(NULLIF({columna}, '')::{tipo}) FROM {staging};")
+            cur.execute("RELEASE SAVEPOINT prueba_tipo;")
+        except psycopg2.DataError:
+            cur.execute("ROLLBACK TO SAVEPOINT prueba_tipo;")
+            log_callback(f"⚠️ {columna} de {table_name} pasa de {tipo} a TEXT.")
+            cur.execute(f"ALTER TABLE {table_name} ALTER COLUMN {columna} TYPE TEXT;")
+            tipos_destino[columna] = 'TEXT'
+    return ejecutar()
+
+def _cargar_incremental(cur, filepath, table_name, log_callback):
+    """
+    Carga un CSV en una tabla de staging (COPY) y la fusiona con la tabla
+    destino con INSERT ... ON CONFLICT sobre la clave natural: solo se
+    insertan contactos nuevos y se actualizan los que cambiaron.
+    Un archivo ya cargado (mismo hash) se omite; cada carga queda en el historial.
+    """
+    inicio = time.monotonic()
+    clave = CLAVES_NATURALES[table_name]
+    hash_archivo = _hash_archivo(filepath)
+
+    cur.execute(f"SELECT cargado_en FROM {TABLA_HISTORIAL} WHERE tabla = %s AND hash_archivo = %s;",
+                (table_name, hash_archivo))
+    previa = cur.fetchone()
+    if previa:
+        log_callback(f"⏭️  {os.path.basename(filepath)} ya se cargó en {table_name} ({previa[0]:%Y-%m-%d %H:%M}). Se omite.")
+        return
+
+    staging = f"stg_{table_name}"
+    columnas, filas_archivo = _process_csv_to_db(cur, filepath, staging, log_callback, temporal=True)
+    if f'"{clave}"' not in columnas:
+        raise Exception(f"El archivo {filepath} no tiene la columna clave '{clave}' requerida para la carga incremental.")
+
+    tipos = _inferir_esquema(filepath, table_name, columnas)
+    tipos_destino = _preparar_tabla_destino(cur, table_name, columnas, tipos, clave, log_callback)
+
+    filas_nuevas, filas_actualizadas = _fusionar(cur, table_name, staging, columnas, clave, tipos_destino, log_callback)
+
+    cur.execute(f'SELECT COUNT(*) FROM {staging} WHERE "{clave}" IS NULL OR "{clave}" IN %s;', (CLAVES_VACIAS,))
+    filas_sin_clave = cur.fetchone()[0]
+
+    _crear_indices(cur, table_name, columnas, log_callback)
+
+    duracion = time.monotonic() - inicio
+    cur.execute(f"""
+        INSERT INTO {TABLA_HISTORIAL}
+            (tabla, archivo, hash_archivo, filas_archivo, filas_nuevas, filas_actualizadas, filas_sin_clave, duracion_segundos)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+    """, (table_name, os.path.basename(filepath), hash_archivo, filas_archivo, filas_nuevas,
+          filas_actualizadas, filas_sin_clave, round(duracion, 2)))
+
+    log_callback(f"✅ {table_name}: {filas_nuevas} nuevos, {filas_actualizadas} actualizados "
+                 f"({filas_archivo} filas en el archivo, {duracion:.1f} s).")
+    if filas_sin_clave:
+        log_callback(f"⚠️  {filas_sin_clave} filas sin '{clave}' no se pudieron fusionar.")
+
+# ==========================================================
+# --- LIMPIEZA Y CONSOLIDACIÓN (SQL por conjuntos) ---
+# ==========================================================
+# Todo se ejecuta dentro de PostgreSQL con JOINs y CREATE TABLE AS: no hay
+# bucles fila a fila en Python, así que escala a millones de contactos.
+#
+# Los cargos se estandarizan con normalizador_cargos (el mismo índice que usan
+# los extractores en línea), clasificando una sola vez cada cargo distinto;
+# ver allí el formato de los archivos de mapeo.
+
+# Columnas estándar de contactos_limpios y su origen en cada tabla de resultados.
+# Las columnas que no existan en la tabla cargada quedan en NULL.
+FUENTES_CONTACTOS = {
+    "resultados_apollo": {
+        "prioridad": 1, "id_fuente": "id", "nombre": "name", "cargo": "title", "empresa": "organization_name",
+        "email": "email", "linkedin_url": "linkedin_url", "pais": "country", "telefono": "sanitized_number",
+    },
+    "resultados_lusha": {
+        "prioridad": 2, "id_fuente": "contactid", "nombre": "name", "cargo": "jobtitle", "empresa": "companyname",
+        "email": None, "linkedin_url": None, "pais": "pais_buscado", "telefono": None,
+    },
+    "resultados_signalhire": {
+        "prioridad": 3, "id_fuente": "uid", "nombre": "fullname", "cargo": "title", "empresa": "company",
+        "email": "email", "linkedin_url": "linkedin", "pais": "country", "telefono": "phone",
+    },
+}
+CAMPOS_CONTACTO = ("id_fuente", "nombre", "cargo", "empresa", "email", "linkedin_url", "pais", "telefono")
+# Claves que unen filas en la consolidación (clave_persona: id_persona de entidades_resueltas)
+CLAVES_CONSOLIDACION = ("clave_email", "clave_linkedin", "clave_nombre", "clave_persona")
+# Cargos distintos que se clasifican y copian a lookup_cargos por lote
+LOTE_CARGOS = 50_000
+
+def _sql_valor(expr):
+    """Texto recortado; vacío o 'N/A' (valor por defecto de Lusha) pasan a NULL."""
+    return f"NULLIF(NULLIF(btrim({expr}::text), ''), 'N/A')"
+
+def _sql_normalizar(expr):
+    """Clave de comparación: minúsculas, sin tildes ni espacios repetidos."""
+    return (f"translate(lower(btrim(regexp_replace({expr}::text, '\\s+', ' ', 'g'))), "
+            f"'áéíóúàèìòùäëïöüâêîôûñç', 'aeiouaeiouaeiouaeiounc')")
+
+def _columnas_tabla(cur, table_name):
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s;", (table_name,)
+    )
+    return {fila[0] for fila in cur.fetchall()}
+
+def _cargar_lookup_cargos(conn, cur, normalizador):
+    """
+    Clasifica con el normalizador cada cargo distinto de contactos_fuente y los
+    copia a lookup_cargos por lotes. Retorna la cantidad de cargos distintos.
+    """
+    cur.execute("DROP TABLE IF EXISTS lookup_cargos;")
+    cur.execute("CREATE TABLE lookup_cargos (cargo TEXT PRIMARY KEY, cargo_normalizado TEXT, "
+                "cargo_estandar TEXT, area TEXT);")
+    cur.execute("SELECT DISTINCT cargo FROM contactos_fuente WHERE cargo IS NOT NULL;")
+    total = 0
+    with conn.cursor() as cur_copia:
+        while True:
+            cargos = [fila[0] for fila in cur.fetchmany(LOTE_CARGOS)]
+            if not cargos:
+                break
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            for cargo, (estandar, area) in zip(cargos, normalizador.clasificar_lote(cargos)):
+                escritor.writerow((cargo, normalizador_cargos.normalizar_texto(cargo), estandar, area))
+            buffer.seek(0)
+            cur_copia.copy_expert("COPY lookup_cargos (cargo, cargo_normalizado, cargo_estandar, area) "
+                                  "FROM STDIN WITH (FORMAT csv)", buffer)
+            total += len(cargos)
+    return total
+
+def execute_clean_data(db_params, areas_file, cargos_v1_file, cargos_v2_file, log_callback, after_callback):
+    """
+    (Hilo) Limpieza y estandarización en la BD:
+    1. Reúne los contactos de Apollo, Lusha y SignalHire con columnas comunes.
+    2. Clasifica cada cargo distinto con normalizador_cargos (mapeos v1/v2 y
+       áreas) y lo guarda en lookup_cargos.
+    3. Construye contactos_limpios con cargo estándar y área (un solo JOIN).
+    """
+    try:
+        gestor = obtener_gestor(db_params)
+        with gestor.conexion() as conn:
+            with conn.cursor() as cur:
+                inicio = time.monotonic()
+
+                log_callback("Cargando archivos de mapeo...")
+                normalizador = normalizador_cargos.NormalizadorCargos.desde_archivos(
+                    cargos_v1_file, cargos_v2_file, areas_file)
+                log_callback(f"✅ Mapeos: {len(normalizador.indice)} cargos de origen, "
+                             f"{len(normalizador.areas)} cargos con área.")
+
+                # --- 1. Contactos de todas las fuentes con columnas comunes ---
+                selects = []
+                for table_name, mapa in FUENTES_CONTACTOS.items():
+                    cur.execute("SELECT to_regclass(%s);", (table_name,))
+                    if cur.fetchone()[0] is None:
+                        log_callback(f"ℹ️ {table_name} no existe; se omite.")
+                        continue
+                    existentes = _columnas_tabla(cur, table_name)
+                    campos = []
+                    for campo in CAMPOS_CONTACTO:
+                        columna = mapa[campo]
+                        if columna and columna in existentes:
+                            origen = f'"{columna}"'
+                            campos.append(f"{_sql_valor(origen)} AS {campo}")
+                        else:
+                            campos.append(f"NULL::text AS {campo}")
+                    selects.append(
+                        f"SELECT '{table_name.replace('resultados_', '')}'::text AS fuente, "
+                        f"{mapa['prioridad']} AS prioridad, {', '.join(campos)} FROM {table_name}"
+                    )
+                if not selects:
+                    raise Exception("No hay tablas de resultados cargadas. Ejecute primero 'Cargar a Base de Datos'.")
+
+                cur.execute(f"CREATE TEMP TABLE contactos_fuente ON COMMIT DROP AS {' UNION ALL '.join(selects)};")
+
+                # --- 2. Cargos estándar y áreas ---
+                distintos = _cargar_lookup_cargos(conn, cur, normalizador)
+                log_callback(f"✅ lookup_cargos: {distintos} cargos distintos clasificados.")
+
+                # --- 3. Contactos limpios ---
+                cur.execute("DROP TABLE IF EXISTS contactos_limpios;")
+                cur.execute("""
+                    CREATE TABLE contactos_limpios AS
+                    SELECT row_number() OVER () AS fila, c.*,
+                           lc.cargo_normalizado,
+                           COALESCE(lc.cargo_estandar, c.cargo) AS cargo_estandar,
+                           lc.area
+                    FROM contactos_fuente c
+                    LEFT JOIN lookup_cargos lc ON lc.cargo = c.cargo;
+                """)
+                filas = cur.rowcount
+                cur.execute("ALTER TABLE contactos_limpios ADD PRIMARY KEY (fila);")
+                cur.execute("ANALYZE contactos_limpios;")
+
+                cur.execute("""
+                    SELECT COUNT(*), COUNT(*) FILTER (WHERE cargo_estandar IS DISTINCT FROM cargo),
+                           COUNT(area)
+                    FROM contactos_limpios;
+                """)
+                total, estandarizados, con_area = cur.fetchone()
+            conn.commit()
+
+        log_callback(f"✅ contactos_limpios: {filas} contactos, {estandarizados} cargos estandarizados, "
+                     f"{con_area} con área asignada ({time.monotonic() - inicio:.1f} s).")
+        after_callback(0, lambda: messagebox.showinfo("Proceso Completado",
+                       f"Limpieza finalizada: {total} contactos en 'contactos_limpios'."))
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        error_msg = str(error).replace('\n', ' ')
+        log_callback(f"❌ ERROR durante la limpieza: {error_msg}")
+        after_callback(0, lambda: messagebox.showerror("Error en Base de Datos", f"Ocurrió un error: {error_msg}"))
+
+def execute_consolidate_data(db_params, log_callback, after_callback):
+    """
+    (Hilo) Consolida contactos_limpios en contactos_consolidados: dos filas son
+    la misma persona si comparten email, URL de LinkedIn o nombre + empresa
+    (también de forma transitiva). Si la carga resolvió entidades, también las
+    que resolucion_entidades asignó a la misma persona (nombres compatibles
+    dentro de la empresa). Los grupos se calculan con propagación de
+    etiquetas en SQL (UPDATE por conjuntos hasta que no cambian) y cada campo
+    toma el primer valor no vacío según la prioridad de la fuente.
+    """
+    try:
+        gestor = obtener_gestor(db_params)
+        with gestor.conexion() as conn:
+            with conn.cursor() as cur:
+                inicio = time.monotonic()
+                cur.execute("SELECT to_regclass('contactos_limpios');")
+                if cur.fetchone()[0] is None:
+                    raise Exception("No existe 'contactos_limpios'. Ejecute primero 'Limpiar y Estandarizar'.")
+
+                # --- 1. Claves de coincidencia por fila ---
+                cur.execute("SELECT to_regclass('entidades_resueltas');")
+                if cur.fetchone()[0] is None:
+                    clave_persona, entidades = "NULL::text", ""
+                else:
+                    log_callback("ℹ️ Usando entidades_resueltas para unir personas entre proveedores.")
+                    clave_persona = "NULLIF(er.id_persona, '')"
+                    entidades = """
+                        LEFT JOIN (
+                            SELECT DISTINCT ON (fuente, id_fuente) fuente, id_fuente, id_persona
+                            FROM entidades_resueltas
+                        ) er ON er.fuente = c.fuente AND er.id_fuente = c.id_fuente"""
+                cur.execute(f"""
+                    CREATE TEMP TABLE grupos_contacto ON COMMIT DROP AS
+                    SELECT c.fila,
+                           CASE WHEN c.email LIKE '%@%' AND c.email NOT LIKE 'email_not_unlocked%'
+                                THEN lower(c.email) END AS clave_email,
+                           NULLIF(regexp_replace(lower(c.linkedin_url), '^https?://(www\\.)?|/+$', '', 'g'), '') AS clave_linkedin,
+                           CASE WHEN c.nombre IS NOT NULL AND c.empresa IS NOT NULL
+                                THEN {_sql_normalizar('c.nombre')} || '|' || {_sql_normalizar('c.empresa')} END AS clave_nombre,
+                           {clave_persona} AS clave_persona,
+                           c.fila AS grupo
+                    FROM contactos_limpios c{entidades};
+                """)
+                for clave in ("fila",) + CLAVES_CONSOLIDACION:
+                    cur.execute(f"CREATE INDEX ON grupos_contacto ({clave});")
+                cur.execute("ANALYZE grupos_contacto;")
+
+                # --- 2. Propagación: cada fila toma el menor grupo de las filas con las que comparte una clave ---
+                # Los grupos solo bajan, así que siempre converge; se repite hasta una pasada sin cambios.
+                # El salto de puntero (el grupo de mi grupo) acorta las cadenas largas a pocas pasadas.
+                for pasada in itertools.count(1):
+                    cambios = 0
+                    for clave in CLAVES_CONSOLIDACION:
+                        cur.execute(f"""
+                            UPDATE grupos_contacto g SET grupo = m.grupo
+                            FROM (
+                                SELECT {clave}, MIN(grupo) AS grupo FROM grupos_contacto
+                                WHERE {clave} IS NOT NULL GROUP BY {clave}
+                            ) m
+                            WHERE g.{clave} = m.{clave} AND g.grupo > m.grupo;
+                        """)
+                        cambios += cur.rowcount
+                    cur.execute("""
+                        UPDATE grupos_contacto g SET grupo = p.grupo
+                        FROM grupos_contacto p
+                        WHERE p.fila = g.grupo AND p.grupo < g.grupo;
+                    """)
+                    cambios += cur.rowcount
+                    log_callback(f"Pasada {pasada}: {cambios} filas reagrupadas.")
+                    if cambios == 0:
+                        break
+
+                # --- 3. Una fila por persona ---
+                def primero(campo):
+                    return f"(array_agg(c.{campo} ORDER BY c.prioridad, c.fila) FILTER (WHERE c.{campo} IS NOT NULL))[1] AS {campo}"
+
+                cur.execute("DROP TABLE IF EXISTS contactos_consolidados;")
+                cur.execute(f"""
+                    CREATE TABLE contactos_consolidados AS
+                    SELECT g.grupo AS id_contacto,
+                           {', '.join(primero(campo) for campo in ('nombre', 'cargo', 'cargo_estandar', 'area', 'empresa', 'email', 'linkedin_url', 'pais', 'telefono'))},
+                           string_agg(DISTINCT c.fuente, ', ') AS fuentes,
+                           string_agg(DISTINCT c.fuente || ':' || c.id_fuente, ', ') AS ids_fuente,
+                           COUNT(*) AS registros
+                    FROM contactos_limpios c
+                    JOIN grupos_contacto g USING (fila)
+                    GROUP BY g.grupo;
+                """)
+                consolidados = cur.rowcount
+                cur.execute("ALTER TABLE contactos_consolidados ADD PRIMARY KEY (id_contacto);")
+                for columna in ("email", "linkedin_url", "empresa"):
+                    cur.execute(f"CREATE INDEX ON contactos_consolidados ({columna});")
+                cur.execute("ANALYZE contactos_consolidados;")
+                cur.execute("SELECT COUNT(*) FROM contactos_limpios;")
+                originales = cur.fetchone()[0]
+            conn.commit()
+
+        log_callback(f"✅ contactos_consolidados: {originales} registros → {consolidados} contactos únicos "
+                     f"({time.monotonic() - inicio:.1f} s).")
+        after_callback(0, lambda: messagebox.showinfo("Proceso Completado",
+                       f"Consolidación finalizada: {consolidados} contactos únicos en 'contactos_consolidados'."))
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        error_msg = str(error).replace('\n', ' ')
+        log_callback(f"❌ ERROR durante la consolidación: {error_msg}")
+        after_callback(0, lambda: messagebox.showerror("Error en Base de Datos", f"Ocurrió un error: {error_msg}"))
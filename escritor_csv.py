@@ -0,0 +1,111 @@
+import csv
+import queue
+import threading
+import time
+
+# ==========================================================
+# --- ESCRITOR CSV CON BUFFER (un solo thread escritor) ---
+# ==========================================================
+# Los workers no abren el archivo: encolan sus filas en una cola acotada y un
+# thread dedicado las escribe con un único file handle abierto, agrupándolas
+# y haciendo flush al juntar 'max_filas' o cada 'max_segundos'.
+# Cada envío puede traer un callback (p. ej. marcar la tarea en la bitácora)
+# que se ejecuta recién después del flush: si el proceso se cae, ninguna
+# tarea queda marcada sin que sus filas estén en disco.
+
+MAX_FILAS_POR_FLUSH = 500
+MAX_SEGUNDOS_POR_FLUSH = 1.0
+MAX_ENVIOS_EN_COLA = 1000
+
+_FIN = object()
+
+
+class EscritorCSV:
+    """Escritor de CSV thread-safe con buffer y flush por tamaño o tiempo."""
+
+    def __init__(self, ruta, campos, modo="a", encoding="utf-8", escribir_encabezado=False,
+                 max_filas=MAX_FILAS_POR_FLUSH, max_segundos=MAX_SEGUNDOS_POR_FLUSH,
+                 max_en_cola=MAX_ENVIOS_EN_COLA):
+        self.ruta = ruta
+        self.max_filas = max(1, int(max_filas))
+        self.max_segundos = max_segundos
+        self.filas_escritas = 0
+        self.error = None
+
+        self.archivo = open(ruta, mode=modo, newline="", encoding=encoding)
+        self.writer = csv.DictWriter(self.archivo, fieldnames=campos)
+        if escribir_encabezado:
+            self.writer.writeheader()
+            self.archivo.flush()
+
+        # Cola acotada: si el disco no da abasto, los workers esperan (backpressure)
+        self.cola = queue.Queue(maxsize=max(1, int(max_en_cola)))
+        self.thread = threading.Thread(target=self._bucle, name="escritor-csv", daemon=True)
+        self.thread.start()
+
+    def escribir(self, filas, al_escribir=None):
+        """
+        Encola filas para escritura. 'al_escribir' (opcional) se llama cuando
+        esas filas ya se escribieron y se hizo flush del archivo.
+        Lanza la excepción del thread escritor si la escritura falló.
+        """
+        if self.error is not None:
+            raise self.error
+        if filas or al_escribir is not None:
+            self.cola.put((filas, al_escribir))
+
+    def _bucle(self):
+        filas_pendientes = []
+        callbacks = []
+        limite = None
+        while True:
+            espera = None if limite is None else max(0.0, limite - time.monotonic())
+            try:
+                envio = self.cola.get(timeout=espera)
+            except queue.Empty:
+                envio = None
+
+            if envio is _FIN:
+                self._flush(filas_pendientes, callbacks)
+                return
+            if envio is not None:
+                filas, al_escribir = envio
+                filas_pendientes.extend(filas)
+                if al_escribir is not None:
+                    callbacks.append(al_escribir)
+                if limite is None:
+                    limite = time.monotonic() + self.max_segundos
+
+            if len(filas_pendientes) >= self.max_filas or (limite is not None and time.monotonic() >= limite):
+                self._flush(filas_pendientes, callbacks)
+                filas_pendientes = []
+                callbacks = []
+                limite = None
+
+    def _flush(self, filas, callbacks):
+        if self.error is not None:
+            return  # Tras un error se descartan los envíos para no bloquear a los workers
+        try:
+            if filas:
+                self.writer.writerows(filas)
+                self.archivo.flush()
+                self.filas_escritas += len(filas)
+        except (OSError, ValueError) as e:
+            self.error = e
+            return
+        for al_escribir in callbacks:
+            try:
+                al_escribir()
+            except Exception:
+                pass
+
+    def cerrar(self):
+        """
+        Escribe lo pendiente, detiene el thread y cierra el archivo.
+        Si hubo un error de escritura queda en self.error.
+        """
+        if self.thread.is_alive():
+            self.cola.put(_FIN)
+            self.thread.join()
+        if not self.archivo.closed:
+            self.archivo.close()
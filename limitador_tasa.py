@@ -0,0 +1,239 @@
+import threading
+import time
+
+# ==========================================================
+# --- LIMITADOR DE TASA Y CONCURRENCIA ADAPTATIVA (por proveedor) ---
+# ==========================================================
+# Todos los workers de un proveedor comparten un mismo ControlTrafico:
+#  - TokenBucket: limita los requests por minuto al techo del plan.
+#  - ConcurrenciaAdaptativa (AIMD): sube de a 1 el número de requests en
+#    vuelo mientras no haya 429 y lo reduce a la mitad cuando aparecen.
+#  - Los headers de rate limit / Retry-After del proveedor ajustan la tasa
+#    y pausan el bucket hasta que la ventana se renueva. Solo se usan los
+#    headers cuya ventana es explícitamente de un minuto, y nunca suben la
+#    tasa por encima de la configurada (requests_por_minuto).
+
+# Valores por defecto por proveedor (ajustables con requests_por_minuto)
+LIMITES_POR_DEFECTO = {
+    'apollo': {'requests_por_minuto': 200, 'concurrencia_inicial': 10, 'concurrencia_maxima': 30},
+    'lusha': {'requests_por_minuto': 120, 'concurrencia_inicial': 5, 'concurrencia_maxima': 20},
+}
+
+# Headers con ventana de un minuto: los de Apollo (x-rate-limit-minute,
+# x-minute-requests-left) y la variante *-minute de los x-ratelimit-*.
+# Los genéricos sin ventana (x-ratelimit-limit / -remaining) se ignoran:
+# pueden ser por segundo, hora o día y desajustarían la tasa.
+_HEADERS_LIMITE = ('x-rate-limit-minute', 'x-ratelimit-limit-minute')
+_HEADERS_RESTANTES = ('x-minute-requests-left', 'x-ratelimit-remaining-minute')
+_HEADERS_RESET = ('x-ratelimit-reset', 'x-rate-limit-reset')
+
+
+def esperar(segundos, stop_event=None):
+    """
+    Duerme 'segundos' pero despierta de inmediato si se activa stop_event.
+    Retorna False si la espera fue interrumpida por cancelación.
+    """
+    if segundos <= 0:
+        return not (stop_event and stop_event.is_set())
+    if stop_event is None:
+        time.sleep(segundos)
+        return True
+    return not stop_event.wait(segundos)
+
+
+def _leer_numero(headers, nombres):
+    for nombre in nombres:
+        valor = headers.get(nombre)
+        if valor is None:
+            continue
+        try:
+            return float(valor)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def leer_retry_after(headers):
+    """Segundos indicados por el header Retry-After (solo formato numérico)."""
+    return _leer_numero(headers, ('retry-after',))
+
+
+class TokenBucket:
+    """Bucket de tokens thread-safe: 'requests_por_minuto' con ráfagas de hasta 'rafaga'."""
+
+    def __init__(self, requests_por_minuto, rafaga=None):
+        self.lock = threading.Lock()
+        self.ajustar_tasa(requests_por_minuto, rafaga)
+        self.tokens = float(self.rafaga)
+        self.ultimo = time.monotonic()
+        self.pausado_hasta = 0.0
+
+    def ajustar_tasa(self, requests_por_minuto, rafaga=None):
+        requests_por_minuto = max(1.0, float(requests_por_minuto))
+        with self.lock:
+            self.requests_por_minuto = requests_por_minuto
+            self.tasa = requests_por_minuto / 60.0
+            # Por defecto se permite una ráfaga de ~5 segundos de tasa
+            self.rafaga = max(1.0, float(rafaga) if rafaga else self.tasa * 5)
+            if hasattr(self, 'tokens'):
+                self.tokens = min(self.tokens, self.rafaga)
+
+    def pausar(self, segundos):
+        """No entrega tokens durante 'segundos' (Retry-After o ventana agotada)."""
+        with self.lock:
+            self.pausado_hasta = max(self.pausado_hasta, time.monotonic() + segundos)
+            self.tokens = 0.0
+
+    def _rellenar(self, ahora):
+        transcurrido = ahora - self.ultimo
+        self.ultimo = ahora
+        self.tokens = min(self.rafaga, self.tokens + transcurrido * self.tasa)
+
+    def tomar(self):
+        """
+        Intenta tomar un token sin bloquear.
+        Retorna 0 si lo obtuvo, o los segundos a esperar antes de volver a intentar.
+        """
+        with self.lock:
+            ahora = time.monotonic()
+            if ahora < self.pausado_hasta:
+                return self.pausado_hasta - ahora
+            self._rellenar(ahora)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.tasa
+
+    def adquirir(self, stop_event=None):
+        """Bloquea hasta obtener un token. Retorna False si se canceló la espera."""
+        while True:
+            espera = self.tomar()
+            if espera == 0:
+                return True
+            if not esperar(min(espera, 1.0), stop_event):
+                return False
+
+
+class ConcurrenciaAdaptativa:
+    """
+    Semáforo con límite variable (AIMD): +1 cada 'limite' respuestas exitosas,
+    límite a la mitad ante un 429.
+    """
+
+    def __init__(self, inicial, minimo=1, maximo=None):
+        self.minimo = max(1, int(minimo))
+        self.maximo = max(self.minimo, int(maximo or inicial))
+        self.limite = min(max(int(inicial), self.minimo), self.maximo)
+        self.en_vuelo = 0
+        self.exitos = 0
+        self.condicion = threading.Condition()
+
+    def adquirir(self, stop_event=None):
+        with self.condicion:
+            while self.en_vuelo >= self.limite:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                self.condicion.wait(0.5)
+            if stop_event is not None and stop_event.is_set():
+                return False
+            self.en_vuelo += 1
+            return True
+
+    def liberar(self):
+        with self.condicion:
+            self.en_vuelo = max(0, self.en_vuelo - 1)
+            self.condicion.notify()
+
+    def registrar_exito(self):
+        with self.condicion:
+            self.exitos += 1
+            if self.exitos >= self.limite and self.limite < self.maximo:
+                self.limite += 1
+                self.exitos = 0
+                self.condicion.notify()
+
+    def registrar_limite(self):
+        with self.condicion:
+            self.limite = max(self.minimo, self.limite // 2)
+            self.exitos = 0
+
+
+class ControlTrafico:
+    """Combina el bucket de tasa y la concurrencia adaptativa de un proveedor."""
+
+    def __init__(self, proveedor, requests_por_minuto, concurrencia_inicial, concurrencia_maxima):
+        self.proveedor = proveedor
+        # Techo configurado: los headers del proveedor pueden bajar la tasa, nunca subirla de aquí
+        self.requests_por_minuto = float(requests_por_minuto)
+        self.bucket = TokenBucket(requests_por_minuto)
+        self.concurrencia = ConcurrenciaAdaptativa(concurrencia_inicial, maximo=concurrencia_maxima)
+
+    @property
+    def concurrencia_maxima(self):
+        return self.concurrencia.maximo
+
+    def adquirir(self, stop_event=None):
+        """Reserva un lugar de concurrencia y un token. False si se canceló."""
+        if not self.concurrencia.adquirir(stop_event):
+            return False
+        if not self.bucket.adquirir(stop_event):
+            self.concurrencia.liberar()
+            return False
+        return True
+
+    def liberar(self):
+        self.concurrencia.liberar()
+
+    def configurar_tasa(self, requests_por_minuto):
+        """Cambia el techo configurado de requests por minuto."""
+        self.requests_por_minuto = float(requests_por_minuto)
+        self.bucket.ajustar_tasa(requests_por_minuto)
+
+    def registrar_respuesta(self, response):
+        """
+        Actualiza el control con el status y headers de la respuesta.
+        Retorna los segundos a esperar antes de reintentar (solo en 429), o None.
+        """
+        headers = response.headers
+        limite = _leer_numero(headers, _HEADERS_LIMITE)
+        if limite and limite > 0:
+            limite = min(limite, self.requests_por_minuto)
+            if abs(limite - self.bucket.requests_por_minuto) >= 1:
+                self.bucket.ajustar_tasa(limite)
+
+        restantes = _leer_numero(headers, _HEADERS_RESTANTES)
+        if restantes is not None and restantes <= 0:
+            reset = _leer_numero(headers, _HEADERS_RESET)
+            self.bucket.pausar(reset if reset and reset < 3600 else 60)
+
+        if response.status_code == 429:
+            self.concurrencia.registrar_limite()
+            espera = leer_retry_after(headers)
+            if espera is not None:
+                self.bucket.pausar(espera)
+            return espera
+        if response.status_code < 400:
+            self.concurrencia.registrar_exito()
+        return None
+
+
+_controles = {}
+_controles_lock = threading.Lock()
+
+
+def obtener_control(proveedor, requests_por_minuto=None):
+    """
+    Devuelve el ControlTrafico compartido del proveedor ('apollo' o 'lusha').
+    Si se indica requests_por_minuto, se ajusta la tasa del bucket existente.
+    """
+    with _controles_lock:
+        control = _controles.get(proveedor)
+        if control is None:
+            config = dict(LIMITES_POR_DEFECTO[proveedor])
+            if requests_por_minuto:
+                config['requests_por_minuto'] = requests_por_minuto
+            control = ControlTrafico(proveedor, **config)
+            _controles[proveedor] = control
+        elif requests_por_minuto:
+            control.configurar_tasa(requests_por_minuto)
+        return control
@@ -5,15 +5,24 @@ import os
 import time
 import uuid # Para generar el requestId
 import urllib3 # <--- AÑADIDO
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import bitacora
+import cache_respuestas
+import cliente_http
+import escritor_csv
+import limitador_tasa
 
 # --- DESHABILITAR ADVERTENCIAS DE SSL ---
 # Esto es necesario al usar verify=False en redes corporativas
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # --- CONFIGURACIÓN ---
-API_URL = "https://api.lusha.com/prospecting/company/enrich"
-# Lusha permite enviar múltiples IDs a la vez. Un lote de 20 es un número seguro y eficiente.
+API_URL = f"{cliente_http.LUSHA_BASE_URL}/prospecting/company/enrich"
+# Lusha permite enviar múltiples IDs a la vez. Un lote de 20 es el mínimo usado por defecto;
+# con listas grandes el tamaño se ajusta automáticamente hasta el máximo del endpoint.
 BATCH_SIZE = 20
+MAX_BATCH_SIZE = 100
 
 # Columnas que se incluirán en el archivo CSV
 CSV_HEADERS = [
@@ -112,9 +121,88 @@ def load_organization_ids_from_csv(filepath, log_callback):
 
 # --- PROCESO PRINCIPAL ---
 
-def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_event):
+def calcular_tamano_lote(total_ids, max_workers, tamano_lote=None):
+    """
+    Tamaño de lote a usar. Si no se indica, se reparte la lista entre los workers
+    (mín. BATCH_SIZE) para usar lotes lo más grandes posible sin dejar workers ociosos.
+    Nunca supera MAX_BATCH_SIZE.
+    """
+    if tamano_lote:
+        return max(1, min(int(tamano_lote), MAX_BATCH_SIZE))
+    por_worker = -(-total_ids // max(1, max_workers))
+    return max(1, min(MAX_BATCH_SIZE, max(BATCH_SIZE, por_worker)))
+
+def _lotes_pendientes(organization_ids, tamano, registro):
+    """
+    Genera (num_lote, ids) bajo demanda, omitiendo los lotes ya registrados
+    en la bitácora. Los lotes no se materializan todos en memoria.
+    """
+    for num_lote, inicio in enumerate(range(0, len(organization_ids), tamano), start=1):
+        if not registro.completada(num_lote):
+            yield num_lote, organization_ids[inicio:inicio + tamano]
+
+def _procesar_lote(sesion, control, cache, batch_ids, num_lote, total_lotes, log_callback, stop_event):
+    """
+    Consulta un lote de IDs. Retorna (estado, resultados) donde estado es
+    'ok', 'auth' (API key inválida), 'error' o 'cancelado'.
+    """
+    if stop_event.is_set():
+        return 'cancelado', []
+
+    log_callback(f"Consultando lote {num_lote} de {total_lotes} (IDs: {', '.join(batch_ids[:3])}...)")
+
+    # Preparar payload (los headers ya están en la sesión)
+    payload = json.dumps({
+        "requestId": str(uuid.uuid4()), # Genera un ID único para la solicitud
+        "companiesIds": batch_ids
+    })
+
+    try:
+        # La sesión de Lusha ya usa verify=False
+        response = cliente_http.enviar(sesion, "POST", API_URL, control=control, stop_event=stop_event,
+                                       cache=cache, data=payload)
+        if response is None:
+            return 'cancelado', []
+        
+        # --- CAMBIO AQUÍ: Aceptar 200 (OK) y 201 (Created) como éxito ---
+        if response.status_code == 200 or response.status_code == 201:
+            try:
+                data = response.json()
+            except ValueError:
+                log_callback(f"❌ Error en lote {num_lote}: la respuesta no es un JSON válido.")
+                return 'error', []
+            if not isinstance(data, dict):
+                log_callback(f"❌ Error en lote {num_lote}: formato de respuesta inesperado.")
+                return 'error', []
+            companies_list = data.get('companies', [])
+            log_callback(f"✔ Lote {num_lote} procesado. Se encontraron {len(companies_list)} organizaciones.")
+            return 'ok', [extract_company_data(company_data) for company_data in companies_list]
+                
+        elif response.status_code == 401 or response.status_code == 403:
+            log_callback(f"❌ ERROR DE AUTENTICACIÓN (Lote {num_lote}): {response.status_code}. Revisa tu API Key.")
+            log_callback(f"Respuesta: {response.text}")
+            return 'auth', []
+        else:
+            log_callback(f"❌ Error HTTP en lote {num_lote}: {response.status_code} {response.reason}")
+            log_callback(f"Respuesta: {response.text}")
+            return 'error', []
+
+    except requests.exceptions.RequestException as e:
+        log_callback(f"❌ Ocurrió un error de conexión en el lote {num_lote}: {e}")
+        return 'error', []
+
+def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_event, requests_por_minuto=None,
+        max_workers=None, tamano_lote=None, usar_cache=True, reanudar=True, max_lotes_en_memoria=None):
     """
     Recorre la lista de IDs de un CSV, consulta la API de Lusha y guarda los resultados.
+    Los lotes se envían en paralelo (max_workers) respetando el limitador de tasa
+    compartido de Lusha (requests_por_minuto). tamano_lote=None lo ajusta automáticamente.
+    Con usar_cache=True se reutilizan respuestas guardadas en disco.
+    Cada lote se escribe al CSV apenas termina (thread escritor con cola acotada), así
+    que la memoria no crece con el tamaño del trabajo y una caída conserva lo escrito.
+    max_lotes_en_memoria limita los lotes enviados cuyo resultado aún no se escribió
+    (por defecto 2 × max_workers). Con reanudar=True, si una ejecución anterior con
+    los mismos IDs quedó incompleta, se omiten los lotes ya escritos.
     """
     
     # 1. Cargar los IDs desde el CSV
@@ -128,74 +216,69 @@ def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_ev
     # 2. Definir archivo de salida
     output_csv_file = os.path.join(output_folder, 'lusha_organizations_output.csv')
     
+    control = limitador_tasa.obtener_control('lusha', requests_por_minuto)
+    max_workers = max_workers or control.concurrencia_maxima
+    tamano = calcular_tamano_lote(len(organization_ids), max_workers, tamano_lote)
+    total_lotes = -(-len(organization_ids) // tamano)
+    ventana = max(1, int(max_lotes_en_memoria or max_workers * 2))
+    
+    huella = bitacora.huella_trabajo(extractor='lusha_organizaciones', ids=organization_ids, tamano_lote=tamano)
+    registro = bitacora.Bitacora(output_csv_file, huella, reanudar=reanudar)
+    
     log_callback(f"🚀 Iniciando la extracción de {len(organization_ids)} organizaciones desde Lusha...")
+    log_callback(f"⚙️  {total_lotes} lotes de hasta {tamano} IDs, hasta {max_workers} en paralelo.")
     log_callback(f"Los resultados se guardarán en: {output_csv_file}")
+    if registro.reanudando:
+        log_callback(f"♻️  Reanudando trabajo interrumpido: {len(registro.completadas)} de {total_lotes} lotes ya estaban guardados.")
 
-    all_results = []
+    total_resultados = 0
+    lotes_con_error = 0
+    completo = False
+    escritor = None
+    # Sesión compartida por los workers (pool del tamaño de max_workers)
+    sesion = cliente_http.sesion_lusha(api_key, pool_size=max_workers)
+    cache = cache_respuestas.obtener_cache(usar_cache)
     
     try:
-        # 3. Dividir los IDs en lotes
-        for i in range(0, len(organization_ids), BATCH_SIZE):
-            
-            # Verificar señal de detención antes de cada lote
-            if stop_event.is_set():
-                log_callback("🛑 Proceso cancelado por el usuario.")
-                break
-            
-            batch_ids = organization_ids[i:i + BATCH_SIZE]
-            
-            log_callback(f"\nConsultando lote {i//BATCH_SIZE + 1} de {len(organization_ids)//BATCH_SIZE + 1} (IDs: {', '.join(batch_ids[:3])}...)")
+        # El thread escritor hace flush por tamaño/tiempo y recién entonces marca el lote en la bitácora
+        escritor = escritor_csv.EscritorCSV(output_csv_file, CSV_HEADERS, modo='a' if registro.reanudando else 'w',
+                                            escribir_encabezado=not registro.reanudando, max_en_cola=ventana)
+        pendientes = _lotes_pendientes(organization_ids, tamano, registro)
+        detener = False
 
-            # 4. Preparar payload y headers
-            payload = json.dumps({
-                "requestId": str(uuid.uuid4()), # Genera un ID único para la solicitud
-                "companiesIds": batch_ids
-            })
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'api_key': api_key # Usa la API key del argumento
-                # No incluir la cookie de Postman, no es necesaria y fallaría
-            }
+        # 3. Enviar los lotes en paralelo, con a lo sumo 'ventana' lotes sin escribir a la vez
+        # El vigilante aborta los requests en vuelo apenas se cancela
+        with cliente_http.VigilanteCancelacion(stop_event, sesion), \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            en_vuelo = {}
+            while True:
+                while len(en_vuelo) < ventana and not detener and not stop_event.is_set():
+                    siguiente = next(pendientes, None)
+                    if siguiente is None:
+                        break
+                    num_lote, batch_ids = siguiente
+                    futuro = executor.submit(_procesar_lote, sesion, control, cache, batch_ids, num_lote, total_lotes, log_callback, stop_event)
+                    en_vuelo[futuro] = num_lote
+                if not en_vuelo:
+                    break
 
-            # 5. Realizar la llamada a la API
-            try:
-                # --- CAMBIO AQUÍ: Añadido verify=False ---
-                response = requests.request("POST", API_URL, headers=headers, data=payload, verify=False)
-                
-                # --- CAMBIO AQUÍ: Aceptar 200 (OK) y 201 (Created) como éxito ---
-                if response.status_code == 200 or response.status_code == 201:
-                    data = response.json()
-                    companies_list = data.get('companies', [])
-                    log_callback(f"✔ Lote procesado. Se encontraron {len(companies_list)} organizaciones.")
+                completados, _ = wait(en_vuelo, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in completados:
+                    num_lote = en_vuelo.pop(future)
+                    estado, resultados = future.result()
+                    if estado == 'ok':
+                        escritor.escribir(resultados, al_escribir=lambda n=num_lote: registro.marcar(n))
+                        total_resultados += len(resultados)
+                    elif estado != 'cancelado':
+                        lotes_con_error += 1
                     
-                    for company_data in companies_list:
-                        flattened_data = extract_company_data(company_data)
-                        all_results.append(flattened_data)
-                        
-                elif response.status_code == 401 or response.status_code == 403:
-                    log_callback(f"❌ ERROR DE AUTENTICACIÓN (Lote {i//BATCH_SIZE + 1}): {response.status_code}. Revisa tu API Key.")
-                    log_callback(f"Respuesta: {response.text}")
-                    break # Detener el proceso si la API key es inválida
-                else:
-                    log_callback(f"❌ Error HTTP en lote {i//BATCH_SIZE + 1}: {response.status_code} {response.reason}")
-                    log_callback(f"Respuesta: {response.text}")
-
-            except requests.exceptions.RequestException as e:
-                log_callback(f"❌ Ocurrió un error de conexión en el lote {i//BATCH_SIZE + 1}: {e}")
-            
-            # Pausa de 1 segundo entre solicitudes para no sobrecargar la API
-            time.sleep(1)
-
-        # 6. Escribir todos los resultados al CSV
-        if all_results:
-            log_callback("\nEscribiendo resultados en el archivo CSV...")
-            with open(output_csv_file, mode='w', newline='', encoding='utf-8') as csv_file:
-                writer = csv.DictWriter(csv_file, fieldnames=CSV_HEADERS)
-                writer.writeheader()
-                writer.writerows(all_results)
-        else:
-            log_callback("\nNo se encontraron resultados para escribir en el CSV.")
+                    if estado == 'auth' and not detener:
+                        # Detener el proceso si la API key es inválida
+                        detener = True
+                if stop_event.is_set() and not detener:
+                    log_callback("🛑 Proceso cancelado por el usuario.")
+                    detener = True
+        completo = not stop_event.is_set() and lotes_con_error == 0
 
     except IOError as e:
         log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {e}")
@@ -203,10 +286,22 @@ def run(api_key, organization_ids_csv_path, output_folder, log_callback, stop_ev
     except Exception as e:
         log_callback(f"❌ ERROR INESPERADO: {e}")
         return
+    finally:
+        sesion.close()
+        if escritor is not None:
+            escritor.cerrar()
+            if escritor.error is not None:
+                log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {escritor.error}")
+                completo = False
+        registro.cerrar(completo)
 
     if stop_event.is_set():
-        log_callback(f"\n🚫 Proceso cancelado. Se guardaron {len(all_results)} resultados parciales en '{output_csv_file}'.")
+        log_callback(f"\n🚫 Proceso cancelado. Se guardaron {total_resultados} resultados parciales en '{output_csv_file}'.")
     else:
-        log_callback(f"\n🎉 ¡Proceso completado! Se encontraron {len(all_results)} organizaciones. Revisa '{output_csv_file}'.")
+        log_callback(f"\n🎉 ¡Proceso completado! Se encontraron {total_resultados} organizaciones. Revisa '{output_csv_file}'.")
+    if lotes_con_error:
+        log_callback(f"⚠  {lotes_con_error} lotes no se pudieron consultar.")
+    if not completo:
+        log_callback("♻️  Vuelve a ejecutar con el mismo archivo de IDs para continuar donde quedó.")
 
 # --- Fin del script (No se necesita __main__) ---
\ No newline at end of file
@@ -3,11 +3,204 @@ import json
 import csv
 import os
 import time
+import unicodedata
 import urllib3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import bitacora
+import cache_respuestas
+import cliente_http
+import limitador_tasa
+import normalizador_cargos
+import resolucion_entidades
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def run(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event):
+API_URL = f"{cliente_http.LUSHA_BASE_URL}/prospecting/contact/search"
+
+# Lusha pagina desde 0 con un máximo de 50 contactos por página
+POR_PAGINA = 50
+# Tope de seguridad de páginas por búsqueda (empresas + país)
+MAX_PAGINAS = 100
+# Cuántos nombres de empresa se envían juntos en companies.include.names
+EMPRESAS_POR_REQUEST = 5
+
+FIELDNAMES = [
+    'empresa_buscada', 'pais_buscado', 'name', 'contactId', 'jobTitle', 'companyId', 'companyName', 'fqdn',
+    'personId', 'logoUrl', 'hasEmails', 'hasPhones', 'hasDirectPhone', 'hasWorkEmail', 'hasPrivateEmail',
+    'hasMobilePhone', 'hasSocialLink'
+]
+
+def construir_payload(empresas, cargos, pais, page=0):
+    """Payload de búsqueda de contactos para un grupo de empresas en un país."""
+    return {
+        "pages": {"page": page, "size": POR_PAGINA},
+        "filters": {
+            "contacts": {
+                "include": {
+                    "jobTitles": cargos,
+                    "locations": [{"country": pais}],
+                    "existing_data_points": ["phone", "work_email", "mobile_phone"]
+                }
+            },
+            "companies": {"include": {"names": list(empresas)}}
+        }
+    }
+
+def contacto_a_fila(contact, empresa, pais):
+    """Convierte un contacto de la respuesta de Lusha en una fila del CSV."""
+    return {
+        'empresa_buscada': empresa, 'pais_buscado': pais,
+        'name': contact.get('name', 'N/A'),
+        'contactId': contact.get('contactId', 'N/A'),
+        'jobTitle': contact.get('jobTitle', 'N/A'),
+        'companyId': contact.get('companyId', 'N/A'),
+        'companyName': contact.get('companyName', 'N/A'),
+        'fqdn': contact.get('fqdn', 'N/A'),
+        'personId': contact.get('personId', 'N/A'),
+        'logoUrl': contact.get('logoUrl', 'N/A'),
+        'hasEmails': contact.get('hasEmails', False),
+        'hasPhones': contact.get('hasPhones', False),
+        'hasDirectPhone': contact.get('hasDirectPhone', False),
+        'hasWorkEmail': contact.get('hasWorkEmail', False),
+        'hasPrivateEmail': contact.get('hasPrivateEmail', False),
+        'hasMobilePhone': contact.get('hasMobilePhone', False),
+        'hasSocialLink': contact.get('hasSocialLink', False)
+    }
+
+def _normalizar_nombre(nombre):
+    """Minúsculas, sin tildes ni espacios repetidos (para comparar nombres de empresa)."""
+    nombre = unicodedata.normalize('NFKD', str(nombre or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(nombre.lower().split())
+
+def atribuir_empresa(contact, empresas):
+    """
+    Devuelve cuál de las empresas buscadas en el request corresponde al contacto,
+    comparando con su companyName. Si no se puede determinar, las une con '; '.
+    """
+    if len(empresas) == 1:
+        return empresas[0]
+    compania = _normalizar_nombre(contact.get('companyName'))
+    if compania:
+        for empresa in empresas:
+            if _normalizar_nombre(empresa) == compania:
+                return empresa
+        # Coincidencia parcial: gana el nombre buscado más largo (evita que 'Emp1' capture 'Emp10')
+        candidatas = [
+            empresa for empresa in empresas
+            if _normalizar_nombre(empresa) and (_normalizar_nombre(empresa) in compania or compania in _normalizar_nombre(empresa))
+        ]
+        if candidatas:
+            return max(candidatas, key=lambda empresa: len(_normalizar_nombre(empresa)))
+    return '; '.join(empresas)
+
+def generar_tareas(empresas, paises, empresas_por_request=EMPRESAS_POR_REQUEST):
+    """Tareas iniciales (grupo de empresas, país, página 0)."""
+    n = max(1, int(empresas_por_request))
+    grupos = [tuple(empresas[i:i + n]) for i in range(0, len(empresas), n)]
+    return [(grupo, pais, 0) for grupo in grupos for pais in paises]
+
+def procesar_respuesta(data, tarea):
+    """
+    Convierte la respuesta de una tarea en filas y decide las páginas siguientes.
+    La página 0 reparte todas las páginas si Lusha informa totalResults; si no,
+    cada página llena pide la siguiente. Retorna (filas, tareas_siguientes).
+    """
+    grupo, pais, page = tarea
+    contacts = data.get('data', []) or []
+    filas = [contacto_a_fila(c, atribuir_empresa(c, grupo), pais) for c in contacts]
+
+    siguientes = []
+    total = data.get('totalResults', data.get('total'))
+    if total is not None:
+        if page == 0:
+            try:
+                total_paginas = min(-(-int(total) // POR_PAGINA), MAX_PAGINAS)
+            except (TypeError, ValueError):
+                total_paginas = 1
+            siguientes = [(grupo, pais, p) for p in range(1, total_paginas)]
+    elif len(contacts) >= POR_PAGINA and page + 1 < MAX_PAGINAS:
+        siguientes = [(grupo, pais, page + 1)]
+    return filas, siguientes
+
+def campos_salida(normalizador=None):
+    """Columnas del CSV de Lusha; con normalizador de cargos se agregan cargo_estandar y area."""
+    return FIELDNAMES if normalizador is None else normalizador_cargos.agregar_campos_salida(FIELDNAMES)
+
+def preparar_trabajo(output_file, tareas, empresas, cargos, paises, empresas_por_request, log_callback, reanudar=True,
+                     campos=FIELDNAMES):
+    """
+    Abre la bitácora del trabajo (compartido por el motor de threads y el asíncrono).
+    Retorna (bitacora, tareas_pendientes); si se reanuda, el CSV existente se conserva.
+    """
+    huella = bitacora.huella_trabajo(
+        extractor='lusha_contactos', empresas=empresas, cargos=cargos, paises=paises,
+        empresas_por_request=empresas_por_request, campos=campos
+    )
+    registro = bitacora.Bitacora(output_file, huella, reanudar=reanudar)
+    if not registro.reanudando:
+        return registro, tareas
+    pendientes = registro.pendientes(tareas, clave_de=lambda t: t, con_pagina=lambda t, page: (t[0], t[1], page))
+    log_callback(f"♻️  Reanudando trabajo interrumpido: {len(registro.completadas)} búsquedas ya completadas en '{os.path.basename(output_file)}'.")
+    return registro, pendientes
+
+def _procesar_tarea(sesion, control, cache, vuelo_unico, tarea, cargos, log_callback, stop_event):
+    """
+    Ejecuta una tarea en un worker. Retorna (filas, tareas_siguientes);
+    filas es None si la búsqueda falló o se canceló (la tarea queda pendiente).
+    """
+    grupo, pais, page = tarea
+    if stop_event.is_set():
+        return None, []
+
+    etiqueta = f"{', '.join(grupo)} en {pais}" + (f" (página {page + 1})" if page else "")
+    payload = construir_payload(grupo, cargos, pais, page)
+
+    try:
+        response = cliente_http.enviar(sesion, "POST", API_URL, control=control, stop_event=stop_event,
+                                       cache=cache, vuelo_unico=vuelo_unico, data=json.dumps(payload), timeout=30)
+        if response is None:
+            return None, [] # Cancelado mientras esperaba turno del limitador
+        data = response.json()
+    except requests.exceptions.RequestException as e:
+        log_callback(f"  -> ❌ Error de conexión ({etiqueta}): {e}")
+        return None, []
+    except json.JSONDecodeError:
+        log_callback(f"  -> ❌ Error ({etiqueta}): La respuesta no es un JSON válido.")
+        return None, []
+
+    if not isinstance(data, dict):
+        log_callback(f"🔎 {etiqueta}: No se encontraron contactos (respuesta en formato de lista).")
+        return [], []
+    if response.status_code not in [200, 201]:
+        log_callback(f"  -> ⚠️ Advertencia ({etiqueta}): Error {response.status_code}: {response.text}")
+        return None, []
+
+    filas, siguientes = procesar_respuesta(data, tarea)
+    if not filas:
+        log_callback(f"🔎 {etiqueta}: No se encontraron contactos que cumplan los filtros.")
+    else:
+        log_callback(f"🔎 {etiqueta}: ¡Éxito! Se encontraron {len(filas)} contactos.")
+    return filas, siguientes
+
+def finalizar_trabajo(registro, output_file, total_contactos, fallidas, log_callback, stop_event, vuelo_unico=None):
+    """Cierra la bitácora (se borra solo si el trabajo terminó completo) y reporta el resultado."""
+    completo = not stop_event.is_set() and fallidas == 0
+    registro.cerrar(completo)
+    if stop_event.is_set():
+        log_callback(f"\n🚫 Proceso de Lusha cancelado. Se guardaron {total_contactos} contactos parciales en '{os.path.basename(output_file)}'.")
+    else:
+        log_callback(f"\n✅ Proceso de Lusha completado ({total_contactos} contactos). Revisa el archivo '{os.path.basename(output_file)}'.")
+    if fallidas:
+        log_callback(f"⚠️ {fallidas} búsquedas fallaron.")
+    if vuelo_unico is not None and vuelo_unico.compartidos:
+        log_callback(f"🔗 Requests idénticos compartidos (sin reenviar): {vuelo_unico.compartidos}")
+    if not completo:
+        log_callback("♻️ Vuelve a ejecutar con los mismos parámetros para continuar donde quedó.")
+
+def run(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event, requests_por_minuto=None,
+        max_workers=None, empresas_por_request=EMPRESAS_POR_REQUEST, usar_cache=True, reanudar=True,
+        normalizador=None):
     """
     Ejecuta el proceso de extracción de Lusha.
     
@@ -19,102 +212,94 @@ def run(api_key, empresas, cargos, paises, output_folder, log_callback, stop_eve
         output_folder (str): Ruta de la carpeta para guardar el resultado.
         log_callback (function): Función para enviar mensajes a la consola de la GUI.
         stop_event (threading.Event): Evento para señalar la cancelación.
+        requests_por_minuto (int, opcional): Techo del plan de Lusha para el limitador de tasa.
+        max_workers (int, opcional): Threads en paralelo (por defecto, la concurrencia máxima de Lusha).
+        empresas_por_request (int, opcional): Nombres de empresa agrupados por búsqueda.
+        usar_cache (bool, opcional): Reutiliza respuestas guardadas en disco (False fuerza requests reales).
+        reanudar (bool, opcional): Continúa un trabajo interrumpido con los mismos parámetros,
+            agregando al CSV existente (False empieza de cero).
+        normalizador (NormalizadorCargos, opcional): Agrega al CSV las columnas cargo_estandar
+            y area calculadas en línea a partir de 'jobTitle'.
+    
+    Returns:
+        str | None: Ruta del CSV generado, o None si no se encontraron contactos.
     """
     log_callback("🚀 Iniciando búsqueda filtrada de contactos en Lusha...")
     
-    url = "https://api.lusha.com/prospecting/contact/search"
     output_file = os.path.join(output_folder, "resultados_lusha.csv")
-    
-    fieldnames = [
-        'empresa_buscada', 'pais_buscado', 'name', 'contactId', 'jobTitle', 'companyId', 'companyName', 'fqdn',
-        'personId', 'logoUrl', 'hasEmails', 'hasPhones', 'hasDirectPhone', 'hasWorkEmail', 'hasPrivateEmail',
-        'hasMobilePhone', 'hasSocialLink'
-    ]
+
+    control = limitador_tasa.obtener_control('lusha', requests_por_minuto)
+    max_workers = max_workers or control.concurrencia_maxima
+    empresas = resolucion_entidades.deduplicar_empresas(empresas, log_callback)
+    tareas = generar_tareas(empresas, paises, empresas_por_request)
+    campos = campos_salida(normalizador)
+    registro, tareas = preparar_trabajo(output_file, tareas, empresas, cargos, paises, empresas_por_request,
+                                        log_callback, reanudar, campos)
+    total_contactos = 0
+    fallidas = 0
+
+    log_callback(f"⚙️  {len(tareas)} búsquedas iniciales ({empresas_por_request} empresas por request), hasta {max_workers} en paralelo.")
+
+    # Sesión compartida por los workers (pool del tamaño de max_workers)
+    sesion = cliente_http.sesion_lusha(api_key, pool_size=max_workers)
+    cache = cache_respuestas.obtener_cache(usar_cache)
+    # Requests idénticos de la corrida comparten un solo envío
+    vuelo_unico = cliente_http.VueloUnico()
 
     try:
-        with open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-            log_callback(f"✅ Archivo de salida '{os.path.basename(output_file)}' creado.")
-
-            for empresa in empresas:
-                # --- CAMBIO: Chequear cancelación antes de cada empresa ---
-                if stop_event.is_set():
-                    log_callback("🛑 Proceso cancelado por el usuario.")
-                    break # Sale del bucle de empresas
-                
-                for pais in paises:
-                    # --- CAMBIO: Chequear cancelación antes de cada país ---
-                    if stop_event.is_set():
-                        log_callback(f"🛑 Cancelado. Omitiendo países restantes para {empresa}.")
-                        break # Sale del bucle de países
-
-                    log_callback(f"\n🔎 Buscando en Lusha: {empresa} en {pais}...")
-                    
-                    payload = {
-                        "pages": {"page": 0, "size": 50},
-                        "filters": {
-                            "contacts": {
-                                "include": {
-                                    "jobTitles": cargos,
-                                    "locations": [{"country": pais}],
-                                    "existing_data_points": ["phone", "work_email", "mobile_phone"]
-                                }
-                            },
-                            "companies": {"include": {"names": [empresa]}}
-                        }
-                    }
-                    headers = {'Content-Type': 'application/json', 'api_key': api_key}
-
-                    try:
-                        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30, verify=False)
-                        data = response.json()
-
-                        if isinstance(data, dict):
-                            if response.status_code not in [200, 201]:
-                                log_callback(f"  -> ⚠️ Advertencia: Error {response.status_code}: {response.text}")
-                                continue
-                            contacts = data.get('data', [])
-                            if not contacts:
-                                log_callback("  -> No se encontraron contactos que cumplan los filtros.")
-                            else:
-                                log_callback(f"  -> ¡Éxito! Se encontraron {len(contacts)} contactos.")
-                                for contact in contacts:
-                                    writer.writerow({
-                                        'empresa_buscada': empresa, 'pais_buscado': pais,
-                                        'name': contact.get('name', 'N/A'),
-                                        'contactId': contact.get('contactId', 'N/A'),
-                                        'jobTitle': contact.get('jobTitle', 'N/A'),
-                                        'companyId': contact.get('companyId', 'N/A'),
-                                        'companyName': contact.get('companyName', 'N/A'),
-                                        'fqdn': contact.get('fqdn', 'N/A'),
-                                        'personId': contact.get('personId', 'N/A'),
-                                        'logoUrl': contact.get('logoUrl', 'N/A'),
-                                        'hasEmails': contact.get('hasEmails', False),
-                                        'hasPhones': contact.get('hasPhones', False),
-                                        'hasDirectPhone': contact.get('hasDirectPhone', False),
-                                        'hasWorkEmail': contact.get('hasWorkEmail', False),
-                                        'hasPrivateEmail': contact.get('hasPrivateEmail', False),
-                                        'hasMobilePhone': contact.get('hasMobilePhone', False),
-                                        'hasSocialLink': contact.get('hasSocialLink', False)
-                                    })
-                        else:
-                            log_callback("  -> No se encontraron contactos (respuesta en formato de lista).")
-                    except requests.exceptions.RequestException as e:
-                        log_callback(f"  -> ❌ Error de conexión: {e}")
-                    except json.JSONDecodeError:
-                        log_callback("  -> ❌ Error: La respuesta no es un JSON válido.")
-                    
-                    # Salir si se cancela durante la petición
+        with open(output_file, mode='a' if registro.reanudando else 'w', newline='', encoding='utf-8') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=campos)
+            if not registro.reanudando:
+                writer.writeheader()
+                log_callback(f"✅ Archivo de salida '{os.path.basename(output_file)}' creado.")
+
+            # El vigilante aborta los requests en vuelo apenas se cancela
+            with cliente_http.VigilanteCancelacion(stop_event, sesion), \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(_procesar_tarea, sesion, control, cache, vuelo_unico, tarea, cargos, log_callback, stop_event): tarea
+                    for tarea in tareas
+                }
+
+                # El hilo principal es el único que escribe en el CSV
+                while futures:
                     if stop_event.is_set():
+                        log_callback("🛑 Proceso cancelado por el usuario.")
+                        executor.shutdown(wait=False, cancel_futures=True)
                         break
-                    time.sleep(1)
+
+                    completados, _ = wait(futures, timeout=0.25, return_when=FIRST_COMPLETED)
+                    for future in completados:
+                        tarea = futures.pop(future)
+                        try:
+                            filas, siguientes = future.result()
+                        except Exception as e:
+                            log_callback(f"  -> ❌ Error en {', '.join(tarea[0])} - {tarea[1]}: {e}")
+                            fallidas += 1
+                            continue
+                        if filas is None:
+                            if not stop_event.is_set():
+                                fallidas += 1
+                            continue
+                        if filas:
+                            if normalizador is not None:
+                                normalizador.enriquecer_filas(filas, 'jobTitle')
+                            writer.writerows(filas)
+                            outfile.flush()
+                            total_contactos += len(filas)
+                        # Filas en disco: la búsqueda (y sus páginas siguientes) queda registrada
+                        registro.marcar(*tarea, siguientes=[s[2] for s in siguientes])
+                        if not stop_event.is_set():
+                            for siguiente in siguientes:
+                                futures[executor.submit(_procesar_tarea, sesion, control, cache, vuelo_unico, siguiente, cargos, log_callback, stop_event)] = siguiente
 
         # --- CAMBIO: Mensaje final condicional ---
-        if stop_event.is_set():
-            log_callback(f"\n🚫 Proceso de Lusha cancelado. El archivo '{os.path.basename(output_file)}' puede estar incompleto.")
-        else:
-            log_callback(f"\n✅ Proceso de Lusha completado. Revisa el archivo '{os.path.basename(output_file)}'.")
+        finalizar_trabajo(registro, output_file, total_contactos, fallidas, log_callback, stop_event, vuelo_unico)
 
     except IOError as e:
-        log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {e}")
\ No newline at end of file
+        registro.cerrar(completo=False)
+        log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {e}")
+    finally:
+        sesion.close()
+
+    return output_file if total_contactos or registro.reanudando else None
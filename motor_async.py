@@ -0,0 +1,389 @@
+import asyncio
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import apollo_script
+import cache_respuestas
+import cliente_http
+import limitador_tasa
+import lusha_script
+import resolucion_entidades
+
+# ==========================================================
+# --- MOTOR ASÍNCRONO (asyncio + httpx) ---
+# ==========================================================
+# Alternativa al ThreadPoolExecutor: cientos de requests en vuelo sobre un
+# solo thread. Las funciones run_* tienen la misma firma y el mismo contrato
+# de log_callback / stop_event que apollo_script.run y lusha_script.run, así
+# que la UI puede elegir cualquiera de los dos motores.
+# El parámetro 'transport' permite inyectar un httpx.MockTransport (o
+# cualquier transporte local) para probar el motor sin salir a la red.
+
+MAX_EN_VUELO = 200
+
+
+def disponible():
+    """True si httpx está instalado y el motor asíncrono puede usarse."""
+    return httpx is not None
+
+
+class ConcurrenciaAsync:
+    """
+    Semáforo asyncio cuyo límite sigue al AIMD compartido del proveedor
+    (limitador_tasa.ConcurrenciaAdaptativa del ControlTrafico), escalado de su
+    máximo a max_en_vuelo: los 429 que vean los threads o este motor reducen
+    la concurrencia de ambos, y los éxitos la suben en ambos.
+    """
+
+    def __init__(self, compartida, maximo):
+        self.compartida = compartida
+        self.maximo = max(1, int(maximo))
+        self.escala = self.maximo / max(1, compartida.maximo)
+        self.en_vuelo = 0
+        self.liberado = asyncio.Event()
+
+    @property
+    def limite(self):
+        return min(self.maximo, max(1, int(self.compartida.limite * self.escala)))
+
+    async def adquirir(self):
+        # El límite puede subir desde otro thread: se revisa también cada 0.25 s
+        while self.en_vuelo >= self.limite:
+            self.liberado.clear()
+            try:
+                await asyncio.wait_for(self.liberado.wait(), 0.25)
+            except asyncio.TimeoutError:
+                pass
+        self.en_vuelo += 1
+
+    async def liberar(self):
+        self.en_vuelo -= 1
+        self.liberado.set()
+
+
+class MotorAsync:
+    """
+    Ejecuta tareas asíncronas con la tasa y la concurrencia adaptativa del
+    ControlTrafico del proveedor (escalada: muchos más requests en vuelo que threads).
+    """
+
+    def __init__(self, control, stop_event, max_en_vuelo=MAX_EN_VUELO, max_reintentos=3, cache=None,
+                 vuelo_unico=None):
+        self.control = control
+        self.stop_event = stop_event
+        self.cache = cache
+        # Requests idénticos en vuelo: clave -> Task compartida (ver cliente_http.VueloUnico)
+        self.vuelo_unico = vuelo_unico
+        self.en_vuelo = {}
+        self.max_en_vuelo = max_en_vuelo
+        self.max_reintentos = max_reintentos
+        self.concurrencia = ConcurrenciaAsync(control.concurrencia, max_en_vuelo)
+
+    async def _esperar(self, segundos):
+        """Espera en tramos cortos para reaccionar a stop_event. False si se canceló."""
+        while segundos > 0:
+            if self.stop_event.is_set():
+                return False
+            tramo = min(segundos, 0.25)
+            await asyncio.sleep(tramo)
+            segundos -= tramo
+        return not self.stop_event.is_set()
+
+    async def _tomar_token(self):
+        while True:
+            espera = self.control.bucket.tomar()
+            if espera == 0:
+                return True
+            if not await self._esperar(min(espera, 1.0)):
+                return False
+
+    async def enviar(self, cliente, metodo, url, **kwargs):
+        """
+        Equivalente asíncrono de cliente_http.enviar (incluye el caché de respuestas
+        y la coalescencia de requests idénticos).
+        Retorna la respuesta final o None si se canceló.
+        """
+        clave = None
+        if self.cache is not None or self.vuelo_unico is not None:
+            cuenta = cache_respuestas.huella_cuenta(kwargs.get('headers'), cliente.headers)
+            clave = cache_respuestas.calcular_clave(self.control.proveedor, metodo, url, cuenta=cuenta, **kwargs)
+        if self.cache is not None:
+            # El caché es sqlite con lock y commits: fuera del event loop
+            cacheada = await asyncio.to_thread(self.cache.obtener, clave)
+            if cacheada is not None:
+                return cacheada
+        if self.vuelo_unico is None:
+            return await self._enviar(cliente, metodo, url, clave, **kwargs)
+
+        reciente = self.vuelo_unico.reciente(clave)
+        if reciente is not None:
+            return reciente
+        vuelo = self.en_vuelo.get(clave)
+        if vuelo is None:
+            vuelo = self.en_vuelo[clave] = asyncio.ensure_future(self._enviar(cliente, metodo, url, clave, **kwargs))
+            vuelo.add_done_callback(lambda tarea: self._aterrizar(clave, tarea))
+        else:
+            self.vuelo_unico.contar_compartido()
+        # shield: cancelar a uno de los que esperan no cancela el request de los demás
+        return await asyncio.shield(vuelo)
+
+    def _aterrizar(self, clave, vuelo):
+        self.en_vuelo.pop(clave, None)
+        if not vuelo.cancelled() and vuelo.exception() is None:
+            self.vuelo_unico.recordar(clave, vuelo.result())
+
+    async def _enviar(self, cliente, metodo, url, clave, **kwargs):
+        """Envío real de enviar(): token, concurrencia, reintentos y guardado en caché."""
+        intento = 0
+        while True:
+            await self.concurrencia.adquirir()
+            try:
+                if not await self._tomar_token():
+                    return None
+                response = await cliente.request(metodo, url, **kwargs)
+            except httpx.HTTPError:
+                if intento >= self.max_reintentos:
+                    raise
+                intento += 1
+                if not await self._esperar(min(2 ** intento, 30)):
+                    return None
+                continue
+            finally:
+                await self.concurrencia.liberar()
+
+            # Actualiza el AIMD compartido (429 / éxitos), que también gobierna esta concurrencia
+            espera = self.control.registrar_respuesta(response)
+            if self.cache is not None and response.status_code in (200, 201):
+                await asyncio.to_thread(self.cache.guardar, clave, self.control.proveedor,
+                                        response.status_code, response.content)
+
+            if response.status_code != 429 or intento >= self.max_reintentos:
+                return response
+            intento += 1
+            if not await self._esperar(espera if espera is not None else min(2 ** intento, 30)):
+                return None
+
+    async def ejecutar(self, tareas, procesar, al_completar=None, al_error=None):
+        """
+        Ejecuta procesar(tarea) para cada tarea. procesar retorna una lista de
+        tareas nuevas (p. ej. páginas siguientes) que se agregan a la cola.
+        Solo se crean hasta 2 × max_en_vuelo corrutinas a la vez.
+        """
+        iterador = iter(tareas)
+        cola = []
+        pendientes = {}
+        completadas = 0
+        ventana = self.max_en_vuelo * 2
+
+        def siguiente():
+            if cola:
+                return cola.pop()
+            return next(iterador, None)
+
+        while True:
+            while len(pendientes) < ventana and not self.stop_event.is_set():
+                tarea = siguiente()
+                if tarea is None:
+                    break
+                pendientes[asyncio.ensure_future(procesar(tarea))] = tarea
+
+            if not pendientes:
+                break
+
+            hechas, _ = await asyncio.wait(pendientes, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            if self.stop_event.is_set():
+                for futuro in pendientes:
+                    futuro.cancel()
+                await asyncio.gather(*pendientes, return_exceptions=True)
+                break
+
+            for futuro in hechas:
+                tarea = pendientes.pop(futuro)
+                completadas += 1
+                try:
+                    cola.extend(futuro.result() or [])
+                except Exception as e:
+                    if al_error:
+                        al_error(tarea, e)
+                if al_completar:
+                    al_completar(completadas, len(cola))
+        return completadas
+
+
+def _crear_cliente(headers, max_en_vuelo, transport=None, verify=True):
+    limites = httpx.Limits(max_connections=max_en_vuelo, max_keepalive_connections=max_en_vuelo)
+    return httpx.AsyncClient(headers=headers, limits=limites, timeout=30, verify=verify, transport=transport)
+
+
+# --- APOLLO CONTACTOS ---
+
+async def _apollo(scraper, empresas, cargos, paises, max_en_vuelo, transport):
+    motor = MotorAsync(scraper.control, scraper.stop_event, max_en_vuelo=max_en_vuelo, cache=scraper.cache,
+                       vuelo_unico=scraper.vuelo_unico)
+    tareas = scraper._preparar_trabajo(empresas, cargos, paises)
+    estado = {'total': len(tareas), 'ultimo_reporte': 0}
+
+    scraper.log_callback(f"⚙️  Total de requests iniciales: {len(tareas)} (máx. {scraper.max_paginas} páginas por tarea)")
+    scraper.log_callback(f"🔄 Procesando con hasta {max_en_vuelo} requests en vuelo (motor asíncrono)...\n")
+
+    async with _crear_cliente(cliente_http.headers_apollo(scraper.api_key), max_en_vuelo, transport) as cliente:
+
+        async def procesar(tarea):
+            empresa, paises_tarea, chunk, idx, page = tarea
+            payload = scraper._construir_payload(empresa, paises_tarea, chunk, page)
+            try:
+                response = await motor.enviar(cliente, "POST", scraper.url, json=payload)
+            except httpx.HTTPError:
+                response = None
+            if response is None and scraper.stop_event.is_set():
+                return []
+            data = None
+            if response is not None and response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError as e:
+                    # Como en el motor de threads: cuenta como tarea fallida y queda pendiente
+                    scraper.log_callback(f"❌ Error en request de {empresa} (página {page}): {e}")
+            # Limpieza, deduplicación y encolado al escritor CSV (puede bloquear): fuera del event loop
+            _, siguientes = await asyncio.to_thread(
+                scraper._procesar_respuesta, data, empresa, paises_tarea, chunk, idx, page
+            )
+            estado['total'] += len(siguientes)
+            return siguientes
+
+        def al_completar(completadas, _):
+            estado['ultimo_reporte'] = scraper._reportar_progreso(completadas, estado['total'], estado['ultimo_reporte'])
+
+        def al_error(tarea, e):
+            scraper.log_callback(f"❌ Error en {tarea[0]} - {apollo_script.etiqueta_paises(tarea[1])}: {str(e)}")
+
+        await motor.ejecutar(tareas, procesar, al_completar, al_error)
+
+
+def run_apollo(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event,
+               max_paginas=apollo_script.MAX_PAGINAS, requests_por_minuto=None,
+               max_en_vuelo=MAX_EN_VUELO, transport=None, usar_cache=True, reanudar=True, ids_compactos=False,
+               agrupar_paises=False, normalizador=None):
+    """Misma interfaz que apollo_script.run, ejecutada con el motor asíncrono."""
+    if not disponible():
+        log_callback("❌ ERROR: El motor asíncrono requiere 'httpx' (pip install httpx).")
+        return None
+
+    scraper = apollo_script.ApolloScraper(api_key, output_folder, log_callback, stop_event,
+                                          max_paginas=max_paginas, max_workers=1,
+                                          requests_por_minuto=requests_por_minuto, usar_cache=usar_cache,
+                                          reanudar=reanudar, ids_compactos=ids_compactos,
+                                          agrupar_paises=agrupar_paises, normalizador=normalizador)
+    scraper.log_callback(f"🚀 Iniciando búsqueda asíncrona...")
+    scraper.log_callback(f"📊 {len(empresas)} empresas × {len(paises)} países × {len(cargos)} cargos")
+    asyncio.run(_apollo(scraper, empresas, cargos, paises, max_en_vuelo, transport))
+    scraper.sesion.close()
+    return scraper._reporte_final()
+
+
+# --- LUSHA CONTACTOS ---
+
+async def _lusha(api_key, tareas, cargos, outfile, registro, log_callback, stop_event, control, max_en_vuelo,
+                 transport, cache, vuelo_unico, normalizador=None):
+    motor = MotorAsync(control, stop_event, max_en_vuelo=max_en_vuelo, cache=cache, vuelo_unico=vuelo_unico)
+    writer = csv.DictWriter(outfile, fieldnames=lusha_script.campos_salida(normalizador))
+    total = {'contactos': 0, 'fallidas': 0}
+    loop = asyncio.get_running_loop()
+
+    def escribir(filas, tarea, siguientes):
+        if filas:
+            if normalizador is not None:
+                normalizador.enriquecer_filas(filas, 'jobTitle')
+            writer.writerows(filas)
+            outfile.flush()
+        registro.marcar(*tarea, siguientes=[s[2] for s in siguientes])
+
+    headers = cliente_http.headers_lusha(api_key)
+    # Un solo thread escribe el CSV y la bitácora (en orden y sin bloquear el event loop)
+    escritura = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escritor-lusha')
+    try:
+        async with _crear_cliente(headers, max_en_vuelo, transport, verify=False) as cliente:
+
+            async def procesar(tarea):
+                grupo, pais, page = tarea
+                etiqueta = f"{', '.join(grupo)} en {pais}"
+                payload = lusha_script.construir_payload(grupo, cargos, pais, page)
+                try:
+                    response = await motor.enviar(cliente, "POST", lusha_script.API_URL, content=json.dumps(payload))
+                except httpx.HTTPError as e:
+                    log_callback(f"  -> ❌ Error de conexión ({etiqueta}): {e}")
+                    total['fallidas'] += 1
+                    return []
+                if response is None:
+                    return []
+                try:
+                    data = response.json()
+                except json.JSONDecodeError:
+                    log_callback(f"  -> ❌ Error ({etiqueta}): La respuesta no es un JSON válido.")
+                    total['fallidas'] += 1
+                    return []
+                if response.status_code not in [200, 201]:
+                    log_callback(f"  -> ⚠️ Advertencia ({etiqueta}): Error {response.status_code}: {response.text}")
+                    total['fallidas'] += 1
+                    return []
+                if not isinstance(data, dict):
+                    await loop.run_in_executor(escritura, escribir, [], tarea, [])
+                    return []
+                filas, siguientes = lusha_script.procesar_respuesta(data, tarea)
+                if filas:
+                    log_callback(f"🔎 {etiqueta}: ¡Éxito! Se encontraron {len(filas)} contactos.")
+                    total['contactos'] += len(filas)
+                await loop.run_in_executor(escritura, escribir, filas, tarea, siguientes)
+                return siguientes
+
+            def al_error(tarea, e):
+                total['fallidas'] += 1
+                log_callback(f"  -> ❌ Error en {', '.join(tarea[0])} - {tarea[1]}: {e}")
+
+            await motor.ejecutar(tareas, procesar, al_error=al_error)
+    finally:
+        escritura.shutdown(wait=True)
+    return total['contactos'], total['fallidas']
+
+
+def run_lusha(api_key, empresas, cargos, paises, output_folder, log_callback, stop_event,
+              requests_por_minuto=None, max_en_vuelo=MAX_EN_VUELO, transport=None,
+              empresas_por_request=lusha_script.EMPRESAS_POR_REQUEST, usar_cache=True, reanudar=True,
+              normalizador=None):
+    """Misma interfaz que lusha_script.run, ejecutada con el motor asíncrono."""
+    if not disponible():
+        log_callback("❌ ERROR: El motor asíncrono requiere 'httpx' (pip install httpx).")
+        return None
+
+    log_callback("🚀 Iniciando búsqueda asíncrona de contactos en Lusha...")
+    output_file = os.path.join(output_folder, "resultados_lusha.csv")
+    control = limitador_tasa.obtener_control('lusha', requests_por_minuto)
+    empresas = resolucion_entidades.deduplicar_empresas(empresas, log_callback)
+    tareas = lusha_script.generar_tareas(empresas, paises, empresas_por_request)
+    vuelo_unico = cliente_http.VueloUnico()
+    campos = lusha_script.campos_salida(normalizador)
+    registro, tareas = lusha_script.preparar_trabajo(output_file, tareas, empresas, cargos, paises,
+                                                     empresas_por_request, log_callback, reanudar, campos)
+
+    try:
+        with open(output_file, mode='a' if registro.reanudando else 'w', newline='', encoding='utf-8') as outfile:
+            if not registro.reanudando:
+                csv.DictWriter(outfile, fieldnames=campos).writeheader()
+            total, fallidas = asyncio.run(_lusha(api_key, tareas, cargos, outfile, registro, log_callback,
+                                                 stop_event, control, max_en_vuelo, transport,
+                                                 cache_respuestas.obtener_cache(usar_cache), vuelo_unico,
+                                                 normalizador))
+    except IOError as e:
+        registro.cerrar(completo=False)
+        log_callback(f"❌ ERROR FATAL: No se pudo escribir en el archivo de salida. Causa: {e}")
+        return None
+
+    lusha_script.finalizar_trabajo(registro, output_file, total, fallidas, log_callback, stop_event, vuelo_unico)
+    return output_file if total or registro.reanudando else None
@@ -0,0 +1,177 @@
+import csv
+import re
+import threading
+import unicodedata
+
+# ==========================================================
+# --- NORMALIZADOR DE CARGOS (índice precompilado) ---
+# ==========================================================
+# Estandariza cargos y asigna áreas en Python, con los mismos archivos de
+# mapeo de la pestaña 2 (cargos v1/v2 y áreas), para usarlo en línea con la
+# extracción (apollo_script, lusha_script, motor_async) y en la limpieza de
+# la BD (db_operations.execute_clean_data), así ambos caminos coinciden.
+#
+# Archivos de mapeo (por posición de columna, con encabezado):
+#  - Cargos v1 / v2: 1ª columna = cargo tal como viene, 2ª = cargo estándar.
+#    Si un cargo aparece en ambos, gana v2.
+#  - Áreas: 1ª columna = cargo estándar, 2ª = área.
+#
+# Índice: cada cargo de origen se normaliza (minúsculas, sin tildes ni
+# signos) y se guarda como tupla de tokens en un dict (n-gramas hasheados).
+# Un título se clasifica por coincidencia exacta o, si no, por el n-grama
+# más largo (y más a la izquierda) que exista en el índice: "Sr. Gerente de
+# Ventas LATAM" encuentra "gerente de ventas". Los títulos se repiten mucho,
+# así que cada lote consulta primero un memo de resultados.
+
+MAX_MEMO = 200_000
+CAMPOS_SALIDA = ("cargo_estandar", "area")
+
+_RE_NO_ALFANUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar_texto(texto):
+    """'  Gerente de Operaciones/LATAM ' -> 'gerente de operaciones latam'"""
+    if not texto:
+        return ""
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return _RE_NO_ALFANUM.sub(" ", texto).strip()
+
+
+def agregar_campos_salida(campos):
+    """Columnas de un CSV de resultados más cargo_estandar y area (sin repetir)."""
+    return list(campos) + [c for c in CAMPOS_SALIDA if c not in campos]
+
+
+def _leer_mapeo(ruta):
+    """Pares (origen, estándar) de las dos primeras columnas de un CSV de mapeo."""
+    with open(ruta, newline="", encoding="utf-8-sig", errors="replace") as f:
+        lector = csv.reader(f)
+        next(lector, None)  # Encabezado
+        for fila in lector:
+            if len(fila) >= 2 and fila[0].strip() and fila[1].strip():
+                yield fila[0], fila[1].strip()
+
+
+class NormalizadorCargos:
+    """
+    Clasificador de cargos con índice de n-gramas de tokens y memo por lote.
+    El índice y las áreas no se modifican tras construirlos; el memo sí, así
+    que cada hilo tiene el suyo y una instancia se comparte entre workers.
+    """
+
+    def __init__(self, mapeo_cargos, mapeo_areas=None, max_memo=MAX_MEMO):
+        """
+        - mapeo_cargos: iterable de (cargo de origen, cargo estándar); ante
+          claves repetidas gana la primera.
+        - mapeo_areas: iterable de (cargo estándar, área), opcional.
+        """
+        self.indice = {}
+        for origen, estandar in mapeo_cargos:
+            tokens = tuple(normalizar_texto(origen).split())
+            if tokens:
+                self.indice.setdefault(tokens, estandar)
+        # Solo se prueban n-gramas de las longitudes que existen en el índice
+        self.longitudes = sorted({len(tokens) for tokens in self.indice}, reverse=True)
+
+        self.areas = {}
+        for cargo, area in mapeo_areas or ():
+            clave = normalizar_texto(cargo)
+            if clave:
+                self.areas.setdefault(clave, area)
+
+        self.max_memo = max_memo
+        self._local = threading.local()
+
+    @classmethod
+    def desde_archivos(cls, cargos_v1_file=None, cargos_v2_file=None, areas_file=None, **kwargs):
+        """Construye el normalizador desde los CSV de la pestaña 2 (v2 tiene prioridad sobre v1)."""
+        def cargos():
+            for ruta in (cargos_v2_file, cargos_v1_file):
+                if ruta:
+                    yield from _leer_mapeo(ruta)
+        return cls(cargos(), _leer_mapeo(areas_file) if areas_file else None, **kwargs)
+
+    @property
+    def memo(self):
+        """Memo del hilo actual (título -> (cargo_estandar, area))."""
+        memo = getattr(self._local, "memo", None)
+        if memo is None:
+            memo = self._local.memo = {}
+        return memo
+
+    def _buscar(self, tokens):
+        indice = self.indice
+        completo = indice.get(tokens)
+        if completo is not None:
+            return completo
+        total = len(tokens)
+        for n in self.longitudes:
+            if n >= total:
+                continue
+            for i in range(total - n + 1):
+                estandar = indice.get(tokens[i:i + n])
+                if estandar is not None:
+                    return estandar
+        return None
+
+    def clasificar(self, titulo):
+        """Retorna (cargo_estandar, area); None en lo que no se pudo clasificar."""
+        return self.clasificar_lote((titulo,))[0]
+
+    def clasificar_lote(self, titulos):
+        """Clasifica una secuencia de títulos; retorna una lista de (cargo_estandar, area)."""
+        memo = self.memo
+        resultados = []
+        for titulo in titulos:
+            resultado = memo.get(titulo)
+            if resultado is None:
+                tokens = tuple(normalizar_texto(titulo).split())
+                estandar = self._buscar(tokens) if tokens else None
+                clave_area = normalizar_texto(estandar) if estandar else " ".join(tokens)
+                area = self.areas.get(clave_area) if clave_area else None
+                resultado = (estandar, area)
+                if len(memo) >= self.max_memo:
+                    memo.clear()
+                memo[titulo] = resultado
+            resultados.append(resultado)
+        return resultados
+
+    def enriquecer_filas(self, filas, campo_cargo):
+        """
+        Agrega 'cargo_estandar' y 'area' a filas (dicts) de un extractor,
+        p. ej. campo_cargo='title' (Apollo) o 'jobTitle' (Lusha).
+        El cargo estándar por defecto es el original.
+        """
+        clasificados = self.clasificar_lote([fila.get(campo_cargo) or "" for fila in filas])
+        for fila, (estandar, area) in zip(filas, clasificados):
+            fila["cargo_estandar"] = estandar or fila.get(campo_cargo) or ""
+            fila["area"] = area or ""
+        return filas
+
+    def normalizar_csv(self, entrada, salida, campo_cargo, tamano_lote=10_000, encoding="utf-8-sig"):
+        """
+        Copia un CSV de resultados agregando las columnas cargo_estandar y area,
+        por lotes (memoria constante). Retorna la cantidad de filas escritas.
+        """
+        filas_escritas = 0
+        with open(entrada, newline="", encoding=encoding) as f_in, \
+                open(salida, "w", newline="", encoding=encoding) as f_out:
+            lector = csv.DictReader(f_in)
+            if campo_cargo not in (lector.fieldnames or []):
+                raise ValueError(f"El archivo {entrada} no tiene la columna '{campo_cargo}'.")
+            campos = agregar_campos_salida(lector.fieldnames)
+            escritor = csv.DictWriter(f_out, fieldnames=campos)
+            escritor.writeheader()
+            lote = []
+            for fila in lector:
+                lote.append(fila)
+                if len(lote) >= tamano_lote:
+                    escritor.writerows(self.enriquecer_filas(lote, campo_cargo))
+                    filas_escritas += len(lote)
+                    lote = []
+            if lote:
+                escritor.writerows(self.enriquecer_filas(lote, campo_cargo))
+                filas_escritas += len(lote)
+        return filas_escritas
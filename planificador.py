@@ -0,0 +1,81 @@
+import heapq
+import itertools
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# ==========================================================
+# --- PLANIFICADOR CON VENTANA ACOTADA (ThreadPoolExecutor) ---
+# ==========================================================
+# Envía tareas a un executor sin materializarlas: las toma de un iterable
+# (p. ej. un generador) a medida que otras terminan y nunca tiene más de
+# 'ventana' futures en vuelo. Memoria plana aunque el trabajo tenga un
+# millón de tareas, y la cancelación solo tiene que descartar esa ventana.
+#
+# Las tareas candidatas (las que ya se leyeron del iterable, hasta
+# 'anticipo', y las que se agregan al vuelo, como páginas siguientes) se
+# ordenan en un heap por prioridad(tarea): menor valor sale primero; a
+# igual prioridad, en orden de llegada.
+
+ESPERA_MAXIMA = 0.25  # Segundos entre revisiones de stop_event mientras no termina nada
+
+
+class Planificador:
+    """Ejecuta funcion(*tarea) en el executor con ventana acotada y prioridad."""
+
+    def __init__(self, executor, funcion, tareas, ventana, stop_event, prioridad=None, anticipo=None):
+        self.executor = executor
+        self.funcion = funcion
+        self.fuente = iter(tareas)
+        self.fuente_agotada = False
+        self.ventana = max(1, int(ventana))
+        self.anticipo = max(self.ventana, int(anticipo or self.ventana))
+        self.stop_event = stop_event
+        self.prioridad = prioridad
+        self.candidatas = []
+        self.secuencia = itertools.count()
+        self.en_vuelo = {}
+
+    def agregar(self, tarea):
+        """Agrega una tarea nueva (p. ej. una página siguiente) a las candidatas."""
+        clave = self.prioridad(tarea) if self.prioridad else 0
+        heapq.heappush(self.candidatas, (clave, next(self.secuencia), tarea))
+
+    def _leer_fuente(self):
+        while not self.fuente_agotada and len(self.candidatas) < self.anticipo:
+            tarea = next(self.fuente, None)
+            if tarea is None:
+                self.fuente_agotada = True
+            else:
+                self.agregar(tarea)
+
+    def _llenar_ventana(self):
+        self._leer_fuente()
+        while self.candidatas and len(self.en_vuelo) < self.ventana:
+            tarea = heapq.heappop(self.candidatas)[2]
+            self.en_vuelo[self.executor.submit(self.funcion, *tarea)] = tarea
+            self._leer_fuente()
+
+    def cancelar(self):
+        """Cancela los futures que aún no empezaron (a lo sumo 'ventana')."""
+        for future in self.en_vuelo:
+            future.cancel()
+        self.en_vuelo.clear()
+        self.candidatas.clear()
+
+    def completados(self):
+        """
+        Genera (tarea, future) a medida que terminan. Las tareas que se
+        agreguen con agregar() durante la iteración también se ejecutan.
+        Si se activa stop_event, cancela lo pendiente y termina.
+        """
+        while True:
+            if self.stop_event.is_set():
+                self.cancelar()
+                return
+            self._llenar_ventana()
+            if not self.en_vuelo:
+                return
+            hechos, _ = wait(self.en_vuelo, timeout=ESPERA_MAXIMA, return_when=FIRST_COMPLETED)
+            for future in hechos:
+                tarea = self.en_vuelo.pop(future, None)
+                if tarea is not None:  # None si se canceló durante la iteración
+                    yield tarea, future
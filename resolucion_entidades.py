@@ -0,0 +1,376 @@
+import csv
+import sys
+from collections import defaultdict
+
+from normalizador_cargos import normalizar_texto
+
+# ==========================================================
+# --- RESOLUCIÓN DE ENTIDADES (Apollo + Lusha + SignalHire) ---
+# ==========================================================
+# Asigna a cada contacto de los CSV de resultados un ID de persona y un ID
+# de empresa comunes a todos los proveedores, para que la misma persona no
+# aparezca varias veces después de la carga.
+#
+# Empresas: se unen los registros que comparten dominio (fqdn de Lusha o
+# dominio corporativo del email) o nombre normalizado (sin sufijos legales).
+# Personas: se unen los registros con el mismo email o URL de LinkedIn y,
+# dentro de cada bloque (empresa, token del nombre), los pares cuyos nombres
+# son compatibles ("Juan Pérez" ~ "Juan Carlos Pérez"). Una inicial ("J. Pérez")
+# solo une si en la empresa corresponde a una única persona: con "Juan Pérez"
+# y "José Pérez" queda aparte, para no unirlos a los dos a través de ella.
+#
+# Nada se compara contra todo: las uniones por clave son lineales (dict) y
+# la comparación por pares solo ocurre dentro de bloques acotados a
+# MAX_BLOQUE registros, así que el costo crece casi linealmente.
+# Se hacen dos pasadas sobre los CSV: la primera guarda solo las claves de
+# cada registro y la segunda escribe la salida con los IDs.
+
+MAX_BLOQUE = 200
+
+# Columnas de cada proveedor (se buscan sin distinguir mayúsculas)
+FUENTES = {
+    "apollo": {"id": "id", "nombre": "name", "empresa": "organization_name", "email": "email",
+               "linkedin_url": "linkedin_url", "dominio": None},
+    "lusha": {"id": "contactId", "nombre": "name", "empresa": "companyName", "email": None,
+              "linkedin_url": None, "dominio": "fqdn"},
+    "signalhire": {"id": "uid", "nombre": "fullName", "empresa": "company", "email": "email",
+                   "linkedin_url": "linkedin", "dominio": None},
+}
+CAMPOS_SALIDA = ["id_persona", "id_empresa", "fuente", "id_fuente", "nombre", "empresa", "email",
+                 "linkedin_url", "dominio"]
+
+DOMINIOS_GRATUITOS = {
+    "gmail.com", "googlemail.com", "hotmail.com", "hotmail.es", "outlook.com", "outlook.es", "live.com",
+    "msn.com", "yahoo.com", "yahoo.es", "icloud.com", "me.com", "aol.com", "protonmail.com", "gmx.com",
+    "mail.com",
+}
+# Formas societarias que se quitan del final del nombre de una empresa. Se comparan
+# como secuencia completa de tokens ("s.a.c." -> s a c, o sac): palabras sueltas
+# como "de", "co" o "company" no se quitan.
+FORMAS_LEGALES = (
+    "s.a.", "s.a.a.", "s.a.c.", "s.a.s.", "s.a. de c.v.", "s.a.b. de c.v.", "s. de r.l.", "s. de r.l. de c.v.",
+    "s.r.l.", "e.i.r.l.", "s.p.a.", "s.l.", "s.l.u.", "ltda.", "limitada", "inc.", "corp.", "llc", "ltd.",
+    "gmbh", "plc", "ag", "b.v.",
+)
+
+
+def _variantes_forma(forma):
+    """'s.a. de c.v.' -> {('s', 'a', 'de', 'c', 'v'), ('sa', 'de', 'cv')}"""
+    return {tuple(normalizar_texto(forma).split()), tuple(normalizar_texto(forma.replace(".", "")).split())}
+
+
+# "spa" sin puntos es también una palabra ("Day Spa"): solo se quita "S.p.A."
+SUFIJOS_LEGALES = frozenset(
+    variante for forma in FORMAS_LEGALES for variante in _variantes_forma(forma)
+) - {("spa",)}
+_LARGOS_SUFIJOS = sorted({len(sufijo) for sufijo in SUFIJOS_LEGALES}, reverse=True)
+_VALORES_VACIOS = {"", "n/a", "none", "null"}
+
+
+# ==========================================================
+# --- NORMALIZACIÓN DE CLAVES ---
+# ==========================================================
+
+def _valor(fila, columna):
+    if not columna:
+        return ""
+    valor = (fila.get(columna) or "").strip()
+    return "" if valor.lower() in _VALORES_VACIOS else valor
+
+
+def normalizar_dominio(valor):
+    """'https://www.Acme.com/es' -> 'acme.com'"""
+    valor = valor.strip().lower()
+    if "://" in valor:
+        valor = valor.split("://", 1)[1]
+    valor = valor.split("/", 1)[0].split(":", 1)[0]
+    if valor.startswith("www."):
+        valor = valor[4:]
+    return valor if "." in valor else ""
+
+
+def normalizar_email(valor):
+    valor = valor.strip().lower()
+    if "@" not in valor or valor.startswith("email_not_unlocked"):
+        return ""
+    return valor
+
+
+def dominio_de_email(valor):
+    """Dominio corporativo de un email (también de los bloqueados de Apollo); '' si es gratuito."""
+    valor = valor.strip().lower()
+    if "@" not in valor:
+        return ""
+    dominio = normalizar_dominio(valor.rsplit("@", 1)[1])
+    return "" if dominio in DOMINIOS_GRATUITOS else dominio
+
+
+def normalizar_empresa(valor):
+    """'Acme Perú S.A.C.' -> 'acme peru'; 'Banco de Crédito' se conserva entero."""
+    tokens = normalizar_texto(valor).split()
+    quitado = True
+    while quitado:
+        quitado = False
+        for largo in _LARGOS_SUFIJOS:
+            if len(tokens) > largo and tuple(tokens[-largo:]) in SUFIJOS_LEGALES:
+                del tokens[-largo:]
+                quitado = True
+                break
+    return " ".join(tokens)
+
+
+def deduplicar_empresas(empresas, log_callback=None):
+    """
+    Quita de una lista de empresas de entrada las repetidas y casi repetidas
+    (mayúsculas, tildes, espacios, sufijos legales: 'ACME S.A.' ~ 'Acme').
+    Conserva la primera escritura de cada una, en el orden original.
+    """
+    vistas = set()
+    unicas = []
+    omitidas = 0
+    for empresa in empresas:
+        empresa = (empresa or "").strip()
+        clave = normalizar_empresa(empresa) or empresa.lower()
+        if not clave:
+            continue
+        if clave in vistas:
+            omitidas += 1
+        else:
+            vistas.add(clave)
+            unicas.append(empresa)
+    if omitidas and log_callback:
+        log_callback(f"🧹 {omitidas} empresas repetidas omitidas (mayúsculas, espacios o sufijos legales); "
+                     f"quedan {len(unicas)}.")
+    return unicas
+
+
+def normalizar_linkedin(valor):
+    valor = valor.strip().lower().rstrip("/")
+    for prefijo in ("https://", "http://"):
+        if valor.startswith(prefijo):
+            valor = valor[len(prefijo):]
+    if valor.startswith("www."):
+        valor = valor[4:]
+    return valor
+
+
+def nombres_compatibles(a, b, iniciales=True):
+    """
+    True si todos los tokens del nombre más corto (mínimo 2) están en el
+    otro: ('juan', 'perez') ~ ('juan', 'carlos', 'perez'). Con iniciales=True
+    también acepta iniciales: ('j', 'perez') ~ ('juan', 'carlos', 'perez').
+    """
+    corto, largo = (a, b) if len(a) <= len(b) else (b, a)
+    if len(corto) < 2:
+        return False
+    if len(corto) == len(largo):
+        # Mismo largo: la inicial puede estar en cualquiera de los dos
+        return _contenido(corto, largo, iniciales) or _contenido(largo, corto, iniciales)
+    return _contenido(corto, largo, iniciales)
+
+
+def _contenido(corto, largo, iniciales):
+    for token in corto:
+        if token in largo:
+            continue
+        if iniciales and len(token) == 1 and any(t[0] == token for t in largo):
+            continue
+        return False
+    return True
+
+
+# ==========================================================
+# --- UNION-FIND ---
+# ==========================================================
+
+class UnionFind:
+    """Conjuntos disjuntos sobre índices 0..n-1; la raíz es siempre el menor índice del grupo."""
+
+    def __init__(self, n=0):
+        self.padre = list(range(n))
+
+    def agregar(self):
+        self.padre.append(len(self.padre))
+        return len(self.padre) - 1
+
+    def raiz(self, x):
+        padre = self.padre
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]  # Compresión por mitades
+            x = padre[x]
+        return x
+
+    def unir(self, a, b):
+        ra, rb = self.raiz(a), self.raiz(b)
+        if ra == rb:
+            return False
+        if ra < rb:
+            self.padre[rb] = ra
+        else:
+            self.padre[ra] = rb
+        return True
+
+    def unir_por_clave(self, claves):
+        """Une los índices que comparten clave; 'claves' es un iterable de (índice, clave) con clave no vacía."""
+        primero = {}
+        for indice, clave in claves:
+            if clave:
+                anterior = primero.setdefault(clave, indice)
+                if anterior != indice:
+                    self.unir(anterior, indice)
+
+
+# ==========================================================
+# --- RESOLUCIÓN ---
+# ==========================================================
+
+class ResolucionEntidades:
+    """
+    Acumula registros (solo sus claves normalizadas) y calcula los clusters
+    de persona y empresa. Uso: agregar() por cada fila y luego resolver().
+    """
+
+    def __init__(self, max_bloque=MAX_BLOQUE):
+        self.max_bloque = max_bloque
+        self.dominios = []
+        self.empresas = []
+        self.emails = []
+        self.linkedins = []
+        self.nombres = []
+        self.id_persona = None
+        self.id_empresa = None
+        self.bloques_omitidos = 0
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def agregar(self, nombre, empresa="", email="", linkedin_url="", dominio=""):
+        """Registra un contacto y retorna su índice."""
+        dominio = normalizar_dominio(dominio) if dominio else dominio_de_email(email)
+        self.dominios.append(sys.intern(dominio))
+        self.empresas.append(sys.intern(normalizar_empresa(empresa)))
+        self.emails.append(normalizar_email(email))
+        self.linkedins.append(normalizar_linkedin(linkedin_url))
+        self.nombres.append(tuple(sys.intern(t) for t in normalizar_texto(nombre).split()))
+        return len(self.nombres) - 1
+
+    def resolver(self):
+        """Calcula id_empresa e id_persona (listas paralelas a los registros). Retorna (personas, empresas) distintas."""
+        total = len(self)
+
+        # --- Empresas: mismo dominio o mismo nombre normalizado ---
+        empresas = UnionFind(total)
+        empresas.unir_por_clave(enumerate(self.dominios))
+        empresas.unir_por_clave(enumerate(self.empresas))
+        self.id_empresa = [
+            empresas.raiz(i) if (self.dominios[i] or self.empresas[i]) else None for i in range(total)
+        ]
+
+        # --- Personas: email / LinkedIn exactos ---
+        personas = UnionFind(total)
+        personas.unir_por_clave(enumerate(self.emails))
+        personas.unir_por_clave(enumerate(self.linkedins))
+
+        # --- Personas: nombres compatibles dentro de la misma empresa ---
+        bloques = defaultdict(list)
+        for i, tokens in enumerate(self.nombres):
+            empresa = self.id_empresa[i]
+            if empresa is None or len(tokens) < 2:
+                continue
+            for token in set(tokens):
+                if len(token) > 1:
+                    bloques[(empresa, token)].append(i)
+
+        # Coincidencias solo por inicial: candidatos de cada registro, se deciden al final
+        por_inicial = defaultdict(set)
+        for miembros in bloques.values():
+            if len(miembros) < 2:
+                continue
+            if len(miembros) > self.max_bloque:
+                self.bloques_omitidos += 1  # Token demasiado común en la empresa: no discrimina
+                continue
+            for x in range(len(miembros)):
+                a = miembros[x]
+                for b in miembros[x + 1:]:
+                    if personas.raiz(a) == personas.raiz(b):
+                        continue
+                    if nombres_compatibles(self.nombres[a], self.nombres[b], iniciales=False):
+                        personas.unir(a, b)
+                    elif nombres_compatibles(self.nombres[a], self.nombres[b]):
+                        por_inicial[a].add(b)
+                        por_inicial[b].add(a)
+
+        # Una inicial une solo si, de ambos lados, apunta a una única persona
+        candidatos = {i: {personas.raiz(c) for c in otros} for i, otros in por_inicial.items()}
+        for a, otros in por_inicial.items():
+            if len(candidatos[a]) != 1:
+                continue
+            for b in otros:
+                if len(candidatos[b]) == 1:
+                    personas.unir(a, b)
+
+        self.id_persona = [personas.raiz(i) for i in range(total)]
+        return len(set(self.id_persona)), len({e for e in self.id_empresa if e is not None})
+
+
+def _columnas(lector, mapa):
+    """Traduce el mapa de columnas de la fuente a los encabezados reales del CSV (sin distinguir mayúsculas)."""
+    reales = {c.lower(): c for c in (lector.fieldnames or [])}
+    return {campo: reales.get(columna.lower()) if columna else None for campo, columna in mapa.items()}
+
+
+def resolver_archivos(salida, apollo_file=None, lusha_file=None, signal_file=None, log_callback=print,
+                      encoding="utf-8-sig"):
+    """
+    Resuelve entidades entre los CSV de resultados indicados y escribe en
+    'salida' un CSV con id_persona e id_empresa por contacto.
+    Retorna (registros, personas, empresas).
+    """
+    archivos = [(fuente, ruta) for fuente, ruta in
+                (("apollo", apollo_file), ("lusha", lusha_file), ("signalhire", signal_file)) if ruta]
+    motor = ResolucionEntidades()
+
+    # --- Pasada 1: claves ---
+    for fuente, ruta in archivos:
+        inicio = len(motor)
+        with open(ruta, newline="", encoding=encoding) as f:
+            lector = csv.DictReader(f)
+            columnas = _columnas(lector, FUENTES[fuente])
+            for fila in lector:
+                motor.agregar(
+                    _valor(fila, columnas["nombre"]), _valor(fila, columnas["empresa"]),
+                    _valor(fila, columnas["email"]), _valor(fila, columnas["linkedin_url"]),
+                    _valor(fila, columnas["dominio"]),
+                )
+        log_callback(f"📥 {fuente}: {len(motor) - inicio} registros leídos.")
+
+    personas, empresas = motor.resolver()
+    if motor.bloques_omitidos:
+        log_callback(f"ℹ️ {motor.bloques_omitidos} bloques de nombre demasiado grandes se omitieron.")
+
+    # --- Pasada 2: salida con IDs ---
+    indice = 0
+    with open(salida, "w", newline="", encoding=encoding) as f_out:
+        escritor = csv.DictWriter(f_out, fieldnames=CAMPOS_SALIDA)
+        escritor.writeheader()
+        for fuente, ruta in archivos:
+            with open(ruta, newline="", encoding=encoding) as f:
+                lector = csv.DictReader(f)
+                columnas = _columnas(lector, FUENTES[fuente])
+                for fila in lector:
+                    id_empresa = motor.id_empresa[indice]
+                    escritor.writerow({
+                        "id_persona": f"P{motor.id_persona[indice] + 1}",
+                        "id_empresa": f"E{id_empresa + 1}" if id_empresa is not None else "",
+                        "fuente": fuente,
+                        "id_fuente": _valor(fila, columnas["id"]),
+                        "nombre": _valor(fila, columnas["nombre"]),
+                        "empresa": _valor(fila, columnas["empresa"]),
+                        "email": _valor(fila, columnas["email"]),
+                        "linkedin_url": _valor(fila, columnas["linkedin_url"]),
+                        "dominio": motor.dominios[indice],
+                    })
+                    indice += 1
+
+    log_callback(f"✅ Resolución de entidades: {indice} registros → {personas} personas, {empresas} empresas.")
+    return indice, personas, empresas
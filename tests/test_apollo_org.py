@@ -0,0 +1,69 @@
+import csv
+import os
+import threading
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import apollo_org  # noqa: E402
+import cliente_http  # noqa: E402
+
+
+class Respuesta:
+    def __init__(self, status_code, datos=None):
+        self.status_code = status_code
+        self.reason = "x"
+        self.datos = datos
+
+    def json(self):
+        return self.datos
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+def _ejecutar(tmp_path, monkeypatch, responder, ids):
+    monkeypatch.setattr(cliente_http, "enviar", lambda sesion, metodo, url, **_: responder(url.rsplit("/", 1)[1]))
+    entrada = tmp_path / "ids.csv"
+    entrada.write_text("id\n" + "\n".join(ids) + "\n", encoding="utf-8")
+    logs = []
+    apollo_org.run("k", str(entrada), str(tmp_path), logs.append, threading.Event(), usar_cache=False)
+    with open(tmp_path / "apollo_organizations_output.csv", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f)), logs
+
+
+def _organizacion(org_id):
+    return Respuesta(200, {"organization": {"id": org_id, "name": f"Org {org_id}"}})
+
+
+def test_respuesta_sin_organizacion_no_agrega_fila(tmp_path, monkeypatch):
+    filas, _ = _ejecutar(tmp_path, monkeypatch,
+                         lambda org_id: Respuesta(200, {}) if org_id == "2" else _organizacion(org_id), ["1", "2", "3"])
+    assert [f["ID_BUSCADO"] for f in filas] == ["1", "3"]
+    assert not os.path.exists(tmp_path / "apollo_organizations_output.bitacora.jsonl")
+
+
+def test_error_definitivo_se_guarda_y_el_trabajo_termina(tmp_path, monkeypatch):
+    filas, logs = _ejecutar(tmp_path, monkeypatch,
+                            lambda org_id: Respuesta(404) if org_id == "2" else _organizacion(org_id), ["1", "2", "3"])
+    assert [(f["ID_BUSCADO"], f["name"]) for f in filas] == [("1", "Org 1"), ("2", "ERROR: 404"), ("3", "Org 3")]
+    assert not os.path.exists(tmp_path / "apollo_organizations_output.bitacora.jsonl")
+    assert not any("Vuelve a ejecutar" in linea for linea in logs)
+
+
+@pytest.mark.parametrize("falla", [
+    lambda: Respuesta(503),
+    lambda: Respuesta(429),
+    lambda: (_ for _ in ()).throw(requests.exceptions.ConnectionError("sin red")),
+])
+def test_error_transitorio_queda_pendiente_y_se_reintenta(tmp_path, monkeypatch, falla):
+    filas, logs = _ejecutar(tmp_path, monkeypatch,
+                            lambda org_id: falla() if org_id == "2" else _organizacion(org_id), ["1", "2", "3"])
+    assert [f["ID_BUSCADO"] for f in filas] == ["1", "3"]
+    assert os.path.exists(tmp_path / "apollo_organizations_output.bitacora.jsonl")
+
+    filas, _ = _ejecutar(tmp_path, monkeypatch, _organizacion, ["1", "2", "3"])
+    assert sorted(f["ID_BUSCADO"] for f in filas) == ["1", "2", "3"]
+    assert not os.path.exists(tmp_path / "apollo_organizations_output.bitacora.jsonl")
@@ -0,0 +1,89 @@
+import os
+
+from bitacora import Bitacora, huella_trabajo, ruta_bitacora
+
+
+def _salida(tmp_path):
+    ruta = tmp_path / "resultados.csv"
+    ruta.write_text("encabezado\n", encoding="utf-8")
+    return str(ruta)
+
+
+def test_huella_estable_e_independiente_del_orden_de_parametros():
+    assert huella_trabajo(a=1, b=[1, 2]) == huella_trabajo(b=[1, 2], a=1)
+    assert huella_trabajo(a=1) != huella_trabajo(a=2)
+
+
+def test_reanuda_con_la_misma_huella(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    assert not registro.reanudando
+    registro.marcar("Acme", "Peru", "", 1, siguientes=[2, 3])
+    registro.marcar("Beta", "Peru", "", 1)
+    registro.cerrar(completo=False)
+
+    reanudado = Bitacora(salida, "h1")
+    assert reanudado.reanudando
+    assert reanudado.completada("Acme", "Peru", "", 1)
+    assert not reanudado.completada("Gamma", "Peru", "", 1)
+    reanudado.cerrar(completo=False)
+
+
+def test_huella_distinta_o_sin_csv_empieza_de_cero(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    registro.marcar(0)
+    registro.cerrar(completo=False)
+
+    assert not Bitacora(salida, "h2").reanudando
+
+    registro = Bitacora(salida, "h1")
+    registro.marcar(0)
+    registro.cerrar(completo=False)
+    os.remove(salida)
+    assert not Bitacora(salida, "h1").reanudando
+
+
+def test_reanudar_false_ignora_la_bitacora(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    registro.marcar(0)
+    registro.cerrar(completo=False)
+    assert not Bitacora(salida, "h1", reanudar=False).reanudando
+
+
+def test_linea_truncada_por_una_caida_se_ignora(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    registro.marcar(0)
+    registro.cerrar(completo=False)
+    with open(ruta_bitacora(salida), "a", encoding="utf-8") as f:
+        f.write('{"t": [1')
+
+    reanudado = Bitacora(salida, "h1")
+    assert reanudado.completada(0)
+    assert not reanudado.completada(1)
+    reanudado.cerrar(completo=False)
+
+
+def test_pendientes_reconstruye_paginas_siguientes(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    registro.marcar("A", 1, siguientes=[2, 3])
+    registro.marcar("A", 2)
+    registro.cerrar(completo=False)
+
+    reanudado = Bitacora(salida, "h1")
+    tareas = [("A", 1), ("B", 1)]
+    pendientes = reanudado.pendientes(tareas, clave_de=lambda t: t, con_pagina=lambda t, p: (t[0], p))
+    assert pendientes == [("B", 1), ("A", 3)]
+    reanudado.cerrar(completo=False)
+
+
+def test_trabajo_completo_borra_la_bitacora(tmp_path):
+    salida = _salida(tmp_path)
+    registro = Bitacora(salida, "h1")
+    registro.marcar(0)
+    registro.cerrar(completo=True)
+    assert not os.path.exists(ruta_bitacora(salida))
+    assert not Bitacora(salida, "h1").reanudando
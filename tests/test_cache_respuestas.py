@@ -0,0 +1,66 @@
+import json
+
+import cache_respuestas
+from cache_respuestas import CacheRespuestas, calcular_clave, huella_cuenta
+
+URL = "https://api.apollo.io/api/v1/contacts/search"
+
+
+def test_clave_distinta_por_cuenta():
+    cuenta_a = huella_cuenta({"x-api-key": "clave-a"})
+    cuenta_b = huella_cuenta({"x-api-key": "clave-b"})
+    assert cuenta_a and cuenta_a != cuenta_b
+    assert "clave-a" not in cuenta_a
+    payload = {"q_organization_name": "Acme", "page": 1}
+    assert calcular_clave("apollo", "POST", URL, cuenta=cuenta_a, json=payload) != \
+        calcular_clave("apollo", "POST", URL, cuenta=cuenta_b, json=payload)
+
+
+def test_huella_cuenta_lee_headers_de_request_y_de_sesion():
+    assert huella_cuenta(None, {"api_key": "lusha"}) == huella_cuenta({"api_key": "lusha"})
+    assert huella_cuenta({"Content-Type": "application/json"}) == ""
+
+
+def test_clave_ignora_orden_de_campos_y_campos_volatiles():
+    a = calcular_clave("lusha", "post", URL, data=json.dumps({"requestId": "1", "ids": [1, 2], "x": 1}))
+    b = calcular_clave("lusha", "POST", URL, json={"x": 1, "ids": [1, 2], "requestId": "2"})
+    assert a == b
+    assert a != calcular_clave("lusha", "POST", URL, json={"x": 1, "ids": [2, 1]})
+
+
+def test_clave_distingue_proveedor_y_params():
+    assert calcular_clave("apollo", "GET", URL, params={"a": 1}) != calcular_clave("lusha", "GET", URL, params={"a": 1})
+    assert calcular_clave("apollo", "GET", URL, params={"a": 1}) != calcular_clave("apollo", "GET", URL, params={"a": 2})
+
+
+def test_aciertos_no_escriben_hasta_el_proximo_guardado(tmp_path):
+    cache = CacheRespuestas(ruta=str(tmp_path / "cache.sqlite3"))
+    cache.guardar("k1", "apollo", 200, b'{"ok": true}')
+    antes = cache.conn.execute("SELECT ultimo_acceso FROM respuestas WHERE clave = 'k1'").fetchone()[0]
+
+    respuesta = cache.obtener("k1")
+    assert respuesta.json() == {"ok": True} and cache.aciertos == 1
+    assert cache.conn.execute("SELECT ultimo_acceso FROM respuestas WHERE clave = 'k1'").fetchone()[0] == antes
+    assert "k1" in cache._accesos
+
+    cache.guardar("k2", "apollo", 200, b"{}")
+    assert not cache._accesos
+    assert cache.conn.execute("SELECT ultimo_acceso FROM respuestas WHERE clave = 'k1'").fetchone()[0] >= antes
+
+
+def test_respuesta_expirada_no_se_entrega(tmp_path):
+    cache = CacheRespuestas(ruta=str(tmp_path / "cache.sqlite3"), ttl_segundos=-1)
+    cache.guardar("k", "lusha", 200, b"{}")
+    assert cache.obtener("k") is None
+    assert cache.fallos == 1
+
+
+def test_accesos_pendientes_se_graban_al_llegar_al_maximo(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_respuestas, "MAX_ACCESOS_PENDIENTES", 2)
+    cache = CacheRespuestas(ruta=str(tmp_path / "cache.sqlite3"))
+    cache.guardar("a", "apollo", 200, b"{}")
+    cache.guardar("b", "apollo", 200, b"{}")
+    cache.obtener("a")
+    assert cache._accesos
+    cache.obtener("b")
+    assert not cache._accesos
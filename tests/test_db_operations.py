@@ -0,0 +1,294 @@
+import contextlib
+import csv
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import db_operations  # noqa: E402
+import normalizador_cargos  # noqa: E402
+
+
+class CursorRegistro:
+    """Cursor que registra las sentencias; pg_indexes responde con 'indice_existente'."""
+
+    def __init__(self, indice_existente=None):
+        self.indice_existente = indice_existente
+        self.sentencias = []
+        self.rowcount = 0
+        self._ultima = ""
+
+    def execute(self, sql, params=None):
+        self.sentencias.append((" ".join(sql.split()), params))
+        self._ultima = sql
+
+    def fetchone(self):
+        if "pg_indexes" in self._ultima:
+            return None if self.indice_existente is None else (self.indice_existente,)
+        return None
+
+    def fetchall(self):
+        return []
+
+    def con(self, fragmento):
+        return [(sql, params) for sql, params in self.sentencias if fragmento in sql]
+
+
+def _preparar(cur):
+    columnas = ['"contactid"', '"name"']
+    tipos = {'"contactid"': "TEXT", '"name"': "TEXT"}
+    db_operations._preparar_tabla_destino(cur, "resultados_lusha", columnas, tipos, "contactid", lambda _: None)
+
+
+# --- _preparar_tabla_destino ---
+
+def test_dedup_previa_excluye_claves_vacias():
+    cur = CursorRegistro()
+    _preparar(cur)
+    [(delete, params)] = cur.con("DELETE FROM resultados_lusha")
+    assert 'a."contactid" NOT IN %s' in delete
+    assert params == (db_operations.CLAVES_VACIAS,)
+
+
+def test_indice_unico_es_parcial():
+    cur = CursorRegistro()
+    _preparar(cur)
+    [(create, params)] = cur.con("CREATE UNIQUE INDEX")
+    assert create.endswith('ON resultados_lusha ("contactid") WHERE "contactid" NOT IN %s;')
+    assert params == (db_operations.CLAVES_VACIAS,)
+
+
+def test_indice_completo_anterior_se_reemplaza_sin_borrar_filas():
+    cur = CursorRegistro('CREATE UNIQUE INDEX ux_resultados_lusha_contactid ON public.resultados_lusha USING btree (contactid)')
+    _preparar(cur)
+    assert cur.con("DROP INDEX ux_resultados_lusha_contactid")
+    assert cur.con("CREATE UNIQUE INDEX")
+    assert not cur.con("DELETE FROM")
+
+
+def test_indice_parcial_existente_no_se_toca():
+    cur = CursorRegistro("CREATE UNIQUE INDEX ux_resultados_lusha_contactid ON public.resultados_lusha "
+                         "USING btree (contactid) WHERE (contactid <> ALL (ARRAY[''::text, 'N/A'::text]))")
+    _preparar(cur)
+    assert not cur.con("DROP INDEX") and not cur.con("CREATE UNIQUE INDEX") and not cur.con("DELETE FROM")
+
+
+# --- _inferir_tipo ---
+
+@pytest.mark.parametrize("valores, tipo", [
+    (["1", "22", "-3", ""], "BIGINT"),
+    (["1.5", "2", "3e4"], "NUMERIC"),
+    (["99999999999999999999"], "NUMERIC"),
+    (["true", "False", "t"], "BOOLEAN"),
+    (["", None, "  "], "TEXT"),
+    (["12", "abc"], "TEXT"),
+])
+def test_inferir_tipo(valores, tipo):
+    assert db_operations._inferir_tipo(valores) == tipo
+
+
+@pytest.mark.parametrize("valores", [
+    ["+56912345678", "+51987654321"],  # Teléfonos de SignalHire
+    ["+1"],
+    ["0123", "4567"],                 # Ceros a la izquierda
+    ["007.5"],
+    ["-0123"],
+])
+def test_telefonos_y_ceros_a_la_izquierda_quedan_como_texto(valores):
+    assert db_operations._inferir_tipo(valores) == "TEXT"
+
+
+def test_cero_y_decimales_menores_que_uno_siguen_siendo_numeros():
+    assert db_operations._inferir_tipo(["0", "10"]) == "BIGINT"
+    assert db_operations._inferir_tipo(["0.5", "-0.25"]) == "NUMERIC"
+
+
+# --- execute_consolidate_data ---
+
+class CursorPropagacion(CursorRegistro):
+    """Cada UPDATE de grupos_contacto reagrupa una fila hasta agotar 'pasadas_con_cambios'."""
+
+    def __init__(self, pasadas_con_cambios):
+        super().__init__()
+        # Por pasada: un UPDATE por clave más el salto de puntero
+        self.pendientes = pasadas_con_cambios * (len(db_operations.CLAVES_CONSOLIDACION) + 1)
+
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        self.rowcount = 0
+        if "UPDATE grupos_contacto" in sql and self.pendientes:
+            self.pendientes -= 1
+            self.rowcount = 1
+
+    def fetchone(self):
+        return (1,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class GestorFalso:
+    def __init__(self, cur):
+        self.cur = cur
+
+    @contextlib.contextmanager
+    def conexion(self):
+        yield self
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+
+def test_consolidacion_propaga_hasta_que_no_hay_cambios(monkeypatch):
+    cur = CursorPropagacion(pasadas_con_cambios=30)
+    monkeypatch.setattr(db_operations, "obtener_gestor", lambda _: GestorFalso(cur))
+    logs = []
+    db_operations.execute_consolidate_data({}, logs.append, lambda *_: None)
+    pasadas = [linea for linea in logs if linea.startswith("Pasada ")]
+    assert len(pasadas) == 31
+    assert pasadas[-1] == "Pasada 31: 0 filas reagrupadas."
+    assert cur.con("CREATE TABLE contactos_consolidados")
+    assert cur.con("FROM entidades_resueltas")
+    assert not any(linea.startswith("❌") for linea in logs)
+
+
+# --- execute_clean_data: lookup de cargos ---
+
+class ConexionCopia:
+    """Conexión falsa: su cursor guarda lo que se envía a COPY."""
+
+    def __init__(self):
+        self.copiado = []
+
+    @contextlib.contextmanager
+    def cursor(self):
+        yield self
+
+    def copy_expert(self, sql, archivo):
+        self.copiado.extend(csv.reader(archivo))
+
+
+def test_lookup_cargos_usa_el_normalizador_de_los_extractores():
+    normalizador = normalizador_cargos.NormalizadorCargos(
+        [("Gerente de Ventas", "Gerente Comercial")], [("Gerente Comercial", "Comercial")])
+    cur = CursorRegistro()
+    lotes = iter([[("Sr. Gerente de Ventas",), ("Analista",)], []])
+    cur.fetchmany = lambda _tamano: next(lotes)
+    conn = ConexionCopia()
+    assert db_operations._cargar_lookup_cargos(conn, cur, normalizador) == 2
+    assert conn.copiado == [
+        ["Sr. Gerente de Ventas", "sr gerente de ventas", "Gerente Comercial", "Comercial"],
+        ["Analista", "analista", "", ""],
+    ]
+    assert cur.con("SELECT DISTINCT cargo FROM contactos_fuente")
+
+
+# --- _fusionar (carga incremental) ---
+
+class CursorTipos(CursorRegistro):
+    """Lanza DataError al convertir 'columna_invalida' a su tipo (en la fusión o en la prueba)."""
+
+    def __init__(self, columna_invalida):
+        super().__init__()
+        self.columna_invalida = columna_invalida
+
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        if f"NULLIF({self.columna_invalida}, '')::" in sql:
+            raise psycopg2.DataError('invalid input syntax for type integer: "10,000"')
+
+    def fetchone(self):
+        return (1, 2)
+
+
+def _fusionar(cur, tipos):
+    columnas = ['"id"', '"name"', '"founded_year"', '"estimated_num_employees"']
+    return db_operations._fusionar(cur, "resultados_apollo", "stg_resultados_apollo", columnas, "id", tipos,
+                                   lambda _: None)
+
+
+def test_fusion_con_tipos_que_calzan_no_altera_columnas():
+    cur = CursorTipos('"otra"')
+    tipos = {'"founded_year"': "INTEGER", '"estimated_num_employees"': "INTEGER"}
+    assert _fusionar(cur, tipos) == (1, 2)
+    assert not cur.con("ALTER TABLE")
+    assert cur.con("RELEASE SAVEPOINT fusion_tipada")
+
+
+def test_valor_que_no_calza_pasa_la_columna_a_texto_y_reintenta():
+    cur = CursorTipos('"estimated_num_employees"')
+    tipos = {'"founded_year"': "INTEGER", '"estimated_num_employees"': "INTEGER"}
+    assert _fusionar(cur, tipos) == (1, 2)
+    assert cur.con("ROLLBACK TO SAVEPOINT fusion_tipada")
+    [(alter, _)] = cur.con("ALTER TABLE")
+    assert alter == 'ALTER TABLE resultados_apollo ALTER COLUMN "estimated_num_employees" TYPE TEXT;'
+    assert tipos == {'"founded_year"': "INTEGER", '"estimated_num_employees"': "TEXT"}
+    fusiones = cur.con("WITH fusion AS")
+    assert len(fusiones) == 2 and "NULLIF(\"founded_year\", '')::INTEGER" in fusiones[-1][0]
+
+
+# --- GestorConexiones ---
+
+class ConexionPool:
+    closed = 0
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class PoolFalso:
+    """Como ThreadedConnectionPool: getconn() lanza PoolError si se agota."""
+
+    def __init__(self, minconn, maxconn, **_):
+        self.maxconn = maxconn
+        self.en_uso = 0
+        self.cerrado = False
+
+    def getconn(self):
+        if self.en_uso >= self.maxconn:
+            raise psycopg2.pool.PoolError("connection pool exhausted")
+        self.en_uso += 1
+        return ConexionPool()
+
+    def putconn(self, conn, close=False):
+        self.en_uso -= 1
+
+    def closeall(self):
+        self.cerrado = True
+
+
+def test_pool_agotado_espera_en_vez_de_fallar(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", PoolFalso)
+    gestor = db_operations.GestorConexiones({}, max_conexiones=2)
+    errores = []
+
+    def usar():
+        try:
+            with gestor.conexion():
+                db_operations.time.sleep(0.01)
+        except psycopg2.pool.PoolError as e:
+            errores.append(e)
+
+    hilos = [db_operations.threading.Thread(target=usar) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert errores == [] and gestor.pool.en_uso == 0
+
+
+def test_gestor_retirado_se_cierra_al_devolver_la_ultima_conexion(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", PoolFalso)
+    monkeypatch.setattr(db_operations, "_gestor", None)
+    viejo = db_operations.obtener_gestor({"host": "a"})
+    with viejo.conexion():
+        nuevo = db_operations.obtener_gestor({"host": "b"})
+        assert nuevo is not viejo
+        assert not viejo.pool.cerrado
+    assert viejo.pool.cerrado
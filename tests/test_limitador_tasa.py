@@ -0,0 +1,37 @@
+import limitador_tasa
+
+
+class _Respuesta:
+    def __init__(self, headers, status_code=200):
+        self.headers = headers
+        self.status_code = status_code
+
+
+def _control(requests_por_minuto=100):
+    return limitador_tasa.ControlTrafico("prueba", requests_por_minuto, 2, 5)
+
+
+def test_headers_sin_ventana_se_ignoran():
+    control = _control()
+    control.registrar_respuesta(_Respuesta({"x-ratelimit-limit": "10000", "x-ratelimit-remaining": "0"}))
+    assert control.bucket.requests_por_minuto == 100
+    assert control.bucket.tomar() == 0  # No se pausó
+
+
+def test_header_por_minuto_baja_la_tasa():
+    control = _control()
+    control.registrar_respuesta(_Respuesta({"x-rate-limit-minute": "50"}))
+    assert control.bucket.requests_por_minuto == 50
+
+
+def test_header_por_minuto_no_supera_la_tasa_configurada():
+    control = _control()
+    control.registrar_respuesta(_Respuesta({"x-rate-limit-minute": "50"}))
+    control.registrar_respuesta(_Respuesta({"x-rate-limit-minute": "1000"}))
+    assert control.bucket.requests_por_minuto == 100
+
+
+def test_restantes_agotados_pausan_el_bucket():
+    control = _control()
+    control.registrar_respuesta(_Respuesta({"x-minute-requests-left": "0", "x-rate-limit-reset": "30"}))
+    assert control.bucket.tomar() > 0
@@ -0,0 +1,26 @@
+import json
+import os
+import threading
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import motor_async  # noqa: E402
+
+
+def _respuesta_apollo(request):
+    payload = json.loads(request.content)
+    if payload["q_organization_name"] == "Rota":
+        return httpx.Response(200, content=b"<html>mantenimiento</html>")
+    contactos = [{"id": f"{payload['q_organization_name']}-{i}", "name": "n"} for i in range(3)]
+    return httpx.Response(200, json={"contacts": contactos, "pagination": {"total_pages": 1}})
+
+
+def test_respuesta_no_json_cuenta_como_fallida_y_deja_el_trabajo_pendiente(tmp_path):
+    logs = []
+    motor_async.run_apollo("k", ["Sana", "Rota"], ["gerente"], ["Chile"], str(tmp_path), logs.append,
+                           threading.Event(), transport=httpx.MockTransport(_respuesta_apollo), usar_cache=False)
+    assert "⚠️  PROCESO INCOMPLETO" in logs
+    assert any("Error en request de Rota" in linea for linea in logs)
+    assert os.path.exists(tmp_path / "resultados_apollo.bitacora.jsonl")
@@ -0,0 +1,72 @@
+import csv
+import threading
+
+from normalizador_cargos import CAMPOS_SALIDA, NormalizadorCargos, agregar_campos_salida, normalizar_texto
+
+
+def _normalizador():
+    cargos = [("Gerente de Ventas", "Gerente Comercial"), ("CFO", "Director de Finanzas")]
+    areas = [("Gerente Comercial", "Comercial"), ("Director de Finanzas", "Finanzas")]
+    return NormalizadorCargos(cargos, areas)
+
+
+def test_normalizar_texto():
+    assert normalizar_texto("  Gerente de Operaciones/LATAM ") == "gerente de operaciones latam"
+    assert normalizar_texto("Dirección Técnica") == "direccion tecnica"
+    assert normalizar_texto(None) == ""
+
+
+def test_coincidencia_exacta_sin_importar_tildes_ni_mayusculas():
+    assert _normalizador().clasificar("GERENTE DE VENTAS") == ("Gerente Comercial", "Comercial")
+
+
+def test_ngrama_dentro_de_un_titulo_mas_largo():
+    assert _normalizador().clasificar("Sr. Gerente de Ventas LATAM") == ("Gerente Comercial", "Comercial")
+    assert _normalizador().clasificar("Global CFO") == ("Director de Finanzas", "Finanzas")
+
+
+def test_titulo_sin_mapeo():
+    assert _normalizador().clasificar("Analista") == (None, None)
+    assert _normalizador().clasificar("") == (None, None)
+
+
+def test_v2_tiene_prioridad_sobre_v1(tmp_path):
+    v1 = tmp_path / "v1.csv"
+    v2 = tmp_path / "v2.csv"
+    v1.write_text("origen,estandar\nJefe de TI,Jefe TI v1\nCTO,Director de Tecnologia\n", encoding="utf-8")
+    v2.write_text("\ufefforigen,estandar\nJefe de TI,Jefe TI v2\n", encoding="utf-8")
+    normalizador = NormalizadorCargos.desde_archivos(str(v1), str(v2))
+    assert normalizador.clasificar("jefe de ti")[0] == "Jefe TI v2"
+    assert normalizador.clasificar("CTO")[0] == "Director de Tecnologia"
+
+
+def test_enriquecer_filas_conserva_el_cargo_original_si_no_hay_mapeo():
+    filas = [{"title": "Gerente de Ventas"}, {"title": "Analista"}, {}]
+    _normalizador().enriquecer_filas(filas, "title")
+    assert [(f["cargo_estandar"], f["area"]) for f in filas] == [
+        ("Gerente Comercial", "Comercial"), ("Analista", ""), ("", "")]
+
+
+def test_agregar_campos_salida_no_repite():
+    assert agregar_campos_salida(["title"]) == ["title", *CAMPOS_SALIDA]
+    assert agregar_campos_salida(["title", "area"]) == ["title", "area", "cargo_estandar"]
+
+
+def test_normalizar_csv_lee_archivos_con_bom(tmp_path):
+    entrada = tmp_path / "apollo.csv"
+    salida = tmp_path / "salida.csv"
+    entrada.write_text("\ufefftitle,name\nCFO,Ana\n", encoding="utf-8")
+    assert _normalizador().normalizar_csv(str(entrada), str(salida), "title") == 1
+    with open(salida, newline="", encoding="utf-8-sig") as f:
+        [fila] = list(csv.DictReader(f))
+    assert fila["cargo_estandar"] == "Director de Finanzas" and fila["area"] == "Finanzas"
+
+
+def test_cada_hilo_tiene_su_propio_memo():
+    normalizador = _normalizador()
+    normalizador.clasificar("CFO")
+    memos = []
+    hilo = threading.Thread(target=lambda: memos.append(normalizador.memo))
+    hilo.start()
+    hilo.join()
+    assert memos == [{}] and "CFO" in normalizador.memo
@@ -0,0 +1,135 @@
+import csv
+
+import pytest
+
+from resolucion_entidades import (ResolucionEntidades, deduplicar_empresas, nombres_compatibles,
+                                  normalizar_empresa, resolver_archivos)
+
+
+def _tokens(nombre):
+    return tuple(nombre.split())
+
+
+# --- normalizar_empresa / deduplicar_empresas ---
+
+@pytest.mark.parametrize("empresa, normalizada", [
+    ("Acme Perú S.A.C.", "acme peru"),
+    ("ACME SA", "acme"),
+    ("Acme, S.A. de C.V.", "acme"),
+    ("Acme S de RL de CV", "acme"),
+    ("Acme Ltda.", "acme"),
+    ("Acme Inc.", "acme"),
+    ("Acme E.I.R.L.", "acme"),
+])
+def test_quita_formas_legales(empresa, normalizada):
+    assert normalizar_empresa(empresa) == normalizada
+
+
+@pytest.mark.parametrize("empresa, normalizada", [
+    ("Banco de Crédito", "banco de credito"),
+    ("Coca-Cola Company", "coca cola company"),
+    ("Acme Co", "acme co"),
+    ("Grupo S", "grupo s"),
+    ("Vitamina A", "vitamina a"),
+    ("Day Spa", "day spa"),
+    ("S.A.", "s a"),
+])
+def test_conserva_palabras_que_no_son_formas_legales(empresa, normalizada):
+    assert normalizar_empresa(empresa) == normalizada
+
+
+def test_deduplicar_empresas_conserva_la_primera_escritura_en_orden():
+    logs = []
+    empresas = ["ACME", "Beta", "Acme S.A.", " acme sa ", "", "beta", "Acme Co"]
+    assert deduplicar_empresas(empresas, logs.append) == ["ACME", "Beta", "Acme Co"]
+    assert logs and logs[0].startswith("🧹 3 empresas repetidas")
+
+
+def test_deduplicar_empresas_no_une_empresas_distintas():
+    empresas = ["Banco de Chile", "Banco Chile", "Coca-Cola Company", "Coca-Cola"]
+    assert deduplicar_empresas(empresas) == empresas
+
+
+# --- nombres_compatibles ---
+
+def test_nombre_contenido_en_otro():
+    assert nombres_compatibles(_tokens("juan perez"), _tokens("juan carlos perez"))
+    assert not nombres_compatibles(_tokens("juan perez"), _tokens("jose perez"))
+
+
+def test_iniciales_solo_si_se_piden():
+    assert nombres_compatibles(_tokens("j perez"), _tokens("juan perez"))
+    assert nombres_compatibles(_tokens("juan perez"), _tokens("j perez"))
+    assert not nombres_compatibles(_tokens("j perez"), _tokens("juan perez"), iniciales=False)
+
+
+def test_un_solo_token_no_alcanza():
+    assert not nombres_compatibles(_tokens("perez"), _tokens("juan perez"))
+
+
+# --- ResolucionEntidades.resolver ---
+
+def _resolver(*contactos):
+    motor = ResolucionEntidades()
+    for contacto in contactos:
+        motor.agregar(**contacto)
+    motor.resolver()
+    return motor.id_persona
+
+
+def test_inicial_ambigua_no_une_personas_distintas():
+    juan, jose, inicial = _resolver(
+        {"nombre": "Juan Pérez", "empresa": "Acme"},
+        {"nombre": "José Pérez", "empresa": "Acme"},
+        {"nombre": "J. Pérez", "empresa": "Acme S.A."},
+    )
+    assert len({juan, jose, inicial}) == 3
+
+
+def test_inicial_sin_ambiguedad_une():
+    juan, inicial, otro = _resolver(
+        {"nombre": "Juan Pérez", "empresa": "Acme"},
+        {"nombre": "J. Pérez", "empresa": "ACME"},
+        {"nombre": "María Gómez", "empresa": "Acme"},
+    )
+    assert juan == inicial != otro
+
+
+def test_variantes_de_la_misma_persona_cuentan_como_una():
+    # "Juan Pérez" y "Juan Carlos Pérez" ya son la misma persona: la inicial no es ambigua
+    ids = _resolver(
+        {"nombre": "Juan Pérez", "empresa": "Acme"},
+        {"nombre": "Juan Carlos Pérez", "empresa": "Acme"},
+        {"nombre": "J. Pérez", "empresa": "Acme"},
+    )
+    assert len(set(ids)) == 1
+
+
+def test_email_y_linkedin_unen_entre_empresas():
+    a, b, c = _resolver(
+        {"nombre": "Ana Ruiz", "empresa": "Acme", "email": "ana@acme.com"},
+        {"nombre": "Ana R.", "empresa": "Otra", "email": "ANA@acme.com"},
+        {"nombre": "Ana Ruiz", "empresa": "Beta"},
+    )
+    assert a == b != c
+
+
+def test_mismo_nombre_en_otra_empresa_no_une():
+    a, b = _resolver({"nombre": "Juan Pérez", "empresa": "Acme"}, {"nombre": "Juan Pérez", "empresa": "Beta"})
+    assert a != b
+
+
+# --- resolver_archivos ---
+
+def test_resolver_archivos_lee_csv_con_bom(tmp_path):
+    apollo = tmp_path / "resultados_apollo.csv"
+    lusha = tmp_path / "resultados_lusha.csv"
+    apollo.write_text("id,name,organization_name,email,linkedin_url\n1,Juan Pérez,Acme,,\n", encoding="utf-8-sig")
+    lusha.write_text("contactId,name,companyName,fqdn\n9,Juan Carlos Pérez,ACME S.A.,acme.com\n", encoding="utf-8")
+    salida = tmp_path / "entidades_resueltas.csv"
+
+    assert resolver_archivos(str(salida), str(apollo), str(lusha), log_callback=lambda _: None) == (2, 1, 1)
+    with open(salida, newline="", encoding="utf-8-sig") as f:
+        filas = list(csv.DictReader(f))
+    assert [(f["fuente"], f["id_fuente"]) for f in filas] == [("apollo", "1"), ("lusha", "9")]
+    assert filas[0]["id_persona"] == filas[1]["id_persona"]